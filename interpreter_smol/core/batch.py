@@ -0,0 +1,397 @@
+"""
+batch.py - Run a JSONL file of tasks over a pool of reusable agents
+
+Each line of the tasks file is a JSON object with a "task" (or "prompt" or "question") field and an optional "id".
+Each result is appended to the output file as soon as its task is done, so a run that is killed resumes where it
+stopped: the tasks whose id is already in the output file are skipped.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from smolagents.monitoring import LogLevel
+from smolagents.utils import AgentMaxStepsError
+from interpreter_smol.core.models.cache import CachedModel
+
+TASK_FIELDS = ["task", "prompt", "question"]
+RATE_LIMIT_WINDOW = 60.0
+DEFAULT_PROGRESS_INTERVAL = 30.0
+
+
+class RateLimiter:
+    """Limits the requests and tokens per minute sent to a model provider, across all the threads that share it.
+
+    Requests and token counts are kept over a sliding window of one minute. A request waits until both the number of
+    requests and the number of tokens in the window are under their limits. Token counts are only known once a
+    request is done, so they are recorded afterwards.
+    """
+
+    registry: Dict[str, "RateLimiter"] = {}
+    registry_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = deque()
+        self.tokens = deque()
+        self.token_total = 0
+        self.waited = 0.0
+        self.condition = threading.Condition()
+
+    @classmethod
+    def for_provider(
+        cls, provider: str, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None
+    ) -> "RateLimiter":
+        """Return the limiter shared by all the models of a provider, created with these limits on first use."""
+        with cls.registry_lock:
+            if provider not in cls.registry:
+                cls.registry[provider] = cls(requests_per_minute, tokens_per_minute)
+            return cls.registry[provider]
+
+    def _expire(self, now: float):
+        while self.requests and self.requests[0] <= now - RATE_LIMIT_WINDOW:
+            self.requests.popleft()
+        while self.tokens and self.tokens[0][0] <= now - RATE_LIMIT_WINDOW:
+            self.token_total -= self.tokens.popleft()[1]
+
+    def _wait_time(self, now: float) -> float:
+        wait = 0.0
+        if self.requests_per_minute is not None and len(self.requests) >= self.requests_per_minute:
+            wait = max(wait, self.requests[-self.requests_per_minute] + RATE_LIMIT_WINDOW - now)
+        if self.tokens_per_minute is not None and self.token_total >= self.tokens_per_minute:
+            # Wait until enough tokens leave the window to be under the limit
+            excess = self.token_total - self.tokens_per_minute
+            released = 0
+            for timestamp, count in self.tokens:
+                released += count
+                if released > excess:
+                    wait = max(wait, timestamp + RATE_LIMIT_WINDOW - now)
+                    break
+        return wait
+
+    def acquire(self):
+        """Block until a request can be sent without exceeding the limits, and count it."""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    break
+                self.waited += wait
+                self.condition.wait(wait)
+            self.requests.append(now)
+
+    def record_tokens(self, count: int):
+        if count:
+            with self.condition:
+                self.tokens.append((time.monotonic(), count))
+                self.token_total += count
+
+
+class RateLimitedModel:
+    """Wraps a model so that its calls go through a rate limiter, which counts the tokens they used."""
+
+    def __init__(self, model, rate_limiter: RateLimiter):
+        self.model = model
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _record_usage(self):
+        input_tokens = getattr(self.model, "last_input_token_count", None) or 0
+        output_tokens = getattr(self.model, "last_output_token_count", None) or 0
+        self.rate_limiter.record_tokens(input_tokens + output_tokens)
+
+    def __call__(self, messages, **kwargs):
+        self.rate_limiter.acquire()
+        response = self.model(messages, **kwargs)
+        self._record_usage()
+        return response
+
+    async def __acall__(self, messages, **kwargs):
+        await asyncio.to_thread(self.rate_limiter.acquire)
+        response = await self.model.__acall__(messages, **kwargs)
+        self._record_usage()
+        return response
+
+    def generate_stream(self, messages, **kwargs):
+        self.rate_limiter.acquire()
+        try:
+            yield from self.model.generate_stream(messages, **kwargs)
+        finally:
+            # A stream closed early still used the tokens generated until then
+            self._record_usage()
+
+
+def load_tasks(path: str) -> List[Dict[str, Any]]:
+    """Read the tasks of a JSONL file, giving each its line number as id if it has none."""
+    tasks = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            task_field = next((name for name in TASK_FIELDS if name in record), None)
+            if task_field is None:
+                raise ValueError(f"Line {line_number} of {path} has none of the fields {TASK_FIELDS}")
+            task = dict(record)
+            task["id"] = str(record.get("id", line_number))
+            task["task"] = record[task_field]
+            tasks.append(task)
+    return tasks
+
+
+def load_finished_ids(path: str, retry_errors: bool = False) -> Set[str]:
+    """Read the ids of the tasks already in an output file. A line cut short by a killed run is ignored."""
+    finished = set()
+    if not Path(path).exists():
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if retry_errors and result.get("error") is not None:
+                continue
+            finished.add(str(result["id"]))
+    return finished
+
+
+def reset_agent(agent):
+    """Forget the variables and the tool state of the previous task, so that tasks do not see each other."""
+    agent.state.clear()
+    executor = getattr(agent, "python_executor", None)
+    if executor is not None and hasattr(executor, "state"):
+        executor.state.clear()
+    for tool in agent.tools.values():
+        if hasattr(tool, "reset"):
+            tool.reset()
+
+
+@dataclass
+class BatchSummary:
+    """Counts and throughput of a batch run."""
+
+    total: int
+    skipped: int = 0
+    completed: int = 0
+    failed: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    elapsed: float = 0.0
+    rate_limit_wait: float = 0.0
+    durations: List[float] = field(default_factory=list)
+
+    def add(self, result: Dict[str, Any]):
+        if result["error"] is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.input_tokens += result["input_tokens"] or 0
+        self.output_tokens += result["output_tokens"] or 0
+        self.durations.append(result["duration"])
+
+    def percentile(self, fraction: float) -> float:
+        durations = sorted(self.durations)
+        return durations[int(fraction * (len(durations) - 1))] if durations else 0.0
+
+    def progress(self) -> str:
+        done = self.completed + self.failed
+        rate = done / self.elapsed * 60 if self.elapsed else 0.0
+        return f"[{self.skipped + done}/{self.total}] {self.failed} failed, {rate:.1f} tasks/min"
+
+    def format(self) -> str:
+        done = self.completed + self.failed
+        minutes = self.elapsed / 60 if self.elapsed else 0.0
+        tokens = self.input_tokens + self.output_tokens
+        lines = [
+            f"Tasks: {self.total} total, {self.completed} completed, {self.failed} failed, "
+            f"{self.skipped} skipped (already in the output file)",
+            f"Elapsed: {self.elapsed:.1f} s",
+            f"Throughput: {done / minutes if minutes else 0.0:.1f} tasks/min, "
+            f"{tokens / self.elapsed if self.elapsed else 0.0:.0f} tokens/s",
+            f"Tokens: {self.input_tokens:,} input, {self.output_tokens:,} output",
+            f"Task duration: p50 {self.percentile(0.5):.1f} s, p95 {self.percentile(0.95):.1f} s, "
+            f"max {self.percentile(1.0):.1f} s",
+            f"Waited on the rate limit: {self.rate_limit_wait:.1f} s",
+        ]
+        return "\n".join(lines)
+
+
+class BatchRunner:
+    """Runs tasks over a pool of worker threads, each reusing one agent for all its tasks.
+
+    Args:
+        interpreter_factory: Creates the Interpreter of a worker, called once per worker thread.
+        workers: Number of tasks run at the same time.
+        rate_limiter: Shared by the models of all the workers, if given.
+        retry_errors: Whether to run again the tasks that failed in a previous run, instead of skipping them.
+        progress_interval: Seconds between two progress lines, None to print none.
+    """
+
+    def __init__(
+        self,
+        interpreter_factory: Callable[[], Any],
+        workers: int = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_errors: bool = False,
+        progress_interval: Optional[float] = DEFAULT_PROGRESS_INTERVAL,
+    ):
+        self.interpreter_factory = interpreter_factory
+        self.workers = workers
+        self.rate_limiter = rate_limiter
+        self.retry_errors = retry_errors
+        self.progress_interval = progress_interval
+        self.local = threading.local()
+        self.interpreters = []
+        self.interpreters_lock = threading.Lock()
+
+    def worker_interpreter(self):
+        """Return the interpreter of the current worker thread, created on its first task."""
+        interpreter = getattr(self.local, "interpreter", None)
+        if interpreter is None:
+            interpreter = self.interpreter_factory()
+            agent = interpreter.agent
+            agent.stream_outputs = False
+            agent.logger.level = LogLevel.OFF
+            if self.rate_limiter is not None:
+                # Responses replayed from a cache don't go through the rate limiter
+                if isinstance(agent.model, CachedModel):
+                    agent.model.model = RateLimitedModel(agent.model.model, self.rate_limiter)
+                else:
+                    agent.model = RateLimitedModel(agent.model, self.rate_limiter)
+            self.local.interpreter = interpreter
+            with self.interpreters_lock:
+                self.interpreters.append(interpreter)
+        return interpreter
+
+    def run_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        agent = self.worker_interpreter().agent
+        reset_agent(agent)
+        result = dict(task)
+        start = time.monotonic()
+        try:
+            result["answer"] = agent.run(task["task"], reset=True)
+            result["error"] = None
+        except Exception as e:
+            result["answer"] = None
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["duration"] = time.monotonic() - start
+        result["steps"] = len(agent.memory.steps)
+        # The agent answers even when it ran out of steps, but the answer is then a guess that should be reviewed
+        last_error = getattr(agent.memory.steps[-1], "error", None) if agent.memory.steps else None
+        if result["error"] is None and isinstance(last_error, AgentMaxStepsError):
+            result["error"] = f"{type(last_error).__name__}: {last_error}"
+        token_counts = agent.monitor.get_total_token_counts()
+        result["input_tokens"] = token_counts["input"]
+        result["output_tokens"] = token_counts["output"]
+        return result
+
+    def run(self, tasks_path: str, output_path: str) -> BatchSummary:
+        """Run the tasks of tasks_path that are not yet in output_path, appending their results to it."""
+        tasks = load_tasks(tasks_path)
+        finished = load_finished_ids(output_path, retry_errors=self.retry_errors)
+        pending = [task for task in tasks if task["id"] not in finished]
+        summary = BatchSummary(total=len(tasks), skipped=len(tasks) - len(pending))
+        waited_before = self.rate_limiter.waited if self.rate_limiter is not None else 0.0
+
+        start = time.monotonic()
+        last_progress = start
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-worker")
+        try:
+            with open(output_path, "a+", encoding="utf-8") as output:
+                # Start on a new line if the last one was cut short by a killed run
+                if output.tell() > 0:
+                    output.seek(output.tell() - 1)
+                    if output.read(1) != "\n":
+                        output.write("\n")
+                futures = [executor.submit(self.run_task, task) for task in pending]
+                # Results are written from this thread only, one whole line at a time
+                for future in as_completed(futures):
+                    result = future.result()
+                    output.write(json.dumps(result, default=str) + "\n")
+                    output.flush()
+                    summary.add(result)
+                    summary.elapsed = time.monotonic() - start
+                    if self.progress_interval is not None and time.monotonic() - last_progress >= self.progress_interval:
+                        print(summary.progress(), flush=True)
+                        last_progress = time.monotonic()
+        finally:
+            # On an interruption, drop the queued tasks: they will be run by the next run
+            executor.shutdown(wait=False, cancel_futures=True)
+            summary.elapsed = time.monotonic() - start
+            if self.rate_limiter is not None:
+                summary.rate_limit_wait = self.rate_limiter.waited - waited_before
+        return summary
+
+    def close(self):
+        """Release the resources of the worker agents, like their shell sessions."""
+        with self.interpreters_lock:
+            for interpreter in self.interpreters:
+                reset_agent(interpreter.agent)
+            self.interpreters.clear()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line interface of `interpreter-smol batch`."""
+    from interpreter_smol.core.interpreter import Interpreter, add_model_arguments, create_response_cache
+
+    parser = argparse.ArgumentParser(
+        prog="interpreter-smol batch",
+        description="Run a JSONL file of tasks with a pool of agents, appending the results to a JSONL file",
+    )
+    parser.add_argument("tasks", help="JSONL file with one task per line, in a \"task\", \"prompt\" or \"question\" field")
+    parser.add_argument("--output", "-o", required=True,
+                        help="JSONL file of results, which is resumed if it exists")
+    parser.add_argument("--workers", "-w", type=int, default=4,
+                        help="Number of tasks run at the same time")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Maximum requests per minute to the model provider")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Maximum tokens per minute to the model provider")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="Run again the tasks that failed in a previous run")
+    add_model_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    rate_limiter = None
+    if args.rpm is not None or args.tpm is not None:
+        rate_limiter = RateLimiter.for_provider(args.model, requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+
+    # Shared by all the workers, so a task replays the responses stored by any of them in a previous run
+    response_cache = create_response_cache(args)
+
+    def interpreter_factory():
+        return Interpreter(
+            model=args.model,
+            model_id=args.model_id,
+            api_key=args.api_key,
+            tools=args.tools,
+            imports=args.imports,
+            temperature=args.temperature,
+            max_tokens=args.max_tokens,
+            response_cache=response_cache,
+        )
+
+    runner = BatchRunner(interpreter_factory, workers=args.workers, rate_limiter=rate_limiter,
+                         retry_errors=args.retry_errors)
+    try:
+        summary = runner.run(args.tasks, args.output)
+    finally:
+        runner.close()
+    print(summary.format())
+    if response_cache is not None:
+        print(response_cache.stats().format())
+        response_cache.close()
@@ -6,7 +6,8 @@ import os
 import sys
 import argparse
 import importlib.util
-from typing import Optional, List, Dict, Any, Union
+import threading
+from typing import Callable, Optional, List, Dict, Any, Union
 from pathlib import Path
 import yaml
 
@@ -14,7 +15,9 @@ import yaml
 from smolagents.agents import CodeAgent  # Local unrestricted version
 # Keep other tools from installed package
 from smolagents.default_tools import TOOL_MAPPING
+from smolagents.memory import CompactionPolicy, summarize_steps_with_model
 from interpreter_smol.tools import EnhancedPythonInterpreter
+from interpreter_smol.core.models.cache import CachedModel, ResponseCache
 
 class Interpreter:
     """Simple Open-Interpreter-like interface built on SmolaGents."""
@@ -28,9 +31,25 @@ class Interpreter:
         imports: List[str] = ["os", "sys", "numpy", "pandas", "matplotlib.pyplot"],
         temperature: float = 0.7,
         max_tokens: int = 8192,
-        verbose: bool = False
+        verbose: bool = False,
+        token_budget: Optional[int] = None,
+        keep_last_steps: int = 4,
+        token_counter: Optional[Callable[[str], int]] = None,
+        managed_agents: Optional[List] = None,
+        response_cache: Optional[ResponseCache] = None,
     ):
-        """Initialize an interpreter with specified model and tools."""
+        """Initialize an interpreter with specified model and tools.
+
+        If token_budget is set, chat sessions compact the agent memory between turns once it exceeds this many tokens:
+        the last keep_last_steps steps are kept and older ones are summarized by the model. token_counter counts the
+        tokens of a text, by default it is estimated from its length.
+
+        managed_agents are agents the interpreter can give tasks to, one at a time by calling them by name, or several
+        at once with parallel_delegate.
+
+        If response_cache is set, the model responses are stored in it and replayed for the same requests, so running
+        the same task again doesn't call the model provider.
+        """
         self.model_type = model
         self.model_id = model_id
         self.api_key = api_key
@@ -40,7 +59,19 @@ class Interpreter:
         
         # Initialize model and agent
         self.model = self._initialize_model()
-        self.agent = self._initialize_agent(tools, imports)
+        if response_cache is not None:
+            self.model = CachedModel(self.model, response_cache)
+        self.agent = self._initialize_agent(tools, imports, managed_agents)
+
+        self.compaction_policy = None
+        if token_budget is not None:
+            self.compaction_policy = CompactionPolicy(
+                token_budget=token_budget,
+                keep_last_steps=keep_last_steps,
+                token_counter=token_counter,
+                summarizer=summarize_steps_with_model(self.model),
+            )
+        self.compaction_thread = None
     
     def _initialize_model(self):
         """Initialize the model based on type."""
@@ -79,7 +110,7 @@ class Interpreter:
         else:
             raise ValueError(f"Unsupported model type: {self.model_type}")
     
-    def _initialize_agent(self, tool_names, imports):
+    def _initialize_agent(self, tool_names, imports, managed_agents=None):
         """Initialize the CodeAgent with specified tools."""
         # Expand imports to include everything needed for system access
         all_imports = imports + [
@@ -120,7 +151,9 @@ class Interpreter:
             model=self.model,
             additional_authorized_imports=all_imports,
             verbosity_level=2 if self.verbose else 1,
-            prompt_templates=prompt_templates  # Use our custom prompts if available
+            prompt_templates=prompt_templates,  # Use our custom prompts if available
+            managed_agents=managed_agents,
+            stream_outputs=True,  # Show the model output as it is generated, and run code as soon as it is complete
         )
         return agent
     
@@ -135,21 +168,38 @@ class Interpreter:
                 user_input = input("\n> ")
                 if user_input.lower() in ["exit", "quit", "q"]:
                     break
+                self.wait_for_compaction()
                 self.agent.run(user_input, reset=False)
+                self.start_compaction()
         except KeyboardInterrupt:
             print("\nExiting...")
+
+    def start_compaction(self):
+        """Compact the agent memory in the background, while the user types the next message."""
+        if self.compaction_policy is None:
+            return
+
+        def compact():
+            try:
+                self.agent.memory.compact(self.compaction_policy)
+            except Exception as e:
+                print(f"Warning: Could not compact the conversation: {e}")
+
+        self.compaction_thread = threading.Thread(target=compact, daemon=True)
+        self.compaction_thread.start()
+
+    def wait_for_compaction(self):
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+            self.compaction_thread = None
     
     def run(self, prompt: str):
         """Run a single prompt and return the result."""
         return self.agent.run(prompt)
 
 
-def main():
-    """Command line interface for interpreter-smol."""
-    parser = argparse.ArgumentParser(description="interpreter-smol: Open-Interpreter-like CLI built on SmolaGents")
-    
-    # Simplified CLI arguments
-    parser.add_argument("prompt", nargs="?", help="The prompt to run")
+def add_model_arguments(parser: argparse.ArgumentParser):
+    """Add the arguments that configure the model and tools of an Interpreter."""
     parser.add_argument("--model", "-m", default="gemini", 
                         choices=["gemini", "openai", "anthropic", "hf"],
                         help="Model provider to use")
@@ -167,6 +217,38 @@ def main():
                         help="Temperature for generation")
     parser.add_argument("--max-tokens", type=int, default=4096,
                         help="Maximum tokens in response")
+    parser.add_argument("--cache", default=None, metavar="PATH",
+                        help="SQLite file where model responses are stored and replayed for the same requests")
+    parser.add_argument("--cache-ttl", type=float, default=None,
+                        help="Seconds after which a stored response is not replayed anymore")
+    parser.add_argument("--cache-max-mb", type=float, default=None,
+                        help="Size of the stored responses above which the least recently used ones are deleted")
+
+
+def create_response_cache(args: argparse.Namespace) -> Optional[ResponseCache]:
+    """Open the response cache given on the command line, if any."""
+    if args.cache is None:
+        return None
+    return ResponseCache(args.cache, ttl=args.cache_ttl, max_size_mb=args.cache_max_mb)
+
+
+def main():
+    """Command line interface for interpreter-smol."""
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from interpreter_smol.core.batch import main as batch_main
+        batch_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        description="interpreter-smol: Open-Interpreter-like CLI built on SmolaGents",
+        epilog="Run `interpreter-smol batch --help` to run a JSONL file of tasks instead.",
+    )
+    
+    # Simplified CLI arguments
+    parser.add_argument("prompt", nargs="?", help="The prompt to run")
+    add_model_arguments(parser)
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Summarize older turns of a chat once its history exceeds this many tokens")
     parser.add_argument("-i", "--interactive", action="store_true", 
                         help="Start in interactive mode")
     parser.add_argument("-v", "--verbose", action="store_true", 
@@ -185,6 +267,7 @@ def main():
         elif args.model.lower() == "hf":
             os.environ["HF_API_TOKEN"] = args.api_key
     
+    response_cache = create_response_cache(args)
     try:
         # Initialize the interpreter
         interpreter = Interpreter(
@@ -195,7 +278,9 @@ def main():
             imports=args.imports,
             temperature=args.temperature,
             max_tokens=args.max_tokens,
-            verbose=args.verbose
+            verbose=args.verbose,
+            token_budget=args.token_budget,
+            response_cache=response_cache,
         )
         
         # Run in appropriate mode
@@ -215,6 +300,10 @@ def main():
     except KeyboardInterrupt:
         print("\nExiting...")
         sys.exit(0)
+    finally:
+        if response_cache is not None:
+            print(response_cache.stats().format())
+            response_cache.close()
 
 
 if __name__ == "__main__":
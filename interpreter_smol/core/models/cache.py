@@ -0,0 +1,249 @@
+"""
+cache.py - Disk-backed cache of model responses
+
+CachedModel wraps any smolagents Model (LiteLLMModel, OpenAIServerModel, HfApiModel, GeminiModel...) so that a call
+with the same messages, stop sequences, tools, model id and sampling parameters as a previous one returns the stored
+response instead of calling the provider again. Responses are stored with their token counts in a SQLite file, so
+re-running an agent on the same task replays its model calls in milliseconds.
+
+The cache assumes that a request always gets the same response: with a temperature above 0, the first sampled
+response is replayed every time.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from smolagents.models import (
+    ChatMessage,
+    Model,
+    StopGeneration,
+    get_clean_message_list,
+    get_dict_from_nested_dataclasses,
+    get_tool_json_schema,
+    tool_role_conversions,
+)
+
+# Bump to ignore the responses stored by a previous version of the cache key
+CACHE_KEY_VERSION = 1
+# Attributes of the model classes that change their responses, on top of their kwargs
+SAMPLING_ATTRIBUTES = ["model_id", "temperature", "max_tokens", "top_p", "top_k", "provider", "api_base",
+                       "custom_role_conversions"]
+# Model kwargs that identify the caller rather than the request
+CREDENTIAL_KWARGS = ["api_key", "token"]
+
+
+def cache_key(model, messages, stream: bool = False, **kwargs) -> str:
+    """Hash of everything that determines the response of a model call: the cleaned messages, the model, its
+    sampling parameters and the call arguments, like stop sequences, grammar and tools."""
+    # Wrappers like RateLimitedModel don't change the responses, so they share them with the model they wrap
+    while not isinstance(model, Model) and "model" in vars(model):
+        model = model.model
+    tools = kwargs.pop("tools_to_call_from", None)
+    model_kwargs = {name: value for name, value in getattr(model, "kwargs", {}).items()
+                    if name not in CREDENTIAL_KWARGS}
+    request = {
+        "version": CACHE_KEY_VERSION,
+        "model_class": type(model).__name__,
+        "model": {name: getattr(model, name) for name in SAMPLING_ATTRIBUTES if hasattr(model, name)},
+        "model_kwargs": model_kwargs,
+        "messages": get_clean_message_list(messages, role_conversions=tool_role_conversions),
+        "tools": [get_tool_json_schema(tool) for tool in tools] if tools else None,
+        "stream": stream,
+        "kwargs": kwargs,
+    }
+    data = json.dumps(request, sort_keys=True, default=repr)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Hits, misses and contents of a response cache."""
+
+    hits: int = 0
+    misses: int = 0
+    input_tokens_saved: int = 0
+    output_tokens_saved: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def format(self) -> str:
+        return (
+            f"Response cache: {self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), "
+            f"{self.input_tokens_saved:,} input and {self.output_tokens_saved:,} output tokens saved, "
+            f"{self.entries} responses stored ({self.size_bytes / 2**20:.1f} MB)"
+        )
+
+
+class ResponseCache:
+    """SQLite file of model responses and their token counts, shared by all the threads that use it.
+
+    Responses older than `ttl` seconds are not returned anymore and are deleted. Once the stored responses take more
+    than `max_size_mb` megabytes, the least recently used ones are deleted. Several processes can use the same file.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_size_mb: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+        self.max_size_mb = max_size_mb
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.input_tokens_saved = 0
+        self.output_tokens_saved = 0
+        # Each statement is committed on its own, so a killed run keeps the responses it got
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "input_tokens INTEGER, output_tokens INTEGER, size INTEGER NOT NULL, created REAL NOT NULL, "
+            "accessed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored response and token counts of a request, or None if there are none."""
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, input_tokens, output_tokens, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[3] > self.ttl:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.input_tokens_saved += row[1] or 0
+            self.output_tokens_saved += row[2] or 0
+        return {"response": json.loads(row[0]), "input_tokens": row[1], "output_tokens": row[2]}
+
+    def put(self, key: str, response: Dict[str, Any], input_tokens: Optional[int], output_tokens: Optional[int]):
+        """Store the response of a request, then evict the expired and least recently used responses."""
+        data = json.dumps(response)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, data, input_tokens, output_tokens, len(data), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        if self.ttl is not None:
+            self.connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        if self.max_size_mb is None:
+            return
+        max_size = self.max_size_mb * 2**20
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= max_size:
+            return
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if total <= max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self) -> CacheStats:
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                input_tokens_saved=self.input_tokens_saved,
+                output_tokens_saved=self.output_tokens_saved,
+                entries=entries,
+                size_bytes=size,
+            )
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class CachedModel:
+    """Wraps a model so that its responses are stored in a ResponseCache and replayed for the same requests.
+
+    A replayed response used no tokens, so its token counts are 0; the tokens it saved are counted by the cache.
+    """
+
+    def __init__(self, model, cache: ResponseCache):
+        self.model = model
+        self.cache = cache
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.last_input_token_count = 0
+            self.last_output_token_count = 0
+        return entry
+
+    def _store(self, key: str, response: Dict[str, Any]):
+        self.last_input_token_count = getattr(self.model, "last_input_token_count", None)
+        self.last_output_token_count = getattr(self.model, "last_output_token_count", None)
+        self.cache.put(key, response, self.last_input_token_count, self.last_output_token_count)
+
+    def __call__(self, messages, **kwargs):
+        key = cache_key(self.model, messages, **kwargs)
+        entry = self._lookup(key)
+        if entry is not None:
+            return ChatMessage.from_dict(entry["response"])
+        response = self.model(messages, **kwargs)
+        self._store(key, get_dict_from_nested_dataclasses(response, ignore_key="raw"))
+        return response
+
+    async def __acall__(self, messages, **kwargs):
+        key = cache_key(self.model, messages, **kwargs)
+        entry = self._lookup(key)
+        if entry is not None:
+            return ChatMessage.from_dict(entry["response"])
+        response = await self.model.__acall__(messages, **kwargs)
+        self._store(key, get_dict_from_nested_dataclasses(response, ignore_key="raw"))
+        return response
+
+    def generate_stream(self, messages, **kwargs):
+        key = cache_key(self.model, messages, stream=True, **kwargs)
+        entry = self._lookup(key)
+        if entry is not None:
+            yield entry["response"]["content"]
+            return
+        stream = self.model.generate_stream(messages, **kwargs)
+        deltas = []
+        finished = False
+        try:
+            for delta in stream:
+                deltas.append(delta)
+                yield delta
+            finished = True
+        except StopGeneration:
+            # Stopped by a consumer with a complete response, e.g. a complete code action: the same request stops there
+            # again. A stream closed instead, e.g. by an error, is not stored.
+            finished = True
+        finally:
+            stream.close()
+            if finished:
+                self._store(key, {"content": "".join(deltas)})
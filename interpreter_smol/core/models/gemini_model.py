@@ -6,7 +6,7 @@ using the new Google GenAI SDK (google-genai v1.0)
 import os
 import uuid
 import logging
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Generator, List, Optional, Union
 
 from smolagents.models import Model, ChatMessage, ChatMessageToolCall, ChatMessageToolCallDefinition, MessageRole
 
@@ -104,13 +104,7 @@ class GeminiModel(Model):
         gemini_messages = self._convert_messages_to_gemini_format(messages)
         
         # Set up config with optional parameters
-        config = types.GenerateContentConfig(
-            temperature=kwargs.get("temperature", self.temperature),
-            top_p=kwargs.get("top_p", 0.95),
-            top_k=kwargs.get("top_k", 40),
-            max_output_tokens=kwargs.get("max_tokens", self.max_tokens),
-            stop_sequences=stop_sequences
-        )
+        config = self._generation_config(stop_sequences, kwargs)
         
         # Handle tools if provided
         tool_config = self._prepare_tool_config(tools_to_call_from) if tools_to_call_from else None
@@ -218,6 +212,48 @@ final_answer("Tools test completed - we saw some successes but also some errors.
             # Otherwise re-raise
             raise
     
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        **kwargs
+    ) -> Generator[str, None, None]:
+        """
+        Yield the text of the model's response as Gemini generates it.
+        
+        Closing the generator stops reading the response, e.g. once the code action is complete.
+        """
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        stream = self.client.models.generate_content_stream(
+            model=self.model_id,
+            contents=self._convert_messages_to_gemini_format(messages),
+            config=self._generation_config(stop_sequences, kwargs),
+        )
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage is not None:
+                    self.last_input_token_count = getattr(usage, "prompt_token_count", None)
+                    self.last_output_token_count = getattr(usage, "candidates_token_count", None)
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+    
+    def _generation_config(self, stop_sequences: Optional[List[str]], kwargs: Dict[str, Any]):
+        """Build the generation config from the model settings and call parameters."""
+        return types.GenerateContentConfig(
+            temperature=kwargs.get("temperature", self.temperature),
+            top_p=kwargs.get("top_p", 0.95),
+            top_k=kwargs.get("top_k", 40),
+            max_output_tokens=kwargs.get("max_tokens", self.max_tokens),
+            stop_sequences=stop_sequences
+        )
+    
     def _convert_messages_to_gemini_format(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Convert SmolaGents messages to Gemini's format."""
         gemini_messages = []
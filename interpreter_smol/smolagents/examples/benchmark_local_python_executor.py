@@ -0,0 +1,46 @@
+"""
+Micro-benchmark of the local Python executor.
+
+Runs a comprehension and a function-heavy snippet against states of increasing size, as happens when an agent
+accumulates variables over a long session, and prints the time per run for each execution engine.
+Comprehensions and interpreted functions get their own scope instead of a copy of the whole state, so the timings
+should stay flat as the state grows.
+
+Usage:
+    python examples/benchmark_local_python_executor.py
+"""
+
+import timeit
+
+from smolagents.local_python_executor import BASE_PYTHON_TOOLS, EXECUTION_ENGINES, CodeCache, evaluate_python_code
+
+
+SNIPPETS = {
+    "comprehension": "squares = [x * x for x in range(2000) if x % 2 == 0]",
+    "function calls": "def add(a, b):\n    return a + b\ntotal = 0\nfor i in range(2000):\n    total = add(total, i)",
+}
+STATE_SIZES = [10, 1_000, 100_000]
+NUMBER = 20
+
+
+def main():
+    print(f"{'snippet':<16}{'engine':<10}" + "".join(f"{f'state={size}':>16}" for size in STATE_SIZES))
+    for name, code in SNIPPETS.items():
+        for engine in EXECUTION_ENGINES:
+            # Like LocalPythonInterpreter, cache the parsed code so that only execution is measured
+            code_cache = CodeCache()
+            timings = []
+            for size in STATE_SIZES:
+                state = {f"variable_{i}": i for i in range(size)}
+                seconds = timeit.timeit(
+                    lambda: evaluate_python_code(
+                        code, BASE_PYTHON_TOOLS.copy(), state=state, engine=engine, code_cache=code_cache
+                    ),
+                    number=NUMBER,
+                )
+                timings.append(seconds / NUMBER * 1000)
+            print(f"{name:<16}{engine:<10}" + "".join(f"{f'{timing:.2f} ms':>16}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
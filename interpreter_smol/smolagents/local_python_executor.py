@@ -16,21 +16,32 @@
 # limitations under the License.
 import ast
 import builtins
+import contextvars
+import copy
+import ctypes
 import difflib
+import hashlib
 import inspect
 import logging
 import math
+import operator
+import os
 import re
-from collections.abc import Mapping
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Mapping
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from importlib import import_module
 from types import ModuleType
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 from .tools import Tool
-from .utils import BASE_BUILTIN_MODULES, truncate_content
+from .utils import BASE_BUILTIN_MODULES, TRUNCATION_MARKER
 
 
 logger = logging.getLogger(__name__)
@@ -45,6 +56,17 @@ class InterpreterError(ValueError):
     pass
 
 
+class ExecutionBudgetExceeded(BaseException):
+    """
+    Raised in a code action that exceeded its `ExecutionBudget`.
+
+    It does not derive from `Exception`, so that the evaluated code cannot catch it with `except Exception:`.
+    """
+
+    def __init__(self, message: str = "Code action exceeded its execution budget."):
+        super().__init__(message)
+
+
 ERRORS = {
     name: getattr(builtins, name)
     for name in dir(builtins)
@@ -54,12 +76,103 @@ ERRORS = {
 DEFAULT_MAX_LEN_OUTPUT = 50000
 MAX_OPERATIONS = 10000000
 MAX_WHILE_ITERATIONS = 1000000
+EXECUTION_ENGINES = ("ast", "closure", "native")
+DEFAULT_CODE_CACHE_SIZE = 128
+BUDGET_CHECK_INTERVAL = 100
+BUDGET_POLL_INTERVAL = 0.05
+BUDGET_GRACE_PERIOD = 1.0
+DEFAULT_PARALLEL_MAP_WORKERS = 16
+PARALLEL_MAP_POOL_SIZE = 32
 
 
 def custom_print(*args):
     return None
 
 
+# Thread pool shared by all the `parallel_map` calls, created on first use
+parallel_map_pool = None
+parallel_map_pool_lock = threading.Lock()
+# Number of running `parallel_map` calls: while there are some, `count_operation` counts under `operations_lock`
+parallel_map_calls = 0
+operations_lock = threading.Lock()
+# Print outputs of the `parallel_map` item running in the current thread, if any, see `PrintContainer.append`
+parallel_map_context = threading.local()
+
+
+def get_parallel_map_pool() -> ThreadPoolExecutor:
+    global parallel_map_pool
+    with parallel_map_pool_lock:
+        if parallel_map_pool is None:
+            parallel_map_pool = ThreadPoolExecutor(
+                max_workers=PARALLEL_MAP_POOL_SIZE, thread_name_prefix="parallel-map"
+            )
+    return parallel_map_pool
+
+
+def parallel_map(func: Callable, iterable: Iterable, max_workers: Optional[int] = None) -> List[Any]:
+    """
+    Calls `func` on each item of `iterable` in the threads of a shared pool, and returns the results in order, like
+    `list(map(func, iterable))`. This is meant for I/O-bound tools, like web searches, which then wait at the same
+    time instead of one after the other.
+
+    At most `max_workers` items (by default `DEFAULT_PARALLEL_MAP_WORKERS`) run at the same time. The print outputs of
+    each item are added to those of the code action in the order of the items, and the operations of functions
+    defined by the code count in its budget. If an item fails, its error is raised and the items not started yet are
+    cancelled. Inside an item, `parallel_map` runs sequentially, so that the items never wait for their own pool.
+    """
+    global parallel_map_calls
+    if max_workers is not None and max_workers < 1:
+        raise InterpreterError(f"max_workers should be at least 1, got {max_workers}.")
+    items = list(iterable)
+    if len(items) <= 1 or getattr(parallel_map_context, "print_outputs", None) is not None:
+        return [func(item) for item in items]
+
+    max_workers = max_workers or DEFAULT_PARALLEL_MAP_WORKERS
+    results = [None] * len(items)
+    print_outputs = [[] for _ in items]
+    finished = [False] * len(items)
+
+    def run_item(index: int) -> Any:
+        parallel_map_context.print_outputs = print_outputs[index]
+        try:
+            return func(items[index])
+        finally:
+            parallel_map_context.print_outputs = None
+
+    def flush_print_outputs(start: int) -> int:
+        # Prints of an item are only added once all the items before it finished, to keep them in order
+        while start < len(items) and finished[start]:
+            for container, text in print_outputs[start]:
+                container.append(text)
+            start += 1
+        return start
+
+    pool = get_parallel_map_pool()
+    futures = {}
+    next_index = flushed = 0
+    with operations_lock:
+        parallel_map_calls += 1
+    try:
+        while next_index < len(items) or futures:
+            while next_index < len(items) and len(futures) < max_workers:
+                futures[pool.submit(contextvars.copy_context().run, run_item, next_index)] = next_index
+                next_index += 1
+            # Wake up regularly, so that the execution budget can interrupt this thread
+            done, _ = wait(futures, timeout=BUDGET_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures.pop(future)
+                finished[index] = True
+                results[index] = future.result()
+            flushed = flush_print_outputs(flushed)
+        return results
+    finally:
+        for future in futures:
+            future.cancel()
+        with operations_lock:
+            parallel_map_calls -= 1
+        flush_print_outputs(flushed)
+
+
 BASE_PYTHON_TOOLS = {
     "print": custom_print,
     "isinstance": isinstance,
@@ -113,6 +226,7 @@ BASE_PYTHON_TOOLS = {
     "issubclass": issubclass,
     "type": type,
     "complex": complex,
+    "parallel_map": parallel_map,
 }
 
 DANGEROUS_PATTERNS = (
@@ -137,17 +251,75 @@ DANGEROUS_PATTERNS = (
 
 
 class PrintContainer:
-    def __init__(self):
-        self.value = ""
+    """
+    Collects the print outputs of the executed code.
+
+    With a `max_length`, only the first `max_length // 2` characters and a rolling tail of the last ones are kept
+    while the code runs, so that memory stays bounded whatever the amount printed. The value is then truncated like
+    `truncate_content` would do on the full outputs.
+
+    Args:
+        max_length (`int`, *optional*): Maximum length of the value. If not set, all outputs are kept.
+        callback (`Callable[[str], None]`, *optional*): Called with each chunk of text as soon as it is printed,
+            for instance to stream the outputs to a logger.
+    """
+
+    def __init__(self, max_length: Optional[int] = None, callback: Optional[Callable[[str], None]] = None):
+        self.max_length = max_length
+        self.callback = callback
+        self.clear()
+
+    def clear(self):
+        self.head = ""
+        self.tail = deque()
+        self.tail_length = 0
+        self.total_length = 0
+
+    def _store(self, text: str):
+        self.total_length += len(text)
+        if self.max_length is not None:
+            head_room = self.max_length // 2 - len(self.head)
+            if head_room > 0:
+                self.head += text[:head_room]
+                text = text[head_room:]
+        if text:
+            self.tail.append(text)
+            self.tail_length += len(text)
+            if self.max_length is not None:
+                tail_max_length = self.max_length - self.max_length // 2
+                # Drop the oldest chunks that are not needed anymore to keep the tail
+                while self.tail and self.tail_length - len(self.tail[0]) >= tail_max_length:
+                    self.tail_length -= len(self.tail.popleft())
 
     def append(self, text):
-        self.value += text
+        buffer = getattr(parallel_map_context, "print_outputs", None)
+        if buffer is not None:
+            # Printed by an item of `parallel_map`: added by the calling thread in the order of the items
+            buffer.append((self, text))
+            return self
+        if self.callback is not None and text:
+            self.callback(text)
+        self._store(text)
         return self
 
+    @property
+    def value(self) -> str:
+        tail = "".join(self.tail)
+        if len(self.tail) > 1:
+            self.tail = deque([tail])
+        if self.max_length is None or self.total_length <= self.max_length:
+            return self.head + tail
+        tail_max_length = self.max_length - self.max_length // 2
+        return self.head + TRUNCATION_MARKER.format(max_length=self.max_length) + tail[len(tail) - tail_max_length :]
+
+    @value.setter
+    def value(self, value: str):
+        self.clear()
+        self._store(value)
+
     def __iadd__(self, other):
         """Implements the += operator"""
-        self.value += str(other)
-        return self
+        return self.append(str(other))
 
     def __str__(self):
         """String representation"""
@@ -162,6 +334,70 @@ class PrintContainer:
         return len(self.value)
 
 
+class ScopedState(dict):
+    """
+    Local scope of a comprehension element or an interpreted function call.
+
+    Names missing from the scope are looked up in its parent state, and assignments only go to the scope itself: this
+    behaves like a copy of the parent state, but creating it does not depend on the size of the parent state.
+
+    Args:
+        parent (`Dict[str, Any]`): The enclosing state, which can itself be a `ScopedState`.
+    """
+
+    __slots__ = ("parent", "root")
+
+    def __init__(self, parent: Dict[str, Any]):
+        super().__init__()
+        self.parent = parent
+        self.root = parent.root if isinstance(parent, ScopedState) else parent
+
+    def __missing__(self, key):
+        return self.parent[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.parent
+
+    def __delitem__(self, key):
+        if not dict.__contains__(self, key):
+            raise KeyError(f"Cannot delete '{key}' from an enclosing scope")
+        dict.__delitem__(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def flatten(self) -> Dict[str, Any]:
+        """Returns a plain dict with all the names visible from this scope."""
+        names = self.parent.flatten() if isinstance(self.parent, ScopedState) else dict(self.parent)
+        names.update(dict.items(self))
+        return names
+
+    def keys(self):
+        return self.flatten().keys()
+
+    def values(self):
+        return self.flatten().values()
+
+    def items(self):
+        return self.flatten().items()
+
+    def __iter__(self):
+        return iter(self.flatten())
+
+    def __len__(self):
+        return len(self.flatten())
+
+    def copy(self) -> "ScopedState":
+        new_state = ScopedState(self.parent)
+        dict.update(new_state, dict.items(self))
+        return new_state
+
+
 class BreakException(Exception):
     pass
 
@@ -242,7 +478,7 @@ def evaluate_lambda(
     args = [arg.arg for arg in lambda_expression.args.args]
 
     def lambda_func(*values: Any) -> Any:
-        new_state = state.copy()
+        new_state = ScopedState(state)
         for arg, value in zip(args, values):
             new_state[arg] = value
         return evaluate_ast(
@@ -278,6 +514,47 @@ def evaluate_while(
     return None
 
 
+def bind_function_arguments(
+    func_def: ast.FunctionDef,
+    func_state: Dict[str, Any],
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    default_values: List[Any],
+) -> None:
+    arg_names = [arg.arg for arg in func_def.args.args]
+
+    # Apply default values
+    defaults = dict(zip(arg_names[-len(default_values) :], default_values))
+
+    # Set positional arguments
+    for name, value in zip(arg_names, args):
+        func_state[name] = value
+
+    # Set keyword arguments
+    for name, value in kwargs.items():
+        func_state[name] = value
+
+    # Handle variable arguments
+    if func_def.args.vararg:
+        vararg_name = func_def.args.vararg.arg
+        func_state[vararg_name] = args
+
+    if func_def.args.kwarg:
+        kwarg_name = func_def.args.kwarg.arg
+        func_state[kwarg_name] = kwargs
+
+    # Set default values for arguments that were not provided
+    for name, value in defaults.items():
+        if name not in func_state:
+            func_state[name] = value
+
+    # Update function state with self and __class__
+    if func_def.args.args and func_def.args.args[0].arg == "self":
+        if args:
+            func_state["self"] = args[0]
+            func_state["__class__"] = args[0].__class__
+
+
 def create_function(
     func_def: ast.FunctionDef,
     state: Dict[str, Any],
@@ -286,42 +563,11 @@ def create_function(
     authorized_imports: List[str],
 ) -> Callable:
     def new_func(*args: Any, **kwargs: Any) -> Any:
-        func_state = state.copy()
-        arg_names = [arg.arg for arg in func_def.args.args]
+        func_state = ScopedState(state)
         default_values = [
             evaluate_ast(d, state, static_tools, custom_tools, authorized_imports) for d in func_def.args.defaults
         ]
-
-        # Apply default values
-        defaults = dict(zip(arg_names[-len(default_values) :], default_values))
-
-        # Set positional arguments
-        for name, value in zip(arg_names, args):
-            func_state[name] = value
-
-        # Set keyword arguments
-        for name, value in kwargs.items():
-            func_state[name] = value
-
-        # Handle variable arguments
-        if func_def.args.vararg:
-            vararg_name = func_def.args.vararg.arg
-            func_state[vararg_name] = args
-
-        if func_def.args.kwarg:
-            kwarg_name = func_def.args.kwarg.arg
-            func_state[kwarg_name] = kwargs
-
-        # Set default values for arguments that were not provided
-        for name, value in defaults.items():
-            if name not in func_state:
-                func_state[name] = value
-
-        # Update function state with self and __class__
-        if func_def.args.args and func_def.args.args[0].arg == "self":
-            if args:
-                func_state["self"] = args[0]
-                func_state["__class__"] = args[0].__class__
+        bind_function_arguments(func_def, func_state, args, kwargs, default_values)
 
         result = None
         try:
@@ -576,6 +822,29 @@ def set_value(
         setattr(obj, target.attr, value)
 
 
+class InlineCache:
+    """
+    Monomorphic inline cache of a call or subscript site: remembers what was resolved for the last key seen there,
+    so that hot loops skip repeated checks. Sites of the AST engine keep theirs in the `inline_cache` attribute of
+    their node, and sites of the closure engine in their closure.
+
+    The key and the value are stored and read together as one `(key, value)` tuple: cached nodes are shared by the
+    threads of `parallel_map`, so a site must never see the key stored by one thread with the value of another.
+    """
+
+    __slots__ = ("entry",)
+
+    def __init__(self):
+        self.entry = None
+
+
+def get_inline_cache(node: ast.AST) -> InlineCache:
+    inline_cache = getattr(node, "inline_cache", None)
+    if inline_cache is None:
+        inline_cache = node.inline_cache = InlineCache()
+    return inline_cache
+
+
 def evaluate_call(
     call: ast.Call,
     state: Dict[str, Any],
@@ -631,7 +900,18 @@ def evaluate_call(
         keyword.arg: evaluate_ast(keyword.value, state, static_tools, custom_tools, authorized_imports)
         for keyword in call.keywords
     }
+    return call_function(func, func_name, args, kwargs, state, static_tools, get_inline_cache(call))
 
+
+def call_function(
+    func: Callable,
+    func_name: Optional[str],
+    args: List[Any],
+    kwargs: Dict[str, Any],
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    inline_cache: Optional[InlineCache] = None,
+) -> Any:
     if func_name == "super":
         if not args:
             if "__class__" in state and "self" in state:
@@ -653,14 +933,16 @@ def evaluate_call(
             state["_print_outputs"] += " ".join(map(str, args)) + "\n"
             return None
         else:  # Assume it's a callable object
-            if (
-                (inspect.getmodule(func) == builtins)
-                and inspect.isbuiltin(func)
-                and (func not in static_tools.values())
-            ):
-                raise InterpreterError(
-                    f"Invoking a builtin function that has not been explicitly added as a tool is not allowed ({func_name})."
-                )
+            # The call site remembers the last builtin function it authorized, with the static tools it checked
+            if inspect.isbuiltin(func):
+                entry = inline_cache.entry if inline_cache is not None else None
+                if entry is None or entry[0] is not func or entry[1] is not static_tools:
+                    if (inspect.getmodule(func) == builtins) and (func not in static_tools.values()):
+                        raise InterpreterError(
+                            f"Invoking a builtin function that has not been explicitly added as a tool is not allowed ({func_name})."
+                        )
+                    if inline_cache is not None:
+                        inline_cache.entry = (func, static_tools)
             return func(*args, **kwargs)
 
 
@@ -673,26 +955,49 @@ def evaluate_subscript(
 ) -> Any:
     index = evaluate_ast(subscript.slice, state, static_tools, custom_tools, authorized_imports)
     value = evaluate_ast(subscript.value, state, static_tools, custom_tools, authorized_imports)
+    return get_subscript_value(value, index, get_inline_cache(subscript))
 
-    if isinstance(value, str) and isinstance(index, str):
-        raise InterpreterError("You're trying to subscript a string with a string index, which is impossible")
+
+def get_subscript_kind(value: Any) -> str:
+    """Classifies a subscripted value: this only depends on its type, so subscript sites can cache it."""
     if isinstance(value, pd.core.indexing._LocIndexer):
+        return "loc"
+    if isinstance(value, pd.core.indexing._iLocIndexer):
+        return "iloc"
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray, pd.core.groupby.generic.DataFrameGroupBy)):
+        return "array"
+    if isinstance(value, (list, tuple)):
+        return "sequence"
+    if isinstance(value, str):
+        return "string"
+    return "other"
+
+
+def get_subscript_value(value: Any, index: Any, inline_cache: Optional[InlineCache] = None) -> Any:
+    entry = inline_cache.entry if inline_cache is not None else None
+    if entry is not None and entry[0] is type(value):
+        kind = entry[1]
+    else:
+        kind = get_subscript_kind(value)
+        if inline_cache is not None:
+            inline_cache.entry = (type(value), kind)
+    if kind == "string" and isinstance(index, str):
+        raise InterpreterError("You're trying to subscript a string with a string index, which is impossible")
+    if kind == "loc":
         parent_object = value.obj
         return parent_object.loc[index]
-    if isinstance(value, pd.core.indexing._iLocIndexer):
+    if kind == "iloc":
         parent_object = value.obj
         return parent_object.iloc[index]
-    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
-        return value[index]
-    elif isinstance(value, pd.core.groupby.generic.DataFrameGroupBy):
+    if kind == "array":
         return value[index]
     elif isinstance(index, slice):
         return value[index]
-    elif isinstance(value, (list, tuple)):
+    elif kind == "sequence":
         if not (-len(value) <= index < len(value)):
             raise InterpreterError(f"Index {index} out of bounds for list of length {len(value)}")
         return value[int(index)]
-    elif isinstance(value, str):
+    elif kind == "string":
         if not (-len(value) <= index < len(value)):
             raise InterpreterError(f"Index {index} out of bounds for string of length {len(value)}")
         return value[index]
@@ -810,18 +1115,15 @@ def evaluate_for(
             custom_tools,
             authorized_imports,
         )
-        for node in for_loop.body:
-            try:
+        try:
+            for node in for_loop.body:
                 line_result = evaluate_ast(node, state, static_tools, custom_tools, authorized_imports)
                 if line_result is not None:
                     result = line_result
-            except BreakException:
-                break
-            except ContinueException:
-                continue
-        else:
+        except BreakException:
+            break
+        except ContinueException:
             continue
-        break
     return result
 
 
@@ -853,7 +1155,7 @@ def evaluate_listcomp(
         )
         result = []
         for value in iter_value:
-            new_state = current_state.copy()
+            new_state = ScopedState(current_state)
             if isinstance(generator.target, ast.Tuple):
                 for idx, elem in enumerate(generator.target.elts):
                     new_state[elem.id] = value[idx]
@@ -869,6 +1171,41 @@ def evaluate_listcomp(
     return inner_evaluate(listcomp.generators, 0, state)
 
 
+def evaluate_generatorexp(
+    genexp: ast.GeneratorExp,
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    custom_tools: Dict[str, Callable],
+    authorized_imports: List[str],
+) -> Iterator[Any]:
+    """
+    Evaluate a generator expression into a lazy generator: elements are only computed when consumed, so that
+    `any(...)` can stop early and iterating over a large file or iterator runs in constant memory.
+    As in Python, the outermost iterable is evaluated immediately and the rest when iterating.
+    """
+    generators = genexp.generators
+
+    def inner_generate(index: int, current_state: Dict[str, Any], iter_value: Any) -> Iterator[Any]:
+        generator = generators[index]
+        for value in iter_value:
+            new_state = ScopedState(current_state)
+            set_value(generator.target, value, new_state, static_tools, custom_tools, authorized_imports)
+            if all(
+                evaluate_ast(if_clause, new_state, static_tools, custom_tools, authorized_imports)
+                for if_clause in generator.ifs
+            ):
+                if index + 1 >= len(generators):
+                    yield evaluate_ast(genexp.elt, new_state, static_tools, custom_tools, authorized_imports)
+                else:
+                    next_iter_value = evaluate_ast(
+                        generators[index + 1].iter, new_state, static_tools, custom_tools, authorized_imports
+                    )
+                    yield from inner_generate(index + 1, new_state, next_iter_value)
+
+    first_iter_value = iter(evaluate_ast(generators[0].iter, state, static_tools, custom_tools, authorized_imports))
+    return inner_generate(0, state, first_iter_value)
+
+
 def evaluate_setcomp(
     setcomp: ast.SetComp,
     state: Dict[str, Any],
@@ -880,7 +1217,7 @@ def evaluate_setcomp(
     for gen in setcomp.generators:
         iter_value = evaluate_ast(gen.iter, state, static_tools, custom_tools, authorized_imports)
         for value in iter_value:
-            new_state = state.copy()
+            new_state = ScopedState(state)
             set_value(
                 gen.target,
                 value,
@@ -1010,15 +1347,35 @@ def evaluate_with(
             context.__exit__(None, None, None)
 
 
+# Maps (module id, authorized imports) to (module, number of module attributes, sanitized attributes)
+SAFE_MODULE_CACHE: Dict[Tuple[int, frozenset], Tuple[ModuleType, int, Dict[str, Any]]] = {}
+
+
 def get_safe_module(raw_module, authorized_imports, visited=None):
-    """Creates a safe copy of a module or returns the original if it's a function"""
+    """
+    Creates a safe copy of a module or returns the original if it's a function.
+
+    Sanitizing a module walks all its attributes and submodules, so the result is cached process-wide in
+    `SAFE_MODULE_CACHE` for each module and set of authorized imports. Each call still returns a new module object,
+    so that setting attributes on it does not affect other imports, but its submodules are shared. The cache entry is
+    rebuilt if attributes were added to or removed from the module since, for instance when a submodule got loaded.
+    """
     # If it's a function or non-module object, return it directly
     if not isinstance(raw_module, ModuleType):
         return raw_module
 
     # Handle circular references: Initialize visited set for the first call
     if visited is None:
-        visited = set()
+        cache_key = (id(raw_module), frozenset(authorized_imports))
+        cached_entry = SAFE_MODULE_CACHE.get(cache_key)
+        if cached_entry is not None and cached_entry[0] is raw_module and cached_entry[1] == len(vars(raw_module)):
+            safe_attributes = cached_entry[2]
+        else:
+            safe_attributes = vars(get_safe_module(raw_module, authorized_imports, visited=set())).copy()
+            SAFE_MODULE_CACHE[cache_key] = (raw_module, len(vars(raw_module)), safe_attributes)
+        safe_module = ModuleType(raw_module.__name__)
+        vars(safe_module).update(safe_attributes)
+        return safe_module
 
     module_id = id(raw_module)
     if module_id in visited:
@@ -1116,7 +1473,7 @@ def evaluate_dictcomp(
     for gen in dictcomp.generators:
         iter_value = evaluate_ast(gen.iter, state, static_tools, custom_tools, authorized_imports)
         for value in iter_value:
-            new_state = state.copy()
+            new_state = ScopedState(state)
             set_value(
                 gen.target,
                 value,
@@ -1210,230 +1567,1650 @@ def evaluate_ast(
             The list of modules that can be imported by the code. By default, only a few safe modules are allowed.
             If it contains "*", it will authorize any import. Use this at your own risk!
     """
-    if state.setdefault("_operations_count", 0) >= MAX_OPERATIONS:
-        raise InterpreterError(
-            f"Reached the max number of operations of {MAX_OPERATIONS}. Maybe there is an infinite loop somewhere in the code, or you're just asking too many calculations."
-        )
-    state["_operations_count"] += 1
-    common_params = (state, static_tools, custom_tools, authorized_imports)
-    if isinstance(expression, ast.Assign):
-        # Assignment -> we evaluate the assignment which should update the state
-        # We return the variable assigned as it may be used to determine the final result.
-        return evaluate_assign(expression, *common_params)
-    elif isinstance(expression, ast.AugAssign):
-        return evaluate_augassign(expression, *common_params)
-    elif isinstance(expression, ast.Call):
-        # Function call -> we return the value of the function call
-        return evaluate_call(expression, *common_params)
-    elif isinstance(expression, ast.Constant):
-        # Constant -> just return the value
-        return expression.value
-    elif isinstance(expression, ast.Tuple):
-        return tuple((evaluate_ast(elt, *common_params) for elt in expression.elts))
-    elif isinstance(expression, (ast.ListComp, ast.GeneratorExp)):
-        return evaluate_listcomp(expression, *common_params)
-    elif isinstance(expression, ast.DictComp):
-        return evaluate_dictcomp(expression, *common_params)
-    elif isinstance(expression, ast.SetComp):
-        return evaluate_setcomp(expression, *common_params)
-    elif isinstance(expression, ast.UnaryOp):
-        return evaluate_unaryop(expression, *common_params)
-    elif isinstance(expression, ast.Starred):
-        return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.BoolOp):
-        # Boolean operation -> evaluate the operation
-        return evaluate_boolop(expression, *common_params)
-    elif isinstance(expression, ast.Break):
-        raise BreakException()
-    elif isinstance(expression, ast.Continue):
-        raise ContinueException()
-    elif isinstance(expression, ast.BinOp):
-        # Binary operation -> execute operation
-        return evaluate_binop(expression, *common_params)
-    elif isinstance(expression, ast.Compare):
-        # Comparison -> evaluate the comparison
-        return evaluate_condition(expression, *common_params)
-    elif isinstance(expression, ast.Lambda):
-        return evaluate_lambda(expression, *common_params)
-    elif isinstance(expression, ast.FunctionDef):
-        return evaluate_function_def(expression, *common_params)
-    elif isinstance(expression, ast.Dict):
-        # Dict -> evaluate all keys and values
-        keys = (evaluate_ast(k, *common_params) for k in expression.keys)
-        values = (evaluate_ast(v, *common_params) for v in expression.values)
-        return dict(zip(keys, values))
-    elif isinstance(expression, ast.Expr):
-        # Expression -> evaluate the content
-        return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.For):
-        # For loop -> execute the loop
-        return evaluate_for(expression, *common_params)
-    elif isinstance(expression, ast.FormattedValue):
-        # Formatted value (part of f-string) -> evaluate the content and format it
-        value = evaluate_ast(expression.value, *common_params)
-        # Early return if no format spec
-        if not expression.format_spec:
-            return value
-        # Apply format specification
-        format_spec = evaluate_ast(expression.format_spec, *common_params)
-        return format(value, format_spec)
-    elif isinstance(expression, ast.If):
-        # If -> execute the right branch
-        return evaluate_if(expression, *common_params)
-    elif hasattr(ast, "Index") and isinstance(expression, ast.Index):
-        return evaluate_ast(expression.value, *common_params)
-    elif isinstance(expression, ast.JoinedStr):
-        return "".join([str(evaluate_ast(v, *common_params)) for v in expression.values])
-    elif isinstance(expression, ast.List):
-        # List -> evaluate all elements
-        return [evaluate_ast(elt, *common_params) for elt in expression.elts]
-    elif isinstance(expression, ast.Name):
-        # Name -> pick up the value in the state
-        return evaluate_name(expression, *common_params)
-    elif isinstance(expression, ast.Subscript):
-        # Subscript -> return the value of the indexing
-        return evaluate_subscript(expression, *common_params)
-    elif isinstance(expression, ast.IfExp):
-        test_val = evaluate_ast(expression.test, *common_params)
-        if test_val:
-            return evaluate_ast(expression.body, *common_params)
-        else:
-            return evaluate_ast(expression.orelse, *common_params)
-    elif isinstance(expression, ast.Attribute):
-        value = evaluate_ast(expression.value, *common_params)
-        return getattr(value, expression.attr)
-    elif isinstance(expression, ast.Slice):
-        return slice(
-            evaluate_ast(expression.lower, *common_params) if expression.lower is not None else None,
-            evaluate_ast(expression.upper, *common_params) if expression.upper is not None else None,
-            evaluate_ast(expression.step, *common_params) if expression.step is not None else None,
-        )
-    elif isinstance(expression, ast.While):
-        return evaluate_while(expression, *common_params)
-    elif isinstance(expression, (ast.Import, ast.ImportFrom)):
-        return import_modules(expression, state, authorized_imports)
-    elif isinstance(expression, ast.ClassDef):
-        return evaluate_class_def(expression, *common_params)
-    elif isinstance(expression, ast.Try):
-        return evaluate_try(expression, *common_params)
-    elif isinstance(expression, ast.Raise):
-        return evaluate_raise(expression, *common_params)
-    elif isinstance(expression, ast.Assert):
-        return evaluate_assert(expression, *common_params)
-    elif isinstance(expression, ast.With):
-        return evaluate_with(expression, *common_params)
-    elif isinstance(expression, ast.Set):
-        return set((evaluate_ast(elt, *common_params) for elt in expression.elts))
-    elif isinstance(expression, ast.Return):
-        raise ReturnException(evaluate_ast(expression.value, *common_params) if expression.value else None)
-    elif isinstance(expression, ast.Pass):
-        return None
-    elif isinstance(expression, ast.Delete):
-        return evaluate_delete(expression, *common_params)
-    else:
+    count_operation(state)
+    evaluator = AST_EVALUATORS.get(type(expression))
+    if evaluator is None:
         # For now we refuse anything else. Let's add things as we need them.
         raise InterpreterError(f"{expression.__class__.__name__} is not supported.")
+    return evaluator(expression, state, static_tools, custom_tools, authorized_imports)
 
 
-class FinalAnswerException(Exception):
-    def __init__(self, value):
-        self.value = value
+# Evaluators of the nodes that do not need a dedicated function above. All take the parameters of `evaluate_ast`.
 
 
-def evaluate_python_code(
-    code: str,
-    static_tools: Optional[Dict[str, Callable]] = None,
-    custom_tools: Optional[Dict[str, Callable]] = None,
-    state: Optional[Dict[str, Any]] = None,
-    authorized_imports: List[str] = BASE_BUILTIN_MODULES,
-    max_print_outputs_length: int = DEFAULT_MAX_LEN_OUTPUT,
-):
-    """
-    Evaluate a python expression using the content of the variables stored in a state and only evaluating a given set
-    of functions.
+def evaluate_constant(constant: ast.Constant, *common_params) -> Any:
+    return constant.value
 
-    This function will recurse through the nodes of the tree provided.
 
-    Args:
-        code (`str`):
-            The code to evaluate.
-        static_tools (`Dict[str, Callable]`):
-            The functions that may be called during the evaluation. These can also be agents in a multiagent setting.
-            These tools cannot be overwritten in the code: any assignment to their name will raise an error.
-        custom_tools (`Dict[str, Callable]`):
-            The functions that may be called during the evaluation.
-            These tools can be overwritten in the code: any assignment to their name will overwrite them.
-        state (`Dict[str, Any]`):
-            A dictionary mapping variable names to values. The `state` should contain the initial inputs but will be
-            updated by this function to contain all variables as they are evaluated.
-            The print outputs will be stored in the state under the key "_print_outputs".
-    """
-    try:
-        expression = ast.parse(code)
-    except SyntaxError as e:
-        raise InterpreterError(
-            f"Code parsing failed on line {e.lineno} due to: {type(e).__name__}\n"
-            f"{e.text}"
-            f"{' ' * (e.offset or 0)}^\n"
-            f"Error: {str(e)}"
-        )
+def evaluate_tuple(tuple_node: ast.Tuple, *common_params) -> Tuple[Any, ...]:
+    return tuple((evaluate_ast(elt, *common_params) for elt in tuple_node.elts))
 
-    if state is None:
-        state = {}
-    static_tools = static_tools.copy() if static_tools is not None else {}
-    custom_tools = custom_tools if custom_tools is not None else {}
-    result = None
-    state["_print_outputs"] = PrintContainer()
 
-    if "final_answer" in static_tools:
-        previous_final_answer = static_tools["final_answer"]
+def evaluate_list(list_node: ast.List, *common_params) -> List[Any]:
+    return [evaluate_ast(elt, *common_params) for elt in list_node.elts]
 
-        def final_answer(value):
-            raise FinalAnswerException(previous_final_answer(value))
 
-        static_tools["final_answer"] = final_answer
+def evaluate_set(set_node: ast.Set, *common_params) -> Set[Any]:
+    return set((evaluate_ast(elt, *common_params) for elt in set_node.elts))
 
-    try:
-        for node in expression.body:
-            result = evaluate_ast(node, state, static_tools, custom_tools, authorized_imports)
-        state["_print_outputs"].value = truncate_content(
-            str(state["_print_outputs"]), max_length=max_print_outputs_length
-        )
-        is_final_answer = False
-        return result, is_final_answer
-    except FinalAnswerException as e:
-        state["_print_outputs"].value = truncate_content(
-            str(state["_print_outputs"]), max_length=max_print_outputs_length
-        )
-        is_final_answer = True
-        return e.value, is_final_answer
-    except Exception as e:
-        state["_print_outputs"].value = truncate_content(
-            str(state["_print_outputs"]), max_length=max_print_outputs_length
-        )
+
+def evaluate_dict(dict_node: ast.Dict, *common_params) -> Dict[Any, Any]:
+    keys = (evaluate_ast(k, *common_params) for k in dict_node.keys)
+    values = (evaluate_ast(v, *common_params) for v in dict_node.values)
+    return dict(zip(keys, values))
+
+
+def evaluate_value(node: Union[ast.Expr, ast.Starred], *common_params) -> Any:
+    return evaluate_ast(node.value, *common_params)
+
+
+def evaluate_break(node: ast.Break, *common_params) -> None:
+    raise BreakException()
+
+
+def evaluate_continue(node: ast.Continue, *common_params) -> None:
+    raise ContinueException()
+
+
+def evaluate_return(node: ast.Return, *common_params) -> None:
+    raise ReturnException(evaluate_ast(node.value, *common_params) if node.value else None)
+
+
+def evaluate_pass(node: ast.Pass, *common_params) -> None:
+    return None
+
+
+def evaluate_formatted_value(formatted_value: ast.FormattedValue, *common_params) -> Any:
+    # Formatted value (part of f-string) -> evaluate the content and format it
+    value = evaluate_ast(formatted_value.value, *common_params)
+    # Early return if no format spec
+    if not formatted_value.format_spec:
+        return value
+    # Apply format specification
+    format_spec = evaluate_ast(formatted_value.format_spec, *common_params)
+    return format(value, format_spec)
+
+
+def evaluate_joined_str(joined_str: ast.JoinedStr, *common_params) -> str:
+    return "".join([str(evaluate_ast(v, *common_params)) for v in joined_str.values])
+
+
+def evaluate_if_exp(if_exp: ast.IfExp, *common_params) -> Any:
+    if evaluate_ast(if_exp.test, *common_params):
+        return evaluate_ast(if_exp.body, *common_params)
+    else:
+        return evaluate_ast(if_exp.orelse, *common_params)
+
+
+def evaluate_attribute(attribute: ast.Attribute, *common_params) -> Any:
+    return getattr(evaluate_ast(attribute.value, *common_params), attribute.attr)
+
+
+def evaluate_slice(slice_node: ast.Slice, *common_params) -> slice:
+    return slice(
+        evaluate_ast(slice_node.lower, *common_params) if slice_node.lower is not None else None,
+        evaluate_ast(slice_node.upper, *common_params) if slice_node.upper is not None else None,
+        evaluate_ast(slice_node.step, *common_params) if slice_node.step is not None else None,
+    )
+
+
+def evaluate_import(
+    expression: Union[ast.Import, ast.ImportFrom],
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    custom_tools: Dict[str, Callable],
+    authorized_imports: List[str],
+) -> None:
+    return import_modules(expression, state, authorized_imports)
+
+
+# Maps each supported node type to its evaluator, so that `evaluate_ast` dispatches with a single dict lookup
+AST_EVALUATORS = {
+    ast.Assign: evaluate_assign,
+    ast.AugAssign: evaluate_augassign,
+    ast.Call: evaluate_call,
+    ast.Constant: evaluate_constant,
+    ast.Tuple: evaluate_tuple,
+    ast.ListComp: evaluate_listcomp,
+    ast.GeneratorExp: evaluate_generatorexp,
+    ast.DictComp: evaluate_dictcomp,
+    ast.SetComp: evaluate_setcomp,
+    ast.UnaryOp: evaluate_unaryop,
+    ast.Starred: evaluate_value,
+    ast.BoolOp: evaluate_boolop,
+    ast.Break: evaluate_break,
+    ast.Continue: evaluate_continue,
+    ast.BinOp: evaluate_binop,
+    ast.Compare: evaluate_condition,
+    ast.Lambda: evaluate_lambda,
+    ast.FunctionDef: evaluate_function_def,
+    ast.Dict: evaluate_dict,
+    ast.Expr: evaluate_value,
+    ast.For: evaluate_for,
+    ast.FormattedValue: evaluate_formatted_value,
+    ast.If: evaluate_if,
+    ast.JoinedStr: evaluate_joined_str,
+    ast.List: evaluate_list,
+    ast.Name: evaluate_name,
+    ast.Subscript: evaluate_subscript,
+    ast.IfExp: evaluate_if_exp,
+    ast.Attribute: evaluate_attribute,
+    ast.Slice: evaluate_slice,
+    ast.While: evaluate_while,
+    ast.Import: evaluate_import,
+    ast.ImportFrom: evaluate_import,
+    ast.ClassDef: evaluate_class_def,
+    ast.Try: evaluate_try,
+    ast.Raise: evaluate_raise,
+    ast.Assert: evaluate_assert,
+    ast.With: evaluate_with,
+    ast.Set: evaluate_set,
+    ast.Return: evaluate_return,
+    ast.Pass: evaluate_pass,
+    ast.Delete: evaluate_delete,
+}
+
+
+# The closure-compiling engine below turns each node into a closure once, so that running the code does not need to
+# dispatch on the node type again. Closures take the same `(state, static_tools, custom_tools, authorized_imports)`
+# parameters as `evaluate_ast`. Nodes that have no dedicated compiler fall back to `evaluate_ast`, so both engines
+# share their authorization checks and raise the same errors.
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.FloorDiv: operator.floordiv,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+}
+
+AUGMENTED_OPERATORS = {
+    ast.Add: operator.iadd,
+    ast.Sub: operator.isub,
+    ast.Mult: operator.imul,
+    ast.Div: operator.itruediv,
+    ast.Mod: operator.imod,
+    ast.Pow: operator.ipow,
+    ast.FloorDiv: operator.ifloordiv,
+    ast.BitAnd: operator.iand,
+    ast.BitOr: operator.ior,
+    ast.BitXor: operator.ixor,
+    ast.LShift: operator.ilshift,
+    ast.RShift: operator.irshift,
+}
+
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: lambda operand: operand,
+    ast.Not: operator.not_,
+    ast.Invert: operator.invert,
+}
+
+COMPARISON_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+
+
+def count_operation(state: Dict[str, Any]) -> None:
+    if parallel_map_calls:
+        # Functions of the code may run in several threads of `parallel_map`: count their operations one at a time
+        with operations_lock:
+            operations_count = increment_operations_count(state)
+    else:
+        operations_count = increment_operations_count(state)
+    if operations_count % BUDGET_CHECK_INTERVAL == 0:
+        budget = state.get("_execution_budget")
+        if budget is not None:
+            budget.check(operations_count)
+
+
+def increment_operations_count(state: Dict[str, Any]) -> int:
+    # The operations of functions and comprehensions count in the state of the whole code action
+    if type(state) is ScopedState:
+        state = state.root
+    operations_count = state.setdefault("_operations_count", 0)
+    if operations_count >= MAX_OPERATIONS:
         raise InterpreterError(
-            f"Code execution failed at line '{ast.get_source_segment(code, node)}' due to: {type(e).__name__}: {e}"
+            f"Reached the max number of operations of {MAX_OPERATIONS}. Maybe there is an infinite loop somewhere in the code, or you're just asking too many calculations."
         )
+    state["_operations_count"] = operations_count + 1
+    return operations_count
 
 
-class LocalPythonInterpreter:
-    def __init__(
-        self,
-        additional_authorized_imports: List[str],
-        max_print_outputs_length: Optional[int] = None,
-    ):
-        self.custom_tools = {}
-        self.state = {}
-        self.max_print_outputs_length = max_print_outputs_length
-        if max_print_outputs_length is None:
-            self.max_print_outputs_length = DEFAULT_MAX_LEN_OUTPUT
-        self.additional_authorized_imports = additional_authorized_imports
-        self.authorized_imports = list(set(BASE_BUILTIN_MODULES) | set(self.additional_authorized_imports))
-        # TODO: assert self.authorized imports are all installed locally
-        self.static_tools = None
+def compile_ast(expression: ast.AST) -> Callable:
+    """
+    Compile an abstract syntax tree into a closure that evaluates it.
 
-    def __call__(self, code_action: str, additional_variables: Dict[str, Any]) -> Tuple[Any, str, bool]:
-        self.state.update(additional_variables)
+    The returned closure is called as `closure(state, static_tools, custom_tools, authorized_imports)` and behaves
+    like `evaluate_ast(expression, state, static_tools, custom_tools, authorized_imports)`. Compiling never raises:
+    unsupported nodes raise their error when the closure runs, exactly as they would in `evaluate_ast`.
+
+    Operations are counted once per executed statement, loop iteration and comprehension element, instead of once
+    per node.
+
+    Args:
+        expression (`ast.AST`):
+            The code to compile, as an abstract syntax tree.
+    """
+    compiler = COMPILERS.get(type(expression))
+    if compiler is None:
+        return compile_fallback(expression)
+    return compiler(expression)
+
+
+def compile_fallback(expression: ast.AST) -> Callable:
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return evaluate_ast(expression, state, static_tools, custom_tools, authorized_imports)
+
+    return run
+
+
+def compile_body(body: List[ast.stmt]) -> List[Callable]:
+    return [compile_ast(node) for node in body]
+
+
+def compile_constant(constant: ast.Constant) -> Callable:
+    value = constant.value
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return value
+
+    return run
+
+
+def compile_name(name: ast.Name) -> Callable:
+    name_id = name.id
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        try:
+            return state[name_id]
+        except KeyError:
+            return evaluate_name(name, state, static_tools, custom_tools, authorized_imports)
+
+    return run
+
+
+def compile_attribute(attribute: ast.Attribute) -> Callable:
+    get_value = compile_ast(attribute.value)
+    attr = attribute.attr
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return getattr(get_value(state, static_tools, custom_tools, authorized_imports), attr)
+
+    return run
+
+
+def compile_subscript(subscript: ast.Subscript) -> Callable:
+    get_index = compile_ast(subscript.slice)
+    get_value = compile_ast(subscript.value)
+    inline_cache = InlineCache()
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        index = get_index(state, static_tools, custom_tools, authorized_imports)
+        value = get_value(state, static_tools, custom_tools, authorized_imports)
+        return get_subscript_value(value, index, inline_cache)
+
+    return run
+
+
+def compile_slice(slice_node: ast.Slice) -> Callable:
+    get_bounds = [
+        compile_ast(bound) if bound is not None else None
+        for bound in (slice_node.lower, slice_node.upper, slice_node.step)
+    ]
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return slice(
+            *(
+                get_bound(state, static_tools, custom_tools, authorized_imports) if get_bound is not None else None
+                for get_bound in get_bounds
+            )
+        )
+
+    return run
+
+
+def compile_starred(starred: ast.Starred) -> Callable:
+    return compile_ast(starred.value)
+
+
+def compile_expr(expr: ast.Expr) -> Callable:
+    return compile_ast(expr.value)
+
+
+def compile_tuple(tuple_node: ast.Tuple) -> Callable:
+    get_elements = [compile_ast(elt) for elt in tuple_node.elts]
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return tuple(
+            [get_element(state, static_tools, custom_tools, authorized_imports) for get_element in get_elements]
+        )
+
+    return run
+
+
+def compile_list(list_node: ast.List) -> Callable:
+    get_elements = [compile_ast(elt) for elt in list_node.elts]
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return [get_element(state, static_tools, custom_tools, authorized_imports) for get_element in get_elements]
+
+    return run
+
+
+def compile_set(set_node: ast.Set) -> Callable:
+    get_elements = [compile_ast(elt) for elt in set_node.elts]
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return {get_element(state, static_tools, custom_tools, authorized_imports) for get_element in get_elements}
+
+    return run
+
+
+def compile_dict(dict_node: ast.Dict) -> Callable:
+    if any(key is None for key in dict_node.keys):
+        # Dictionary unpacking (`{**other}`) is not supported: let `evaluate_ast` raise the usual error.
+        return compile_fallback(dict_node)
+    get_items = [(compile_ast(key), compile_ast(value)) for key, value in zip(dict_node.keys, dict_node.values)]
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return {
+            get_key(state, static_tools, custom_tools, authorized_imports): get_value(
+                state, static_tools, custom_tools, authorized_imports
+            )
+            for get_key, get_value in get_items
+        }
+
+    return run
+
+
+def compile_joined_str(joined_str: ast.JoinedStr) -> Callable:
+    get_values = [compile_ast(value) for value in joined_str.values]
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return "".join(
+            [str(get_value(state, static_tools, custom_tools, authorized_imports)) for get_value in get_values]
+        )
+
+    return run
+
+
+def compile_formatted_value(formatted_value: ast.FormattedValue) -> Callable:
+    get_value = compile_ast(formatted_value.value)
+    if not formatted_value.format_spec:
+        return get_value
+    get_format_spec = compile_ast(formatted_value.format_spec)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        value = get_value(state, static_tools, custom_tools, authorized_imports)
+        return format(value, get_format_spec(state, static_tools, custom_tools, authorized_imports))
+
+    return run
+
+
+def compile_if_exp(if_exp: ast.IfExp) -> Callable:
+    get_test = compile_ast(if_exp.test)
+    get_body = compile_ast(if_exp.body)
+    get_orelse = compile_ast(if_exp.orelse)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        if get_test(state, static_tools, custom_tools, authorized_imports):
+            return get_body(state, static_tools, custom_tools, authorized_imports)
+        return get_orelse(state, static_tools, custom_tools, authorized_imports)
+
+    return run
+
+
+def compile_unaryop(expression: ast.UnaryOp) -> Callable:
+    unary_operator = UNARY_OPERATORS.get(type(expression.op))
+    if unary_operator is None:
+        return compile_fallback(expression)
+    get_operand = compile_ast(expression.operand)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return unary_operator(get_operand(state, static_tools, custom_tools, authorized_imports))
+
+    return run
+
+
+def compile_binop(binop: ast.BinOp) -> Callable:
+    binary_operator = BINARY_OPERATORS.get(type(binop.op))
+    if binary_operator is None:
+        return compile_fallback(binop)
+    get_left = compile_ast(binop.left)
+    get_right = compile_ast(binop.right)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return binary_operator(
+            get_left(state, static_tools, custom_tools, authorized_imports),
+            get_right(state, static_tools, custom_tools, authorized_imports),
+        )
+
+    return run
+
+
+def compile_boolop(node: ast.BoolOp) -> Callable:
+    get_values = [compile_ast(value) for value in node.values]
+    if isinstance(node.op, ast.And):
+
+        def run(state, static_tools, custom_tools, authorized_imports):
+            for get_value in get_values:
+                if not get_value(state, static_tools, custom_tools, authorized_imports):
+                    return False
+            return True
+
+    elif isinstance(node.op, ast.Or):
+
+        def run(state, static_tools, custom_tools, authorized_imports):
+            for get_value in get_values:
+                if get_value(state, static_tools, custom_tools, authorized_imports):
+                    return True
+            return False
+
+    else:
+        return compile_fallback(node)
+    return run
+
+
+def compile_compare(condition: ast.Compare) -> Callable:
+    comparison_operators = [COMPARISON_OPERATORS.get(type(op)) for op in condition.ops]
+    if None in comparison_operators:
+        return compile_fallback(condition)
+    get_left = compile_ast(condition.left)
+    comparisons = [
+        (comparison_operator, compile_ast(comparator))
+        for comparison_operator, comparator in zip(comparison_operators, condition.comparators)
+    ]
+
+    if len(comparisons) == 1:
+        ((comparison_operator, get_right),) = comparisons
+
+        def run(state, static_tools, custom_tools, authorized_imports):
+            return comparison_operator(
+                get_left(state, static_tools, custom_tools, authorized_imports),
+                get_right(state, static_tools, custom_tools, authorized_imports),
+            )
+
+        return run
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        result = True
+        left = get_left(state, static_tools, custom_tools, authorized_imports)
+        for i, (comparison_operator, get_right) in enumerate(comparisons):
+            right = get_right(state, static_tools, custom_tools, authorized_imports)
+            current_result = comparison_operator(left, right)
+            if current_result is False:
+                return False
+            result = current_result if i == 0 else (result and current_result)
+            left = right
+        return result
+
+    return run
+
+
+def compile_call(call: ast.Call) -> Callable:
+    if isinstance(call.func, ast.Attribute):
+        get_obj = compile_ast(call.func.value)
+        func_name = call.func.attr
+
+        def get_func(state, static_tools, custom_tools, authorized_imports):
+            obj = get_obj(state, static_tools, custom_tools, authorized_imports)
+            if not hasattr(obj, func_name):
+                raise InterpreterError(f"Object {obj} has no attribute {func_name}")
+            return getattr(obj, func_name)
+
+    elif isinstance(call.func, ast.Name):
+        func_name = call.func.id
+
+        def get_func(state, static_tools, custom_tools, authorized_imports):
+            if func_name in state:
+                return state[func_name]
+            elif func_name in static_tools:
+                return static_tools[func_name]
+            elif func_name in custom_tools:
+                return custom_tools[func_name]
+            elif func_name in ERRORS:
+                return ERRORS[func_name]
+            raise InterpreterError(
+                f"It is not permitted to evaluate other functions than the provided tools or functions defined/imported in previous code (tried to execute {func_name})."
+            )
+
+    elif isinstance(call.func, ast.Subscript):
+        get_container = compile_ast(call.func.value)
+        get_index = compile_ast(call.func.slice)
+        func_name = None
+
+        def get_func(state, static_tools, custom_tools, authorized_imports):
+            value = get_container(state, static_tools, custom_tools, authorized_imports)
+            index = get_index(state, static_tools, custom_tools, authorized_imports)
+            if isinstance(value, (list, tuple)):
+                func = value[index]
+            else:
+                raise InterpreterError(f"Cannot subscript object of type {type(value).__name__}")
+            if not callable(func):
+                raise InterpreterError(f"This is not a correct function: {call.func}).")
+            return func
+
+    else:
+        return compile_fallback(call)
+
+    get_args = [(isinstance(arg, ast.Starred), compile_ast(arg)) for arg in call.args]
+    has_starred_args = any(is_starred for is_starred, _ in get_args)
+    get_kwargs = [(keyword.arg, compile_ast(keyword.value)) for keyword in call.keywords]
+    inline_cache = InlineCache()
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        func = get_func(state, static_tools, custom_tools, authorized_imports)
+        if has_starred_args:
+            args = []
+            for is_starred, get_arg in get_args:
+                if is_starred:
+                    args.extend(get_arg(state, static_tools, custom_tools, authorized_imports))
+                else:
+                    args.append(get_arg(state, static_tools, custom_tools, authorized_imports))
+        else:
+            args = [get_arg(state, static_tools, custom_tools, authorized_imports) for _, get_arg in get_args]
+        kwargs = {
+            name: get_kwarg(state, static_tools, custom_tools, authorized_imports) for name, get_kwarg in get_kwargs
+        }
+        return call_function(func, func_name, args, kwargs, state, static_tools, inline_cache)
+
+    return run
+
+
+def compile_lambda(lambda_expression: ast.Lambda) -> Callable:
+    args = [arg.arg for arg in lambda_expression.args.args]
+    get_body = compile_ast(lambda_expression.body)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        def lambda_func(*values: Any) -> Any:
+            new_state = ScopedState(state)
+            for arg, value in zip(args, values):
+                new_state[arg] = value
+            return get_body(new_state, static_tools, custom_tools, authorized_imports)
+
+        return lambda_func
+
+    return run
+
+
+def compile_target(target: ast.AST) -> Callable:
+    """Compile an assignment target into a closure called as `closure(value, state, static_tools, custom_tools, authorized_imports)`."""
+    if isinstance(target, ast.Name):
+        target_id = target.id
+
+        def set_target(value, state, static_tools, custom_tools, authorized_imports):
+            if target_id in static_tools:
+                raise InterpreterError(
+                    f"Cannot assign to name '{target_id}': doing this would erase the existing tool!"
+                )
+            state[target_id] = value
+
+    elif isinstance(target, ast.Tuple):
+        set_elements = [compile_target(elt) for elt in target.elts]
+
+        def set_target(value, state, static_tools, custom_tools, authorized_imports):
+            if not isinstance(value, tuple):
+                if hasattr(value, "__iter__") and not isinstance(value, (str, bytes)):
+                    value = tuple(value)
+                else:
+                    raise InterpreterError("Cannot unpack non-tuple value")
+            if len(set_elements) != len(value):
+                raise InterpreterError("Cannot unpack tuple of wrong size")
+            for set_element, element in zip(set_elements, value):
+                set_element(element, state, static_tools, custom_tools, authorized_imports)
+
+    elif isinstance(target, ast.Subscript):
+        get_obj = compile_ast(target.value)
+        get_key = compile_ast(target.slice)
+
+        def set_target(value, state, static_tools, custom_tools, authorized_imports):
+            obj = get_obj(state, static_tools, custom_tools, authorized_imports)
+            key = get_key(state, static_tools, custom_tools, authorized_imports)
+            obj[key] = value
+
+    elif isinstance(target, ast.Attribute):
+        get_obj = compile_ast(target.value)
+        attr = target.attr
+
+        def set_target(value, state, static_tools, custom_tools, authorized_imports):
+            setattr(get_obj(state, static_tools, custom_tools, authorized_imports), attr, value)
+
+    else:
+
+        def set_target(value, state, static_tools, custom_tools, authorized_imports):
+            set_value(target, value, state, static_tools, custom_tools, authorized_imports)
+
+    return set_target
+
+
+def compile_assign(assign: ast.Assign) -> Callable:
+    if len(assign.targets) != 1:
+        return compile_fallback(assign)
+    get_value = compile_ast(assign.value)
+    set_target = compile_target(assign.targets[0])
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        result = get_value(state, static_tools, custom_tools, authorized_imports)
+        set_target(result, state, static_tools, custom_tools, authorized_imports)
+        return result
+
+    return run
+
+
+def compile_augassign(expression: ast.AugAssign) -> Callable:
+    augmented_operator = AUGMENTED_OPERATORS.get(type(expression.op))
+    target = expression.target
+    if augmented_operator is None or not isinstance(target, (ast.Name, ast.Subscript, ast.Attribute)):
+        return compile_fallback(expression)
+
+    if isinstance(target, ast.Name):
+        target_id = target.id
+
+        def get_current_value(state, static_tools, custom_tools, authorized_imports):
+            return state.get(target_id, 0)
+
+    elif isinstance(target, ast.Subscript):
+        get_obj = compile_ast(target.value)
+        get_key = compile_ast(target.slice)
+
+        def get_current_value(state, static_tools, custom_tools, authorized_imports):
+            obj = get_obj(state, static_tools, custom_tools, authorized_imports)
+            return obj[get_key(state, static_tools, custom_tools, authorized_imports)]
+
+    else:
+        get_obj = compile_ast(target.value)
+        attr = target.attr
+
+        def get_current_value(state, static_tools, custom_tools, authorized_imports):
+            return getattr(get_obj(state, static_tools, custom_tools, authorized_imports), attr)
+
+    get_value = compile_ast(expression.value)
+    set_target = compile_target(target)
+    is_add = isinstance(expression.op, ast.Add)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        current_value = get_current_value(state, static_tools, custom_tools, authorized_imports)
+        value_to_add = get_value(state, static_tools, custom_tools, authorized_imports)
+        if is_add and isinstance(current_value, list) and not isinstance(value_to_add, list):
+            raise InterpreterError(f"Cannot add non-list value {value_to_add} to a list.")
+        current_value = augmented_operator(current_value, value_to_add)
+        set_target(current_value, state, static_tools, custom_tools, authorized_imports)
+        return current_value
+
+    return run
+
+
+def compile_if(if_statement: ast.If) -> Callable:
+    get_test = compile_ast(if_statement.test)
+    body = compile_body(if_statement.body)
+    orelse = compile_body(if_statement.orelse)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        result = None
+        for line in body if get_test(state, static_tools, custom_tools, authorized_imports) else orelse:
+            count_operation(state)
+            line_result = line(state, static_tools, custom_tools, authorized_imports)
+            if line_result is not None:
+                result = line_result
+        return result
+
+    return run
+
+
+def compile_for(for_loop: ast.For) -> Callable:
+    get_iterator = compile_ast(for_loop.iter)
+    set_target = compile_target(for_loop.target)
+    body = compile_body(for_loop.body)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        result = None
+        iterator = get_iterator(state, static_tools, custom_tools, authorized_imports)
+        for counter in iterator:
+            set_target(counter, state, static_tools, custom_tools, authorized_imports)
+            try:
+                for line in body:
+                    count_operation(state)
+                    line_result = line(state, static_tools, custom_tools, authorized_imports)
+                    if line_result is not None:
+                        result = line_result
+            except BreakException:
+                break
+            except ContinueException:
+                continue
+        return result
+
+    return run
+
+
+def compile_while(while_loop: ast.While) -> Callable:
+    get_test = compile_ast(while_loop.test)
+    body = compile_body(while_loop.body)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        iterations = 0
+        while get_test(state, static_tools, custom_tools, authorized_imports):
+            try:
+                for line in body:
+                    count_operation(state)
+                    line(state, static_tools, custom_tools, authorized_imports)
+            except BreakException:
+                return None
+            except ContinueException:
+                pass
+            iterations += 1
+            if iterations > MAX_WHILE_ITERATIONS:
+                raise InterpreterError(f"Maximum number of {MAX_WHILE_ITERATIONS} iterations in While loop exceeded")
+        return None
+
+    return run
+
+
+def compile_comprehension_target(target: ast.AST) -> Optional[Callable]:
+    """Compile the target of a list comprehension or generator expression, which only supports names and tuples of names."""
+    if isinstance(target, ast.Name):
+        target_id = target.id
+
+        def set_target(value, new_state):
+            new_state[target_id] = value
+
+        return set_target
+    elif isinstance(target, ast.Tuple) and all(isinstance(elem, ast.Name) for elem in target.elts):
+        target_ids = [elem.id for elem in target.elts]
+
+        def set_target(value, new_state):
+            for idx, target_id in enumerate(target_ids):
+                new_state[target_id] = value[idx]
+
+        return set_target
+    return None
+
+
+def compile_listcomp(listcomp: ast.ListComp) -> Callable:
+    generators = []
+    for generator in listcomp.generators:
+        set_target = compile_comprehension_target(generator.target)
+        if set_target is None:
+            return compile_fallback(listcomp)
+        generators.append((compile_ast(generator.iter), set_target, compile_body(generator.ifs)))
+    get_element = compile_ast(listcomp.elt)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        def inner_evaluate(index: int, current_state: Dict[str, Any]) -> List[Any]:
+            if index >= len(generators):
+                return [get_element(current_state, static_tools, custom_tools, authorized_imports)]
+            get_iterator, set_target, ifs = generators[index]
+            result = []
+            for value in get_iterator(current_state, static_tools, custom_tools, authorized_imports):
+                count_operation(state)
+                new_state = ScopedState(current_state)
+                set_target(value, new_state)
+                if all(if_clause(new_state, static_tools, custom_tools, authorized_imports) for if_clause in ifs):
+                    result.extend(inner_evaluate(index + 1, new_state))
+            return result
+
+        return inner_evaluate(0, state)
+
+    return run
+
+
+def compile_generatorexp(genexp: ast.GeneratorExp) -> Callable:
+    generators = [
+        (compile_ast(gen.iter), compile_target(gen.target), compile_body(gen.ifs)) for gen in genexp.generators
+    ]
+    get_element = compile_ast(genexp.elt)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        def inner_generate(index: int, current_state: Dict[str, Any], iter_value: Any) -> Iterator[Any]:
+            _, set_target, ifs = generators[index]
+            for value in iter_value:
+                count_operation(state)
+                new_state = ScopedState(current_state)
+                set_target(value, new_state, static_tools, custom_tools, authorized_imports)
+                if all(if_clause(new_state, static_tools, custom_tools, authorized_imports) for if_clause in ifs):
+                    if index + 1 >= len(generators):
+                        yield get_element(new_state, static_tools, custom_tools, authorized_imports)
+                    else:
+                        get_iterator = generators[index + 1][0]
+                        next_iter_value = get_iterator(new_state, static_tools, custom_tools, authorized_imports)
+                        yield from inner_generate(index + 1, new_state, next_iter_value)
+
+        get_first_iterator = generators[0][0]
+        return inner_generate(
+            0, state, iter(get_first_iterator(state, static_tools, custom_tools, authorized_imports))
+        )
+
+    return run
+
+
+def compile_setcomp(setcomp: ast.SetComp) -> Callable:
+    generators = [
+        (compile_ast(gen.iter), compile_target(gen.target), compile_body(gen.ifs)) for gen in setcomp.generators
+    ]
+    get_element = compile_ast(setcomp.elt)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        result = set()
+        for get_iterator, set_target, ifs in generators:
+            for value in get_iterator(state, static_tools, custom_tools, authorized_imports):
+                count_operation(state)
+                new_state = ScopedState(state)
+                set_target(value, new_state, static_tools, custom_tools, authorized_imports)
+                if all(if_clause(new_state, static_tools, custom_tools, authorized_imports) for if_clause in ifs):
+                    result.add(get_element(new_state, static_tools, custom_tools, authorized_imports))
+        return result
+
+    return run
+
+
+def compile_dictcomp(dictcomp: ast.DictComp) -> Callable:
+    generators = [
+        (compile_ast(gen.iter), compile_target(gen.target), compile_body(gen.ifs)) for gen in dictcomp.generators
+    ]
+    get_key = compile_ast(dictcomp.key)
+    get_value = compile_ast(dictcomp.value)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        result = {}
+        for get_iterator, set_target, ifs in generators:
+            for value in get_iterator(state, static_tools, custom_tools, authorized_imports):
+                count_operation(state)
+                new_state = ScopedState(state)
+                set_target(value, new_state, static_tools, custom_tools, authorized_imports)
+                if all(if_clause(new_state, static_tools, custom_tools, authorized_imports) for if_clause in ifs):
+                    key = get_key(new_state, static_tools, custom_tools, authorized_imports)
+                    result[key] = get_value(new_state, static_tools, custom_tools, authorized_imports)
+        return result
+
+    return run
+
+
+def compile_function(func_def: ast.FunctionDef) -> Callable:
+    """Compile a function definition into a closure that builds the function, like `create_function`."""
+    get_defaults = [compile_ast(d) for d in func_def.args.defaults]
+    body = compile_body(func_def.body)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        def new_func(*args: Any, **kwargs: Any) -> Any:
+            func_state = ScopedState(state)
+            default_values = [
+                get_default(state, static_tools, custom_tools, authorized_imports) for get_default in get_defaults
+            ]
+            bind_function_arguments(func_def, func_state, args, kwargs, default_values)
+
+            result = None
+            try:
+                for stmt in body:
+                    count_operation(func_state)
+                    result = stmt(func_state, static_tools, custom_tools, authorized_imports)
+            except ReturnException as e:
+                result = e.value
+
+            if func_def.name == "__init__":
+                return None
+
+            return result
+
+        return new_func
+
+    return run
+
+
+def compile_function_def(func_def: ast.FunctionDef) -> Callable:
+    create = compile_function(func_def)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        custom_tools[func_def.name] = create(state, static_tools, custom_tools, authorized_imports)
+        return custom_tools[func_def.name]
+
+    return run
+
+
+def compile_class_def(class_def: ast.ClassDef) -> Callable:
+    get_bases = [compile_ast(base) for base in class_def.bases]
+    get_members = []
+    for stmt in class_def.body:
+        if isinstance(stmt, ast.FunctionDef):
+            get_members.append((stmt.name, compile_function_def(stmt)))
+        elif isinstance(stmt, ast.Assign):
+            for target in stmt.targets:
+                if isinstance(target, ast.Name):
+                    get_members.append((target.id, compile_ast(stmt.value)))
+                elif isinstance(target, ast.Attribute):
+                    get_members.append((target.attr, compile_ast(stmt.value)))
+        else:
+            # Let `evaluate_ast` raise the error for unsupported statements once the class is defined.
+            return compile_fallback(class_def)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        bases = [get_base(state, static_tools, custom_tools, authorized_imports) for get_base in get_bases]
+        class_dict = {
+            name: get_member(state, static_tools, custom_tools, authorized_imports) for name, get_member in get_members
+        }
+        new_class = type(class_def.name, tuple(bases), class_dict)
+        state[class_def.name] = new_class
+        return new_class
+
+    return run
+
+
+def compile_try(try_node: ast.Try) -> Callable:
+    body = compile_body(try_node.body)
+    handlers = [
+        (compile_ast(handler.type) if handler.type is not None else None, handler.name, compile_body(handler.body))
+        for handler in try_node.handlers
+    ]
+    orelse = compile_body(try_node.orelse)
+    finalbody = compile_body(try_node.finalbody)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        try:
+            for stmt in body:
+                count_operation(state)
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        except Exception as e:
+            matched = False
+            for get_type, name, handler_body in handlers:
+                if get_type is None or isinstance(e, get_type(state, static_tools, custom_tools, authorized_imports)):
+                    matched = True
+                    if name:
+                        state[name] = e
+                    for stmt in handler_body:
+                        count_operation(state)
+                        stmt(state, static_tools, custom_tools, authorized_imports)
+                    break
+            if not matched:
+                raise e
+        else:
+            for stmt in orelse:
+                count_operation(state)
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        finally:
+            for stmt in finalbody:
+                count_operation(state)
+                stmt(state, static_tools, custom_tools, authorized_imports)
+
+    return run
+
+
+def compile_raise(raise_node: ast.Raise) -> Callable:
+    get_exc = compile_ast(raise_node.exc) if raise_node.exc is not None else None
+    get_cause = compile_ast(raise_node.cause) if raise_node.cause is not None else None
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        exc = get_exc(state, static_tools, custom_tools, authorized_imports) if get_exc is not None else None
+        cause = get_cause(state, static_tools, custom_tools, authorized_imports) if get_cause is not None else None
+        if exc is not None:
+            if cause is not None:
+                raise exc from cause
+            else:
+                raise exc
+        else:
+            raise InterpreterError("Re-raise is not supported without an active exception")
+
+    return run
+
+
+def compile_assert(assert_node: ast.Assert) -> Callable:
+    get_test = compile_ast(assert_node.test)
+    get_msg = compile_ast(assert_node.msg) if assert_node.msg else None
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        if not get_test(state, static_tools, custom_tools, authorized_imports):
+            if get_msg is not None:
+                raise AssertionError(get_msg(state, static_tools, custom_tools, authorized_imports))
+            else:
+                # Include the failing condition in the assertion message
+                raise AssertionError(f"Assertion failed: {ast.unparse(assert_node.test)}")
+
+    return run
+
+
+def compile_with(with_node: ast.With) -> Callable:
+    items = [
+        (compile_ast(item.context_expr), item.optional_vars.id if item.optional_vars else None)
+        for item in with_node.items
+        if item.optional_vars is None or isinstance(item.optional_vars, ast.Name)
+    ]
+    if len(items) != len(with_node.items):
+        return compile_fallback(with_node)
+    body = compile_body(with_node.body)
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        contexts = []
+        for get_context_expr, name in items:
+            context_var = get_context_expr(state, static_tools, custom_tools, authorized_imports).__enter__()
+            if name is not None:
+                state[name] = context_var
+            contexts.append(context_var)
+        try:
+            for stmt in body:
+                count_operation(state)
+                stmt(state, static_tools, custom_tools, authorized_imports)
+        except Exception as e:
+            for context in reversed(contexts):
+                context.__exit__(type(e), e, e.__traceback__)
+            raise
+        else:
+            for context in reversed(contexts):
+                context.__exit__(None, None, None)
+
+    return run
+
+
+def compile_import(expression: Union[ast.Import, ast.ImportFrom]) -> Callable:
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return import_modules(expression, state, authorized_imports)
+
+    return run
+
+
+def compile_return(return_node: ast.Return) -> Callable:
+    get_value = compile_ast(return_node.value) if return_node.value else None
+
+    def run(state, static_tools, custom_tools, authorized_imports):
+        raise ReturnException(
+            get_value(state, static_tools, custom_tools, authorized_imports) if get_value is not None else None
+        )
+
+    return run
+
+
+def compile_break(break_node: ast.Break) -> Callable:
+    def run(state, static_tools, custom_tools, authorized_imports):
+        raise BreakException()
+
+    return run
+
+
+def compile_continue(continue_node: ast.Continue) -> Callable:
+    def run(state, static_tools, custom_tools, authorized_imports):
+        raise ContinueException()
+
+    return run
+
+
+def compile_pass(pass_node: ast.Pass) -> Callable:
+    def run(state, static_tools, custom_tools, authorized_imports):
+        return None
+
+    return run
+
+
+COMPILERS = {
+    ast.Assign: compile_assign,
+    ast.AugAssign: compile_augassign,
+    ast.Call: compile_call,
+    ast.Constant: compile_constant,
+    ast.Tuple: compile_tuple,
+    ast.ListComp: compile_listcomp,
+    ast.GeneratorExp: compile_generatorexp,
+    ast.DictComp: compile_dictcomp,
+    ast.SetComp: compile_setcomp,
+    ast.UnaryOp: compile_unaryop,
+    ast.Starred: compile_starred,
+    ast.BoolOp: compile_boolop,
+    ast.Break: compile_break,
+    ast.Continue: compile_continue,
+    ast.BinOp: compile_binop,
+    ast.Compare: compile_compare,
+    ast.Lambda: compile_lambda,
+    ast.FunctionDef: compile_function_def,
+    ast.Dict: compile_dict,
+    ast.Expr: compile_expr,
+    ast.For: compile_for,
+    ast.FormattedValue: compile_formatted_value,
+    ast.If: compile_if,
+    ast.JoinedStr: compile_joined_str,
+    ast.List: compile_list,
+    ast.Name: compile_name,
+    ast.Subscript: compile_subscript,
+    ast.IfExp: compile_if_exp,
+    ast.Attribute: compile_attribute,
+    ast.Slice: compile_slice,
+    ast.While: compile_while,
+    ast.Import: compile_import,
+    ast.ImportFrom: compile_import,
+    ast.ClassDef: compile_class_def,
+    ast.Try: compile_try,
+    ast.Raise: compile_raise,
+    ast.Assert: compile_assert,
+    ast.With: compile_with,
+    ast.Set: compile_set,
+    ast.Return: compile_return,
+    ast.Pass: compile_pass,
+}
+
+
+class CodeCache:
+    """
+    Bounded LRU cache of parsed or compiled code, keyed by a hash of the source.
+
+    Agents often resubmit the same code action, for instance when retrying after an error or replaying a run: with a
+    cache, these skip parsing and compilation entirely.
+
+    Args:
+        maxsize (`int`, default `DEFAULT_CODE_CACHE_SIZE`):
+            Maximum number of entries to keep, the least recently used ones are evicted first. Set to 0 to disable
+            caching.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CODE_CACHE_SIZE):
+        if maxsize < 0:
+            raise ValueError(f"maxsize should be a non-negative integer, got {maxsize}.")
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(code: str, kind: str = "") -> str:
+        return hashlib.sha256(f"{kind}\0{code}".encode()).hexdigest()
+
+    def get_or_build(self, code: str, build: Callable[[str], Any], kind: str = "") -> Any:
+        """
+        Return the cached entry for `code`, calling `build(code)` and storing its result on a miss.
+
+        Args:
+            code (`str`): The source code.
+            build (`Callable[[str], Any]`): Builds the entry from the source. Exceptions it raises are propagated and
+                nothing is cached.
+            kind (`str`): Distinguishes entries built differently from the same source, e.g. for each engine.
+        """
+        key = self.make_key(code, kind)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        entry = build(code)
+        if self.maxsize > 0:
+            self.entries[key] = entry
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def parse_code(code: str) -> ast.Module:
+    try:
+        return ast.parse(code)
+    except SyntaxError as e:
+        raise InterpreterError(
+            f"Code parsing failed on line {e.lineno} due to: {type(e).__name__}\n"
+            f"{e.text}"
+            f"{' ' * (e.offset or 0)}^\n"
+            f"Error: {str(e)}"
+        )
+
+
+def get_memory_usage() -> Optional[int]:
+    """Returns the resident memory of the current process in bytes, or None if it cannot be measured."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Only the peak is available here, in kilobytes except on macOS
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_memory if sys.platform == "darwin" else peak_memory * 1024
+
+
+class ExecutionBudget:
+    """
+    Wall-clock, memory and operation limits of a code action.
+
+    The evaluated code checks the budget cooperatively every `BUDGET_CHECK_INTERVAL` operations and raises
+    `ExecutionBudgetExceeded` once it is exceeded. When a timeout or a memory limit is set, a watchdog thread also
+    measures the elapsed time and memory every `BUDGET_POLL_INTERVAL` seconds, and if the code does not stop within
+    `BUDGET_GRACE_PERIOD` seconds after exceeding its budget (e.g. because it is stuck in a tool), raises the exception
+    asynchronously in the thread running it. A blocking call into C code, like `time.sleep` or a network request,
+    cannot be interrupted: the exception is only raised when it returns.
+
+    Args:
+        timeout (`float`, *optional*): Maximum duration of each code action, in seconds.
+        max_memory_mb (`float`, *optional*): Maximum growth of the resident memory of the process during each code
+            action, in megabytes.
+        max_operations (`int`, *optional*): Maximum number of operations of each code action, on top of the global
+            `MAX_OPERATIONS`.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_memory_mb: Optional[float] = None,
+        max_operations: Optional[int] = None,
+    ):
+        for name, limit in (
+            ("timeout", timeout),
+            ("max_memory_mb", max_memory_mb),
+            ("max_operations", max_operations),
+        ):
+            if limit is not None and limit <= 0:
+                raise ValueError(f"{name} should be positive, got {limit}.")
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.max_operations = max_operations
+        self.exceeded = None
+        self.deadline = None
+        self.start_operations = 0
+        self.start_memory = None
+        self.lock = threading.Lock()
+        self.watchdog = None
+        self.watchdog_stop = threading.Event()
+        self.interrupted = False
+
+    def start(self, state: Dict[str, Any]) -> None:
+        """Starts enforcing the budget on the code action about to be evaluated with `state`."""
+        self.exceeded = None
+        self.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        self.start_operations = state.get("_operations_count", 0)
+        self.start_memory = get_memory_usage() if self.max_memory_mb is not None else None
+        self.interrupted = False
+        state["_execution_budget"] = self
+        if self.timeout is not None or self.start_memory is not None:
+            self.watchdog_stop.clear()
+            self.watchdog = threading.Thread(
+                target=self.watch, args=(threading.get_ident(),), name="execution-budget-watchdog", daemon=True
+            )
+            self.watchdog.start()
+
+    def stop(self, state: Dict[str, Any]) -> None:
+        """Stops enforcing the budget, after the code action ended."""
+        state.pop("_execution_budget", None)
+        if self.watchdog is not None:
+            with self.lock:
+                self.watchdog_stop.set()
+                if self.interrupted:
+                    # Drop the interruption if the code ended before receiving it
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(threading.get_ident()), None)
+            self.watchdog.join()
+            self.watchdog = None
+
+    def check(self, operations_count: int) -> None:
+        """Raises `ExecutionBudgetExceeded` if the budget is exceeded, and again on every later check."""
+        if self.exceeded is None:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                self.exceeded = f"Code action exceeded its time budget of {self.timeout} seconds."
+            elif self.max_operations is not None and operations_count - self.start_operations >= self.max_operations:
+                self.exceeded = f"Code action exceeded its budget of {self.max_operations} operations."
+        if self.exceeded is not None:
+            raise ExecutionBudgetExceeded(self.exceeded)
+
+    def watch(self, thread_id: int) -> None:
+        exceeded_at = None
+        while not self.watchdog_stop.wait(BUDGET_POLL_INTERVAL):
+            if self.exceeded is None:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    self.exceeded = f"Code action exceeded its time budget of {self.timeout} seconds."
+                elif self.start_memory is not None:
+                    memory_mb = ((get_memory_usage() or 0) - self.start_memory) / 2**20
+                    if memory_mb > self.max_memory_mb:
+                        self.exceeded = (
+                            f"Code action exceeded its memory budget of {self.max_memory_mb} MB: "
+                            f"it allocated {memory_mb:.0f} MB."
+                        )
+            if self.exceeded is None:
+                continue
+            if exceeded_at is None:
+                exceeded_at = time.monotonic()
+            elif time.monotonic() - exceeded_at > BUDGET_GRACE_PERIOD:
+                # The code did not reach a cooperative check in time: interrupt it
+                with self.lock:
+                    if self.watchdog_stop.is_set():
+                        return
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                        ctypes.c_ulong(thread_id), ctypes.py_object(ExecutionBudgetExceeded)
+                    )
+                    self.interrupted = True
+                exceeded_at = time.monotonic()
+
+
+NATIVE_CODE_FILENAME = "<code_action>"
+NATIVE_OPERATION_COUNTER = "__count_operation__"
+
+
+def load_target(target: ast.AST) -> Optional[ast.expr]:
+    """Returns an expression loading an assignment target made of names, or None for other targets."""
+    if isinstance(target, ast.Name):
+        return ast.Name(id=target.id, ctx=ast.Load())
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        elts = [load_target(elt) for elt in target.elts]
+        if all(elt is not None for elt in elts):
+            return ast.Tuple(elts=elts, ctx=ast.Load())
+    return None
+
+
+class NativeOperationCounter(ast.NodeTransformer):
+    """
+    Instruments code for the native engine so that it counts operations like the other engines: a call to
+    `NATIVE_OPERATION_COUNTER` is inserted at the start of every loop iteration and function call, and as a condition
+    of every comprehension element. This is much cheaper than tracing every line. Bare `except:` clauses are turned
+    into `except Exception:` like in the other engines, so that they do not catch `ExecutionBudgetExceeded`.
+    """
+
+    def count_operation(self, location: ast.AST) -> ast.Call:
+        return ast.copy_location(
+            ast.Call(func=ast.Name(id=NATIVE_OPERATION_COUNTER, ctx=ast.Load()), args=[], keywords=[]), location
+        )
+
+    def instrument_body(self, node: ast.AST) -> ast.AST:
+        self.generic_visit(node)
+        node.body.insert(0, ast.copy_location(ast.Expr(value=self.count_operation(node.body[0])), node.body[0]))
+        return node
+
+    visit_For = visit_AsyncFor = visit_While = instrument_body
+    visit_FunctionDef = visit_AsyncFunctionDef = instrument_body
+
+    def visit_comprehension(self, node: ast.comprehension) -> ast.comprehension:
+        self.generic_visit(node)
+        node.ifs.append(self.count_operation(node.iter))
+        return node
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> ast.ExceptHandler:
+        self.generic_visit(node)
+        if node.type is None:
+            node.type = ast.copy_location(ast.Name(id="Exception", ctx=ast.Load()), node)
+        return node
+
+
+def compile_native(expression: ast.Module) -> Tuple[Any, Any]:
+    """
+    Compile a parsed code action to bytecode for the native engine.
+
+    Returns the code object of the statements, and the code object of an expression giving the result of the action
+    like the other engines do: the value of the last expression or assignment, or None if there is no such result.
+    """
+    body = NativeOperationCounter().visit(copy.deepcopy(expression)).body
+    result_expression = None
+    if body:
+        last_node = body[-1]
+        if isinstance(last_node, ast.Expr):
+            body = body[:-1]
+            result_expression = last_node.value
+        elif isinstance(last_node, ast.Assign):
+            result_expression = load_target(last_node.targets[0])
+        elif isinstance(last_node, (ast.AugAssign, ast.AnnAssign)):
+            result_expression = load_target(last_node.target)
+    module = ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+    statements_code = compile(module, NATIVE_CODE_FILENAME, "exec")
+    result_code = None
+    if result_expression is not None:
+        result_code = compile(
+            ast.fix_missing_locations(ast.Expression(body=result_expression)), NATIVE_CODE_FILENAME, "eval"
+        )
+    return statements_code, result_code
+
+
+def check_native_assignments(node: ast.AST, static_tools: Dict[str, Callable]) -> None:
+    """Native code cannot be stopped from assigning a name, so assignments to tools are rejected before running it."""
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store) and child.id in static_tools:
+            raise InterpreterError(f"Cannot assign to name '{child.id}': doing this would erase the existing tool!")
+
+
+def check_native_engine_authorized(authorized_imports: List[str]) -> None:
+    """
+    Native code can reach any module and builtin through the attributes of the objects it gets, for instance
+    `().__class__.__base__.__subclasses__()`, so it is only allowed to run when all imports are authorized.
+    """
+    if "*" not in authorized_imports:
+        raise ValueError(
+            "The native engine cannot restrict imports, it requires all imports to be authorized with '*'. "
+            "Use the ast or closure engine to restrict them."
+        )
+
+
+def get_native_builtins(
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    custom_tools: Dict[str, Callable],
+) -> Dict[str, Any]:
+    """
+    Builds the builtins of native code: the Python builtins and the tools, plus a `print` and an operation counter
+    applying the policy of the other engines.
+    """
+    native_builtins = dict(vars(builtins))
+    native_builtins.update(static_tools)
+    native_builtins.update(custom_tools)
+
+    def native_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level != 0:
+            raise InterpreterError("Relative imports are not supported.")
+        return builtins.__import__(name, globals, locals, fromlist, level)
+
+    def native_print(*args, sep=" ", end="\n", file=None, flush=False):
+        if file is not None:
+            return print(*args, sep=sep, end=end, file=file, flush=flush)
+        state["_print_outputs"] += (" " if sep is None else sep).join(map(str, args)) + ("\n" if end is None else end)
+
+    def native_count_operation():
+        count_operation(state)
+        return True
+
+    native_builtins["__import__"] = native_import
+    native_builtins["print"] = native_print
+    native_builtins[NATIVE_OPERATION_COUNTER] = native_count_operation
+    return native_builtins
+
+
+def run_native(
+    compiled: Tuple[Any, Any],
+    state: Dict[str, Any],
+    static_tools: Dict[str, Callable],
+    custom_tools: Dict[str, Callable],
+) -> Any:
+    """
+    Run a code action compiled with `compile_native` as CPython bytecode, using `state` as its global namespace.
+
+    The code has all the Python builtins (see `get_native_builtins`), so it must be trusted: only the operation count
+    (see `NativeOperationCounter`) and the execution budget of the other engines apply to it.
+    """
+    statements_code, result_code = compiled
+    # Functions defined by previous actions keep a reference to the builtins dict: update it in place
+    if not isinstance(state.get("__builtins__"), dict):
+        state["__builtins__"] = {}
+    state["__builtins__"].clear()
+    state["__builtins__"].update(get_native_builtins(state, static_tools, custom_tools))
+
+    exec(statements_code, state)
+    if result_code is not None:
+        return eval(result_code, state)
+    return None
+
+
+def get_native_error_node(expression: ast.Module, traceback: Any) -> Optional[ast.stmt]:
+    """Returns the top-level statement of a code action where native execution failed, from the error traceback."""
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == NATIVE_CODE_FILENAME:
+            for node in expression.body:
+                if node.lineno <= traceback.tb_lineno <= node.end_lineno:
+                    return node
+        traceback = traceback.tb_next
+    return expression.body[-1] if expression.body else None
+
+
+class FinalAnswerException(Exception):
+    def __init__(self, value):
+        self.value = value
+
+
+def evaluate_python_code(
+    code: str,
+    static_tools: Optional[Dict[str, Callable]] = None,
+    custom_tools: Optional[Dict[str, Callable]] = None,
+    state: Optional[Dict[str, Any]] = None,
+    authorized_imports: List[str] = BASE_BUILTIN_MODULES,
+    max_print_outputs_length: int = DEFAULT_MAX_LEN_OUTPUT,
+    engine: str = "ast",
+    code_cache: Optional[CodeCache] = None,
+    print_outputs_callback: Optional[Callable[[str], None]] = None,
+    budget: Optional[ExecutionBudget] = None,
+):
+    """
+    Evaluate a python expression using the content of the variables stored in a state and only evaluating a given set
+    of functions.
+
+    This function will recurse through the nodes of the tree provided.
+
+    Args:
+        code (`str`):
+            The code to evaluate.
+        static_tools (`Dict[str, Callable]`):
+            The functions that may be called during the evaluation. These can also be agents in a multiagent setting.
+            These tools cannot be overwritten in the code: any assignment to their name will raise an error.
+        custom_tools (`Dict[str, Callable]`):
+            The functions that may be called during the evaluation.
+            These tools can be overwritten in the code: any assignment to their name will overwrite them.
+        state (`Dict[str, Any]`):
+            A dictionary mapping variable names to values. The `state` should contain the initial inputs but will be
+            updated by this function to contain all variables as they are evaluated.
+            The print outputs will be stored in the state under the key "_print_outputs".
+        max_print_outputs_length (`int`, default `DEFAULT_MAX_LEN_OUTPUT`):
+            Maximum length of the print outputs: beyond this, only their beginning and end are kept.
+        engine (`str`, default `"ast"`):
+            How to run the code: `"ast"` walks the syntax tree node by node, `"closure"` first compiles each
+            statement into closures with `compile_ast` and then runs them, which avoids dispatching on node types
+            again in loops. Both engines apply the same authorization checks. `"native"` compiles the code to CPython
+            bytecode and runs it with `state` as global namespace, which is much faster but cannot restrict what the
+            code does (see `run_native`): it is only for trusted agents, and requires `authorized_imports` to
+            contain `"*"`.
+        code_cache (`CodeCache`, *optional*):
+            If given, the parsed (and for the closure engine, compiled) code is looked up in and stored to this cache,
+            so that evaluating the same code again skips parsing.
+        print_outputs_callback (`Callable[[str], None]`, *optional*):
+            Called with each chunk of print outputs as soon as it is printed, to stream them.
+        budget (`ExecutionBudget`, *optional*):
+            Time, memory and operation limits of the code: exceeding them stops it with an `InterpreterError`.
+    """
+    if engine not in EXECUTION_ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, should be one of {EXECUTION_ENGINES}.")
+    if engine == "native":
+        check_native_engine_authorized(authorized_imports)
+
+    def build(code):
+        expression = parse_code(code)
+        if engine == "closure":
+            return expression, compile_body(expression.body)
+        elif engine == "native":
+            return expression, compile_native(expression)
+        return expression, None
+
+    if code_cache is not None:
+        expression, compiled = code_cache.get_or_build(code, build, kind=engine)
+    else:
+        expression, compiled = build(code)
+
+    if state is None:
+        state = {}
+    static_tools = static_tools.copy() if static_tools is not None else {}
+    custom_tools = custom_tools if custom_tools is not None else {}
+    result = None
+    state["_print_outputs"] = PrintContainer(max_length=max_print_outputs_length, callback=print_outputs_callback)
+
+    if "final_answer" in static_tools:
+        previous_final_answer = static_tools["final_answer"]
+
+        def final_answer(value):
+            raise FinalAnswerException(previous_final_answer(value))
+
+        static_tools["final_answer"] = final_answer
+
+    node = None
+    if budget is not None:
+        budget.start(state)
+    try:
+        if engine == "closure":
+            for node, compiled_node in zip(expression.body, compiled):
+                count_operation(state)
+                result = compiled_node(state, static_tools, custom_tools, authorized_imports)
+        elif engine == "native":
+            for node in expression.body:
+                check_native_assignments(node, static_tools)
+            node = None
+            result = run_native(compiled, state, static_tools, custom_tools)
+        else:
+            for node in expression.body:
+                result = evaluate_ast(node, state, static_tools, custom_tools, authorized_imports)
+        is_final_answer = False
+        return result, is_final_answer
+    except FinalAnswerException as e:
+        is_final_answer = True
+        return e.value, is_final_answer
+    except (Exception, ExecutionBudgetExceeded) as e:
+        if node is None:
+            node = get_native_error_node(expression, e.__traceback__)
+        if isinstance(e, ExecutionBudgetExceeded) and budget is not None and budget.exceeded is not None:
+            e = ExecutionBudgetExceeded(budget.exceeded)
+        raise InterpreterError(
+            f"Code execution failed at line '{ast.get_source_segment(code, node)}' due to: {type(e).__name__}: {e}"
+        )
+    finally:
+        if budget is not None:
+            budget.stop(state)
+
+
+class LocalPythonInterpreter:
+    def __init__(
+        self,
+        additional_authorized_imports: List[str],
+        max_print_outputs_length: Optional[int] = None,
+        engine: str = "ast",
+        code_cache_size: int = DEFAULT_CODE_CACHE_SIZE,
+        print_outputs_callback: Optional[Callable[[str], None]] = None,
+        timeout: Optional[float] = None,
+        max_memory_mb: Optional[float] = None,
+        max_operations: Optional[int] = None,
+    ):
+        if engine not in EXECUTION_ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, should be one of {EXECUTION_ENGINES}.")
+        self.engine = engine
+        self.budget = None
+        if timeout is not None or max_memory_mb is not None or max_operations is not None:
+            self.budget = ExecutionBudget(timeout=timeout, max_memory_mb=max_memory_mb, max_operations=max_operations)
+        self.code_cache = CodeCache(maxsize=code_cache_size)
+        self.print_outputs_callback = print_outputs_callback
+        self.custom_tools = {}
+        self.state = {}
+        self.max_print_outputs_length = max_print_outputs_length
+        if max_print_outputs_length is None:
+            self.max_print_outputs_length = DEFAULT_MAX_LEN_OUTPUT
+        self.additional_authorized_imports = additional_authorized_imports
+        self.authorized_imports = list(set(BASE_BUILTIN_MODULES) | set(self.additional_authorized_imports))
+        if engine == "native":
+            check_native_engine_authorized(self.authorized_imports)
+        # TODO: assert self.authorized imports are all installed locally
+        self.static_tools = None
+
+    def __call__(self, code_action: str, additional_variables: Dict[str, Any]) -> Tuple[Any, str, bool]:
+        self.state.update(additional_variables)
         output, is_final_answer = evaluate_python_code(
             code_action,
             static_tools=self.static_tools,
@@ -1441,6 +3218,10 @@ class LocalPythonInterpreter:
             state=self.state,
             authorized_imports=self.authorized_imports,
             max_print_outputs_length=self.max_print_outputs_length,
+            engine=self.engine,
+            code_cache=self.code_cache,
+            print_outputs_callback=self.print_outputs_callback,
+            budget=self.budget,
         )
         logs = str(self.state["_print_outputs"])
         return output, logs, is_final_answer
@@ -1448,5 +3229,13 @@ class LocalPythonInterpreter:
     def update_tools(self, tools: Dict[str, Tool]):
         self.static_tools = {**tools, **BASE_PYTHON_TOOLS.copy()}
 
+    @property
+    def cache_hits(self) -> int:
+        return self.code_cache.hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self.code_cache.misses
+
 
-__all__ = ["evaluate_python_code", "LocalPythonInterpreter"]
+__all__ = ["evaluate_python_code", "LocalPythonInterpreter", "CodeCache", "ExecutionBudget", "ExecutionBudgetExceeded"]
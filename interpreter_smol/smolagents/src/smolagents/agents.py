@@ -14,6 +14,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import copy
 import importlib
 import inspect
 import json
@@ -21,11 +23,14 @@ import os
 import re
 import tempfile
 import textwrap
+import threading
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from logging import getLogger
 from pathlib import Path
-from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, TypedDict, Union
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, Set, Tuple, TypedDict, Union
 
 import jinja2
 import yaml
@@ -37,7 +42,7 @@ from rich.rule import Rule
 from rich.text import Text
 
 from .agent_types import AgentAudio, AgentImage, AgentType, handle_agent_output_types
-from .default_tools import TOOL_MAPPING, FinalAnswerTool
+from .default_tools import TOOL_MAPPING, FinalAnswerTool, ParallelDelegationTool
 from .e2b_executor import E2BExecutor
 from .local_python_executor import (
     BASE_BUILTIN_MODULES,
@@ -49,6 +54,7 @@ from .models import (
     ChatMessage,
     MessageRole,
     Model,
+    stop_stream,
 )
 from .monitoring import (
     YELLOW_HEX,
@@ -63,6 +69,7 @@ from .utils import (
     AgentGenerationError,
     AgentMaxStepsError,
     AgentParsingError,
+    CodeBlockDetector,
     make_init_file,
     parse_code_blobs,
     parse_json_tool_call,
@@ -72,6 +79,8 @@ from .utils import (
 
 logger = getLogger(__name__)
 
+DEFAULT_MAX_TOOL_THREADS = 4
+
 
 def get_variable_names(self, template: str) -> Set[str]:
     pattern = re.compile(r"\{\{([^{}]+)\}\}")
@@ -179,7 +188,7 @@ class MultiStepAgent:
         add_base_tools (`bool`, default `False`): Whether to add the base tools to the agent's tools.
         verbosity_level (`LogLevel`, default `LogLevel.INFO`): Level of verbosity of the agent's logs.
         grammar (`dict[str, str]`, *optional*): Grammar used to parse the LLM output.
-        managed_agents (`list`, *optional*): Managed agents that the agent can call.
+        managed_agents (`list`, *optional*): Managed agents that the agent can call. The agent also gets a `parallel_delegate` tool to give tasks to several of them at once.
         step_callbacks (`list[Callable]`, *optional*): Callbacks that will be called at each step.
         planning_interval (`int`, *optional*): Interval at which the agent will run a planning step.
         name (`str`, *optional*): Necessary for a managed agent only - the name by which this agent can be called.
@@ -253,6 +262,8 @@ class MultiStepAgent:
                 }
             )
         self.tools.setdefault("final_answer", FinalAnswerTool())
+        if self.managed_agents:
+            self.tools.setdefault("parallel_delegate", ParallelDelegationTool(list(self.managed_agents.values())))
 
     def _validate_tools_and_managed_agents(self, tools, managed_agents):
         tool_and_managed_agent_names = [tool.name for tool in tools]
@@ -260,7 +271,7 @@ class MultiStepAgent:
             for agent in managed_agents:
                 tool_and_managed_agent_names.append(agent.name)
                 for tool in agent.tools.values():
-                    if tool.name != "final_answer":
+                    if tool.name != "final_answer" and not isinstance(tool, ParallelDelegationTool):
                         tool_and_managed_agent_names.append(tool.name)
         if len(tool_and_managed_agent_names) != len(set(tool_and_managed_agent_names)):
             raise ValueError(
@@ -296,6 +307,50 @@ class MultiStepAgent:
         ```
         """
         max_steps = max_steps or self.max_steps
+        self._start_run(task, reset=reset, images=images, additional_args=additional_args)
+
+        if stream:
+            # The steps are returned as they are executed through a generator to iterate on.
+            return self._run(task=self.task, max_steps=max_steps, images=images)
+        # Outputs are returned only at the end. We only look at the last step.
+        return deque(self._run(task=self.task, max_steps=max_steps, images=images), maxlen=1)[0]
+
+    async def arun(
+        self,
+        task: str,
+        stream: bool = False,
+        reset: bool = True,
+        images: Optional[List[str]] = None,
+        additional_args: Optional[Dict] = None,
+        max_steps: Optional[int] = None,
+    ):
+        """
+        Asynchronous version of `run`, to run many agents concurrently on one event loop.
+
+        Models are called with `model.__acall__` and tools with `Tool.acall`, which await asynchronous clients when
+        they have one and otherwise run in a thread of the default executor. Code actions also run in that executor.
+
+        Args:
+            Same as `run`. With `stream=True`, returns an asynchronous generator of the steps.
+
+        Example:
+        ```py
+        import asyncio
+        from smolagents import CodeAgent
+        agent = CodeAgent(tools=[])
+        asyncio.run(agent.arun("What is the result of 2 power 3.7384?"))
+        ```
+        """
+        max_steps = max_steps or self.max_steps
+        self._start_run(task, reset=reset, images=images, additional_args=additional_args)
+
+        if stream:
+            return self._arun(task=self.task, max_steps=max_steps, images=images)
+        async for step in self._arun(task=self.task, max_steps=max_steps, images=images):
+            final_answer = step
+        return final_answer
+
+    def _start_run(self, task: str, reset: bool, images: Optional[List[str]], additional_args: Optional[Dict]) -> None:
         self.task = task
         if additional_args is not None:
             self.state.update(additional_args)
@@ -320,12 +375,6 @@ You have been provided with these additional arguments, that you can access usin
         if getattr(self, "python_executor", None):
             self.python_executor.update_tools({**self.tools, **self.managed_agents})
 
-        if stream:
-            # The steps are returned as they are executed through a generator to iterate on.
-            return self._run(task=self.task, max_steps=max_steps, images=images)
-        # Outputs are returned only at the end. We only look at the last step.
-        return deque(self._run(task=self.task, max_steps=max_steps, images=images), maxlen=1)[0]
-
     def _run(
         self, task: str, max_steps: int, images: List[str] | None = None
     ) -> Generator[ActionStep | AgentType, None, None]:
@@ -348,6 +397,30 @@ You have been provided with these additional arguments, that you can access usin
             yield memory_step
         yield handle_agent_output_types(final_answer)
 
+    async def _arun(
+        self, task: str, max_steps: int, images: List[str] | None = None
+    ) -> AsyncGenerator[ActionStep | AgentType, None]:
+        final_answer = None
+        self.step_number = 1
+        while final_answer is None and self.step_number <= max_steps:
+            step_start_time = time.time()
+            memory_step = self._create_memory_step(step_start_time, images)
+            try:
+                final_answer = await self._aexecute_step(task, memory_step)
+            except AgentError as e:
+                memory_step.error = e
+            finally:
+                self._finalize_step(memory_step, step_start_time)
+            # Not yielded from the finally clause, which would swallow a cancellation of the task
+            yield memory_step
+            self.step_number += 1
+
+        if final_answer is None and self.step_number == max_steps + 1:
+            final_answer = await self.aprovide_final_answer(task, images)
+            self._record_max_steps_step(final_answer, step_start_time)
+            yield memory_step
+        yield handle_agent_output_types(final_answer)
+
     def _create_memory_step(self, step_start_time: float, images: List[str] | None) -> ActionStep:
         return ActionStep(step_number=self.step_number, start_time=step_start_time, observations_images=images)
 
@@ -360,6 +433,17 @@ You have been provided with these additional arguments, that you can access usin
             self._validate_final_answer(final_answer)
         return final_answer
 
+    async def _aexecute_step(self, task: str, memory_step: ActionStep) -> Union[None, Any]:
+        if self.planning_interval is not None and self.step_number % self.planning_interval == 1:
+            await asyncio.to_thread(
+                self.planning_step, task, is_first_step=(self.step_number == 1), step=self.step_number
+            )
+        self.logger.log_rule(f"Step {self.step_number}", level=LogLevel.INFO)
+        final_answer = await self.astep(memory_step)
+        if final_answer is not None and self.final_answer_checks:
+            self._validate_final_answer(final_answer)
+        return final_answer
+
     def _validate_final_answer(self, final_answer: Any):
         for check_function in self.final_answer_checks:
             try:
@@ -379,6 +463,10 @@ You have been provided with these additional arguments, that you can access usin
 
     def _handle_max_steps_reached(self, task: str, images: List[str], step_start_time: float) -> Any:
         final_answer = self.provide_final_answer(task, images)
+        self._record_max_steps_step(final_answer, step_start_time)
+        return final_answer
+
+    def _record_max_steps_step(self, final_answer: Any, step_start_time: float):
         final_memory_step = ActionStep(
             step_number=self.step_number, error=AgentMaxStepsError("Reached max steps.", self.logger)
         )
@@ -390,7 +478,6 @@ You have been provided with these additional arguments, that you can access usin
             callback(final_memory_step) if len(inspect.signature(callback).parameters) == 1 else callback(
                 final_memory_step, agent=self
             )
-        return final_answer
 
     def planning_step(self, task, is_first_step: bool, step: int) -> None:
         input_messages, facts_message, plan_message = (
@@ -531,10 +618,7 @@ You have been provided with these additional arguments, that you can access usin
         that can be used as input to the LLM. Adds a number of keywords (such as PLAN, error, etc) to help
         the LLM.
         """
-        messages = self.memory.system_prompt.to_messages(summary_mode=summary_mode)
-        for memory_step in self.memory.steps:
-            messages.extend(memory_step.to_messages(summary_mode=summary_mode))
-        return messages
+        return self.memory.get_messages(summary_mode=summary_mode)
 
     def visualize(self):
         """Creates a rich tree visualization of the agent's structure."""
@@ -572,6 +656,23 @@ You have been provided with these additional arguments, that you can access usin
         Returns:
             `str`: Final answer to the task.
         """
+        messages = self._final_answer_messages(task, images)
+        try:
+            chat_message: ChatMessage = self.model(messages)
+            return chat_message.content
+        except Exception as e:
+            return f"Error in generating final LLM output:\n{e}"
+
+    async def aprovide_final_answer(self, task: str, images: Optional[list[str]]) -> str:
+        """Asynchronous version of `provide_final_answer`."""
+        messages = self._final_answer_messages(task, images)
+        try:
+            chat_message: ChatMessage = await self.acall_model(messages)
+            return chat_message.content
+        except Exception as e:
+            return f"Error in generating final LLM output:\n{e}"
+
+    def _final_answer_messages(self, task: str, images: Optional[list[str]]) -> List[Dict[str, Any]]:
         messages = [
             {
                 "role": MessageRole.SYSTEM,
@@ -599,11 +700,16 @@ You have been provided with these additional arguments, that you can access usin
                 ],
             }
         ]
-        try:
-            chat_message: ChatMessage = self.model(messages)
-            return chat_message.content
-        except Exception as e:
-            return f"Error in generating final LLM output:\n{e}"
+        return messages
+
+    async def acall_model(self, messages: List[Dict[str, Any]], **kwargs) -> ChatMessage:
+        """
+        Calls the model without blocking the event loop: awaits `model.__acall__` if the model has one, else runs the
+        model in a thread of the default executor.
+        """
+        if hasattr(self.model, "__acall__"):
+            return await self.model.__acall__(messages, **kwargs)
+        return await asyncio.to_thread(self.model, messages, **kwargs)
 
     def execute_tool_call(self, tool_name: str, arguments: Union[Dict[str, str], str]) -> Any:
         """
@@ -626,9 +732,7 @@ You have been provided with these additional arguments, that you can access usin
                 else:
                     observation = available_tools[tool_name].__call__(arguments, sanitize_inputs_outputs=True)
             elif isinstance(arguments, dict):
-                for key, value in arguments.items():
-                    if isinstance(value, str) and value in self.state:
-                        arguments[key] = self.state[value]
+                self._resolve_state_arguments(arguments)
                 if tool_name in self.managed_agents:
                     observation = available_tools[tool_name].__call__(**arguments)
                 else:
@@ -638,24 +742,77 @@ You have been provided with these additional arguments, that you can access usin
                 raise AgentExecutionError(error_msg, self.logger)
             return observation
         except Exception as e:
-            if tool_name in self.tools:
-                tool = self.tools[tool_name]
-                error_msg = (
-                    f"Error when executing tool {tool_name} with arguments {arguments}: {type(e).__name__}: {e}\nYou should only use this tool with a correct input.\n"
-                    f"As a reminder, this tool's description is the following: '{tool.description}'.\nIt takes inputs: {tool.inputs} and returns output type {tool.output_type}"
-                )
-                raise AgentExecutionError(error_msg, self.logger)
-            elif tool_name in self.managed_agents:
-                error_msg = (
-                    f"Error in calling team member: {e}\nYou should only ask this team member with a correct request.\n"
-                    f"As a reminder, this team member's description is the following:\n{available_tools[tool_name]}"
-                )
+            raise self._tool_call_error(tool_name, arguments, e)
+
+    async def aexecute_tool_call(self, tool_name: str, arguments: Union[Dict[str, str], str]) -> Any:
+        """
+        Asynchronous version of `execute_tool_call`: tools are called with `Tool.acall` and managed agents with
+        `MultiStepAgent.acall`.
+        """
+        available_tools = {**self.tools, **self.managed_agents}
+        if tool_name not in available_tools:
+            error_msg = f"Unknown tool {tool_name}, should be instead one of {list(available_tools.keys())}."
+            raise AgentExecutionError(error_msg, self.logger)
+
+        try:
+            if isinstance(arguments, str):
+                if tool_name in self.managed_agents:
+                    observation = await available_tools[tool_name].acall(arguments)
+                else:
+                    observation = await available_tools[tool_name].acall(arguments, sanitize_inputs_outputs=True)
+            elif isinstance(arguments, dict):
+                self._resolve_state_arguments(arguments)
+                if tool_name in self.managed_agents:
+                    observation = await available_tools[tool_name].acall(**arguments)
+                else:
+                    observation = await available_tools[tool_name].acall(**arguments, sanitize_inputs_outputs=True)
+            else:
+                error_msg = f"Arguments passed to tool should be a dict or string: got a {type(arguments)}."
                 raise AgentExecutionError(error_msg, self.logger)
+            return observation
+        except Exception as e:
+            raise self._tool_call_error(tool_name, arguments, e)
+
+    def _resolve_state_arguments(self, arguments: Dict[str, Any]):
+        """Replaces the arguments that name a state variable with its value."""
+        for key, value in arguments.items():
+            if isinstance(value, str) and value in self.state:
+                arguments[key] = self.state[value]
+
+    def _tool_call_error(self, tool_name: str, arguments: Union[Dict[str, str], str], e: Exception) -> AgentError:
+        if tool_name in self.tools:
+            tool = self.tools[tool_name]
+            error_msg = (
+                f"Error when executing tool {tool_name} with arguments {arguments}: {type(e).__name__}: {e}\nYou should only use this tool with a correct input.\n"
+                f"As a reminder, this tool's description is the following: '{tool.description}'.\nIt takes inputs: {tool.inputs} and returns output type {tool.output_type}"
+            )
+        else:
+            error_msg = (
+                f"Error in calling team member: {e}\nYou should only ask this team member with a correct request.\n"
+                f"As a reminder, this team member's description is the following:\n{self.managed_agents[tool_name]}"
+            )
+        return AgentExecutionError(error_msg, self.logger)
+
+    def _prepare_step_input(self, memory_step: ActionStep) -> List[Dict[str, Any]]:
+        memory_messages = self.write_memory_to_messages()
+
+        self.input_messages = memory_messages
+
+        # Add new step in logs, with a reference to the memory rather than a copy of all its messages
+        memory_step.model_input_reference = self.memory.get_messages_reference()
+        return memory_messages
 
     def step(self, memory_step: ActionStep) -> Union[None, Any]:
         """To be implemented in children classes. Should return either None if the step is not final."""
         pass
 
+    async def astep(self, memory_step: ActionStep) -> Union[None, Any]:
+        """
+        Asynchronous version of `step`, used by `arun`. Runs `step` in a thread of the default executor unless
+        children classes implement it.
+        """
+        return await asyncio.to_thread(self.step, memory_step)
+
     def replay(self, detailed: bool = False):
         """Prints a pretty replay of the agent's steps.
 
@@ -670,11 +827,36 @@ You have been provided with these additional arguments, that you can access usin
 
         This method is called only by a managed agent.
         """
-        full_task = populate_template(
+        report = self.run(self._managed_agent_task(task), **kwargs)
+        return self._managed_agent_answer(report)
+
+    async def acall(self, task: str, **kwargs):
+        """Asynchronous version of `__call__`, which runs the managed agent with `arun`."""
+        report = await self.arun(self._managed_agent_task(task), **kwargs)
+        return self._managed_agent_answer(report)
+
+    def copy(self) -> "MultiStepAgent":
+        """Returns a copy of the agent with its own memory, state and monitor, that can run at the same time as the agent.
+
+        The model, tools and prompt templates are shared, and the managed agents are copied too.
+        """
+        agent = copy.copy(self)
+        agent.state = {}
+        agent.memory = AgentMemory(self.system_prompt)
+        agent.monitor = Monitor(self.model, self.logger)
+        agent.step_callbacks = [
+            callback for callback in self.step_callbacks if callback != self.monitor.update_metrics
+        ] + [agent.monitor.update_metrics]
+        agent.managed_agents = {name: managed_agent.copy() for name, managed_agent in self.managed_agents.items()}
+        return agent
+
+    def _managed_agent_task(self, task: str) -> str:
+        return populate_template(
             self.prompt_templates["managed_agent"]["task"],
             variables=dict(name=self.name, task=task),
         )
-        report = self.run(full_task, **kwargs)
+
+    def _managed_agent_answer(self, report: Any) -> str:
         answer = populate_template(
             self.prompt_templates["managed_agent"]["report"], variables=dict(name=self.name, final_answer=report)
         )
@@ -713,9 +895,10 @@ You have been provided with these additional arguments, that you can access usin
                 agent.save(os.path.join(output_dir, "managed_agents", agent_name), relative_path=agent_suffix)
 
         class_name = self.__class__.__name__
+        tools = self._saved_tools()
 
         # Save tools to different .py files
-        for tool in self.tools.values():
+        for tool in tools.values():
             make_init_file(os.path.join(output_dir, "tools"))
             tool.save(os.path.join(output_dir, "tools"), tool_file_name=tool.name, make_gradio_app=False)
 
@@ -735,7 +918,7 @@ You have been provided with these additional arguments, that you can access usin
 
         # Save agent dictionary to json
         agent_dict = self.to_dict()
-        agent_dict["tools"] = [tool.name for tool in self.tools.values()]
+        agent_dict["tools"] = [tool.name for tool in tools.values()]
         with open(os.path.join(output_dir, "agent.json"), "w", encoding="utf-8") as f:
             json.dump(agent_dict, f, indent=4)
 
@@ -795,7 +978,7 @@ You have been provided with these additional arguments, that you can access usin
                 "agent_name": agent_name,
                 "class_name": class_name,
                 "agent_dict": agent_dict,
-                "tools": self.tools,
+                "tools": tools,
                 "managed_agents": self.managed_agents,
                 "managed_agent_relative_path": managed_agent_relative_path,
             }
@@ -804,6 +987,10 @@ You have been provided with these additional arguments, that you can access usin
         with open(os.path.join(output_dir, "app.py"), "w", encoding="utf-8") as f:
             f.write(app_text + "\n")  # Append newline at the end
 
+    def _saved_tools(self) -> Dict[str, Tool]:
+        # The parallel delegation tool is created again from the managed agents when the agent is loaded
+        return {name: tool for name, tool in self.tools.items() if not isinstance(tool, ParallelDelegationTool)}
+
     def to_dict(self) -> Dict[str, Any]:
         """Converts agent into a dictionary."""
         # TODO: handle serializing step_callbacks and final_answer_checks
@@ -811,8 +998,9 @@ You have been provided with these additional arguments, that you can access usin
             if getattr(self, attr, None):
                 self.logger.log(f"This agent has {attr}: they will be ignored by this method.", LogLevel.INFO)
 
-        tool_dicts = [tool.to_dict() for tool in self.tools.values()]
-        tool_requirements = {req for tool in self.tools.values() for req in tool.to_dict()["requirements"]}
+        tools = self._saved_tools()
+        tool_dicts = [tool.to_dict() for tool in tools.values()]
+        tool_requirements = {req for tool in tools.values() for req in tool.to_dict()["requirements"]}
         managed_agents_requirements = {
             req for managed_agent in self.managed_agents.values() for req in managed_agent.to_dict()["requirements"]
         }
@@ -846,6 +1034,16 @@ You have been provided with these additional arguments, that you can access usin
             agent_dict["use_e2b_executor"] = self.use_e2b_executor
         if hasattr(self, "max_print_outputs_length"):
             agent_dict["max_print_outputs_length"] = self.max_print_outputs_length
+        if hasattr(self, "stream_print_outputs"):
+            agent_dict["stream_print_outputs"] = self.stream_print_outputs
+        if hasattr(self, "stream_outputs"):
+            agent_dict["stream_outputs"] = self.stream_outputs
+        if hasattr(self, "executor_kwargs"):
+            agent_dict["executor_kwargs"] = self.executor_kwargs
+        if hasattr(self, "max_tool_threads"):
+            agent_dict["max_tool_threads"] = self.max_tool_threads
+        if hasattr(self, "tool_concurrency_limits"):
+            agent_dict["tool_concurrency_limits"] = self.tool_concurrency_limits
         return agent_dict
 
     @classmethod
@@ -942,6 +1140,12 @@ You have been provided with these additional arguments, that you can access usin
             args["additional_authorized_imports"] = agent_dict["authorized_imports"]
             args["use_e2b_executor"] = agent_dict["use_e2b_executor"]
             args["max_print_outputs_length"] = agent_dict["max_print_outputs_length"]
+            args["stream_print_outputs"] = agent_dict.get("stream_print_outputs", False)
+            args["stream_outputs"] = agent_dict.get("stream_outputs", False)
+            args["executor_kwargs"] = agent_dict.get("executor_kwargs")
+        if cls.__name__ == "ToolCallingAgent":
+            args["max_tool_threads"] = agent_dict.get("max_tool_threads", DEFAULT_MAX_TOOL_THREADS)
+            args["tool_concurrency_limits"] = agent_dict.get("tool_concurrency_limits")
         args.update(kwargs)
         return cls(**args)
 
@@ -1009,6 +1213,8 @@ class ToolCallingAgent(MultiStepAgent):
         model (`Callable[[list[dict[str, str]]], ChatMessage]`): Model that will generate the agent's actions.
         prompt_templates ([`~agents.PromptTemplates`], *optional*): Prompt templates.
         planning_interval (`int`, *optional*): Interval at which the agent will run a planning step.
+        max_tool_threads (`int`, default `4`): Maximum number of tool calls of a step run at the same time, when the model makes several calls in one turn.
+        tool_concurrency_limits (`dict[str, int]`, *optional*): Maximum number of concurrent calls per tool name, for instance `{"visit_webpage": 2}` for tools that are rate limited or not thread-safe.
         **kwargs: Additional keyword arguments.
     """
 
@@ -1018,8 +1224,12 @@ class ToolCallingAgent(MultiStepAgent):
         model: Callable[[List[Dict[str, str]]], ChatMessage],
         prompt_templates: Optional[PromptTemplates] = None,
         planning_interval: Optional[int] = None,
+        max_tool_threads: int = DEFAULT_MAX_TOOL_THREADS,
+        tool_concurrency_limits: Optional[Dict[str, int]] = None,
         **kwargs,
     ):
+        self.max_tool_threads = max_tool_threads
+        self.tool_concurrency_limits = tool_concurrency_limits if tool_concurrency_limits is not None else {}
         prompt_templates = prompt_templates or yaml.safe_load(
             importlib.resources.files("smolagents.prompts").joinpath("toolcalling_agent.yaml").read_text()
         )
@@ -1043,83 +1253,178 @@ class ToolCallingAgent(MultiStepAgent):
         Perform one step in the ReAct framework: the agent thinks, acts, and observes the result.
         Returns None if the step is not final.
         """
-        memory_messages = self.write_memory_to_messages()
-
-        self.input_messages = memory_messages
-
-        # Add new step in logs
-        memory_step.model_input_messages = memory_messages.copy()
-
+        memory_messages = self._prepare_step_input(memory_step)
         try:
             model_message: ChatMessage = self.model(
                 memory_messages,
                 tools_to_call_from=list(self.tools.values()),
                 stop_sequences=["Observation:"],
             )
-            memory_step.model_output_message = model_message
-            if model_message.tool_calls is None or len(model_message.tool_calls) == 0:
-                raise Exception("Model did not call any tools. Call `final_answer` tool to return a final answer.")
-            tool_call = model_message.tool_calls[0]
-            tool_name, tool_call_id = tool_call.function.name, tool_call.id
-            tool_arguments = tool_call.function.arguments
+            tool_calls = self._record_tool_calls(memory_step, model_message)
+        except Exception as e:
+            raise AgentGenerationError(f"Error in generating tool call with model:\n{e}", self.logger) from e
 
+        final_answer_call, other_calls = self._split_final_answer_call(memory_step, tool_calls)
+        if other_calls:
+            outcomes = self._execute_tool_calls(other_calls)
+            self._record_observations(memory_step, other_calls, outcomes, final=final_answer_call is not None)
+        if final_answer_call is not None:
+            return self._record_final_answer(memory_step, final_answer_call.arguments)
+        return None
+
+    async def astep(self, memory_step: ActionStep) -> Union[None, Any]:
+        """Asynchronous version of `step`, which awaits the model and the tool calls."""
+        memory_messages = self._prepare_step_input(memory_step)
+        try:
+            model_message: ChatMessage = await self.acall_model(
+                memory_messages,
+                tools_to_call_from=list(self.tools.values()),
+                stop_sequences=["Observation:"],
+            )
+            tool_calls = self._record_tool_calls(memory_step, model_message)
         except Exception as e:
             raise AgentGenerationError(f"Error in generating tool call with model:\n{e}", self.logger) from e
 
-        memory_step.tool_calls = [ToolCall(name=tool_name, arguments=tool_arguments, id=tool_call_id)]
+        final_answer_call, other_calls = self._split_final_answer_call(memory_step, tool_calls)
+        if other_calls:
+            outcomes = await self._aexecute_tool_calls(other_calls)
+            self._record_observations(memory_step, other_calls, outcomes, final=final_answer_call is not None)
+        if final_answer_call is not None:
+            return self._record_final_answer(memory_step, final_answer_call.arguments)
+        return None
+
+    def _record_tool_calls(self, memory_step: ActionStep, model_message: ChatMessage) -> List[ToolCall]:
+        memory_step.model_output_message = model_message
+        if model_message.tool_calls is None or len(model_message.tool_calls) == 0:
+            raise Exception("Model did not call any tools. Call `final_answer` tool to return a final answer.")
+        memory_step.tool_calls = [
+            ToolCall(name=tool_call.function.name, arguments=tool_call.function.arguments, id=tool_call.id)
+            for tool_call in model_message.tool_calls
+        ]
+        for tool_call in memory_step.tool_calls:
+            self.logger.log(
+                Panel(Text(f"Calling tool: '{tool_call.name}' with arguments: {tool_call.arguments}")),
+                level=LogLevel.INFO,
+            )
+        return memory_step.tool_calls
+
+    def _split_final_answer_call(
+        self, memory_step: ActionStep, tool_calls: List[ToolCall]
+    ) -> Tuple[Optional[ToolCall], List[ToolCall]]:
+        """
+        Separates the final answer call from the other calls, which are run first. The final answer call is moved
+        last in the step, so that the observations of the other calls line up with its first tool calls.
+        """
+        final_answer_call = next((tool_call for tool_call in tool_calls if tool_call.name == "final_answer"), None)
+        other_calls = [tool_call for tool_call in tool_calls if tool_call.name != "final_answer"]
+        memory_step.tool_calls = other_calls + ([final_answer_call] if final_answer_call is not None else [])
+        return final_answer_call, other_calls
 
-        # Execute
-        self.logger.log(
-            Panel(Text(f"Calling tool: '{tool_name}' with arguments: {tool_arguments}")),
-            level=LogLevel.INFO,
+    def _execute_tool_calls(self, tool_calls: List[ToolCall]) -> List[Tuple[Any, Optional[AgentError]]]:
+        """
+        Runs the tool calls of a step concurrently on a pool of at most `max_tool_threads` threads, with at most
+        `tool_concurrency_limits[name]` calls of a tool at a time, and returns their observations or errors in order.
+        """
+        semaphores = {name: threading.Semaphore(limit) for name, limit in self.tool_concurrency_limits.items()}
+
+        def execute(tool_call: ToolCall) -> Tuple[Any, Optional[AgentError]]:
+            with semaphores.get(tool_call.name, nullcontext()):
+                try:
+                    arguments = tool_call.arguments if tool_call.arguments is not None else {}
+                    return self.execute_tool_call(tool_call.name, arguments), None
+                except AgentError as e:
+                    return None, e
+
+        if len(tool_calls) == 1:
+            return [execute(tool_calls[0])]
+        with ThreadPoolExecutor(max_workers=min(self.max_tool_threads, len(tool_calls))) as executor:
+            return list(executor.map(execute, tool_calls))
+
+    async def _aexecute_tool_calls(self, tool_calls: List[ToolCall]) -> List[Tuple[Any, Optional[AgentError]]]:
+        """Asynchronous version of `_execute_tool_calls`, with the same limits on concurrent calls."""
+        pool = asyncio.Semaphore(self.max_tool_threads)
+        semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.tool_concurrency_limits.items()}
+
+        async def execute(tool_call: ToolCall) -> Tuple[Any, Optional[AgentError]]:
+            async with pool, semaphores.get(tool_call.name, nullcontext()):
+                try:
+                    arguments = tool_call.arguments if tool_call.arguments is not None else {}
+                    return await self.aexecute_tool_call(tool_call.name, arguments), None
+                except AgentError as e:
+                    return None, e
+
+        return await asyncio.gather(*(execute(tool_call) for tool_call in tool_calls))
+
+    def _record_observations(
+        self,
+        memory_step: ActionStep,
+        tool_calls: List[ToolCall],
+        outcomes: List[Tuple[Any, Optional[AgentError]]],
+        final: bool = False,
+    ):
+        """
+        Records the observation of each tool call, or its error. The step fails only if all its calls failed and it
+        does not give a final answer, so that the model sees the results of the calls that succeeded.
+        """
+        errors = [error for _, error in outcomes if error is not None]
+        if len(errors) == len(outcomes) and not final:
+            raise errors[0]
+        observations = [
+            f"Error:\n{error}" if error is not None else self._format_observation(observation)
+            for observation, error in outcomes
+        ]
+        if len(memory_step.tool_calls) == 1:
+            memory_step.observations = observations[0]
+            return
+        memory_step.tool_observations = observations
+        memory_step.observations = "\n\n".join(
+            f"Call id: {tool_call.id}\n{observation}" for tool_call, observation in zip(tool_calls, observations)
         )
-        if tool_name == "final_answer":
-            if isinstance(tool_arguments, dict):
-                if "answer" in tool_arguments:
-                    answer = tool_arguments["answer"]
-                else:
-                    answer = tool_arguments
+
+    def _record_final_answer(self, memory_step: ActionStep, tool_arguments: Any) -> Any:
+        if isinstance(tool_arguments, dict):
+            if "answer" in tool_arguments:
+                answer = tool_arguments["answer"]
             else:
                 answer = tool_arguments
-            if (
-                isinstance(answer, str) and answer in self.state.keys()
-            ):  # if the answer is a state variable, return the value
-                final_answer = self.state[answer]
-                self.logger.log(
-                    f"[bold {YELLOW_HEX}]Final answer:[/bold {YELLOW_HEX}] Extracting key '{answer}' from state to return value '{final_answer}'.",
-                    level=LogLevel.INFO,
-                )
-            else:
-                final_answer = answer
-                self.logger.log(
-                    Text(f"Final answer: {final_answer}", style=f"bold {YELLOW_HEX}"),
-                    level=LogLevel.INFO,
-                )
-
-            memory_step.action_output = final_answer
-            return final_answer
         else:
-            if tool_arguments is None:
-                tool_arguments = {}
-            observation = self.execute_tool_call(tool_name, tool_arguments)
-            observation_type = type(observation)
-            if observation_type in [AgentImage, AgentAudio]:
-                if observation_type == AgentImage:
-                    observation_name = "image.png"
-                elif observation_type == AgentAudio:
-                    observation_name = "audio.mp3"
-                # TODO: observation naming could allow for different names of same type
-
-                self.state[observation_name] = observation
-                updated_information = f"Stored '{observation_name}' in memory."
-            else:
-                updated_information = str(observation).strip()
+            answer = tool_arguments
+        if (
+            isinstance(answer, str) and answer in self.state.keys()
+        ):  # if the answer is a state variable, return the value
+            final_answer = self.state[answer]
+            self.logger.log(
+                f"[bold {YELLOW_HEX}]Final answer:[/bold {YELLOW_HEX}] Extracting key '{answer}' from state to return value '{final_answer}'.",
+                level=LogLevel.INFO,
+            )
+        else:
+            final_answer = answer
             self.logger.log(
-                f"Observations: {updated_information.replace('[', '|')}",  # escape potential rich-tag-like components
+                Text(f"Final answer: {final_answer}", style=f"bold {YELLOW_HEX}"),
                 level=LogLevel.INFO,
             )
-            memory_step.observations = updated_information
-            return None
+
+        memory_step.action_output = final_answer
+        return final_answer
+
+    def _format_observation(self, observation: Any) -> str:
+        observation_type = type(observation)
+        if observation_type in [AgentImage, AgentAudio]:
+            if observation_type == AgentImage:
+                observation_name = "image.png"
+            elif observation_type == AgentAudio:
+                observation_name = "audio.mp3"
+            # TODO: observation naming could allow for different names of same type
+
+            self.state[observation_name] = observation
+            updated_information = f"Stored '{observation_name}' in memory."
+        else:
+            updated_information = str(observation).strip()
+        self.logger.log(
+            f"Observations: {updated_information.replace('[', '|')}",  # escape potential rich-tag-like components
+            level=LogLevel.INFO,
+        )
+        return updated_information
 
 
 class CodeAgent(MultiStepAgent):
@@ -1135,6 +1440,9 @@ class CodeAgent(MultiStepAgent):
         planning_interval (`int`, *optional*): Interval at which the agent will run a planning step.
         use_e2b_executor (`bool`, default `False`): Whether to use the E2B executor for remote code execution.
         max_print_outputs_length (`int`, *optional*): Maximum length of the print outputs.
+        stream_print_outputs (`bool`, default `False`): Whether to log the print outputs of the code as soon as they are printed, instead of after the code has run.
+        stream_outputs (`bool`, default `False`): Whether to stream the model output to the logger as it is generated, and to stop the generation and run the code as soon as its code block is complete. Uses `model.generate_stream`.
+        executor_kwargs (`dict`, *optional*): Additional keyword arguments passed to the local Python executor, for instance `{"engine": "closure"}` or `{"timeout": 60, "max_memory_mb": 1024}` to bound each code action.
         **kwargs: Additional keyword arguments.
 
     """
@@ -1149,12 +1457,18 @@ class CodeAgent(MultiStepAgent):
         planning_interval: Optional[int] = None,
         use_e2b_executor: bool = False,
         max_print_outputs_length: Optional[int] = None,
+        stream_print_outputs: bool = False,
+        stream_outputs: bool = False,
+        executor_kwargs: Optional[Dict[str, Any]] = None,
         **kwargs,
     ):
         self.additional_authorized_imports = additional_authorized_imports if additional_authorized_imports else []
         self.authorized_imports = list(set(BASE_BUILTIN_MODULES) | set(self.additional_authorized_imports))
         self.use_e2b_executor = use_e2b_executor
         self.max_print_outputs_length = max_print_outputs_length
+        self.stream_print_outputs = stream_print_outputs
+        self.stream_outputs = stream_outputs
+        self.executor_kwargs = executor_kwargs if executor_kwargs is not None else {}
         prompt_templates = prompt_templates or yaml.safe_load(
             importlib.resources.files("smolagents.prompts").joinpath("code_agent.yaml").read_text()
         )
@@ -1177,16 +1491,47 @@ class CodeAgent(MultiStepAgent):
                 f"You passed both {use_e2b_executor=} and some managed agents. Managed agents is not yet supported with remote code execution."
             )
 
-        if use_e2b_executor:
-            self.python_executor = E2BExecutor(
+        self.python_executor = self._create_python_executor()
+
+    def _create_python_executor(self):
+        if self.use_e2b_executor:
+            return E2BExecutor(
                 self.additional_authorized_imports,
                 self.logger,
             )
-        else:
-            self.python_executor = LocalPythonInterpreter(
-                self.additional_authorized_imports,
-                max_print_outputs_length=max_print_outputs_length,
-            )
+        return LocalPythonInterpreter(
+            self.additional_authorized_imports,
+            max_print_outputs_length=self.max_print_outputs_length,
+            print_outputs_callback=self.log_print_outputs if self.stream_print_outputs else None,
+            **self.executor_kwargs,
+        )
+
+    def copy(self) -> "CodeAgent":
+        agent = super().copy()
+        agent.python_executor = agent._create_python_executor()
+        return agent
+
+    def log_print_outputs(self, text: str):
+        self.logger.log(Text(text.rstrip("\n")), level=LogLevel.INFO)
+
+    def generate_streamed_output(self, messages: List[Dict[str, str]], **kwargs) -> ChatMessage:
+        """
+        Streams the model output to the logger, and stops the generation as soon as the code action is complete
+        instead of waiting for the model to finish its message.
+        """
+        detector = CodeBlockDetector()
+        stream = self.model.generate_stream(messages, stop_sequences=["<end_code>", "Observation:"], **kwargs)
+        try:
+            for delta in stream:
+                self.logger.log(Text(delta), end="", level=LogLevel.INFO)
+                if detector.feed(delta):
+                    stop_stream(stream)
+                    break
+        finally:
+            # Cancels the generation if it was interrupted, e.g. by an error
+            stream.close()
+        self.logger.log("", level=LogLevel.INFO)
+        return ChatMessage(role=MessageRole.ASSISTANT, content=detector.output)
 
     def initialize_system_prompt(self) -> str:
         system_prompt = populate_template(
@@ -1208,25 +1553,53 @@ class CodeAgent(MultiStepAgent):
         Perform one step in the ReAct framework: the agent thinks, acts, and observes the result.
         Returns None if the step is not final.
         """
-        memory_messages = self.write_memory_to_messages()
+        memory_messages = self._prepare_step_input(memory_step)
+        try:
+            additional_args = {"grammar": self.grammar} if self.grammar is not None else {}
+            if self.stream_outputs:
+                chat_message = self.generate_streamed_output(memory_messages, **additional_args)
+            else:
+                chat_message: ChatMessage = self.model(
+                    memory_messages,
+                    stop_sequences=["<end_code>", "Observation:"],
+                    **additional_args,
+                )
+            memory_step.model_output_message = chat_message
+            memory_step.model_output = chat_message.content
+        except Exception as e:
+            raise AgentGenerationError(f"Error in generating model output:\n{e}", self.logger) from e
 
-        self.input_messages = memory_messages.copy()
+        code_action = self._parse_code_action(memory_step)
+        return self._execute_code_action(memory_step, code_action)
 
-        # Add new step in logs
-        memory_step.model_input_messages = memory_messages.copy()
+    async def astep(self, memory_step: ActionStep) -> Union[None, Any]:
+        """
+        Asynchronous version of `step`, which awaits the model. The code action calls its tools synchronously, so it
+        runs in a thread of the default executor.
+        """
+        memory_messages = self._prepare_step_input(memory_step)
         try:
             additional_args = {"grammar": self.grammar} if self.grammar is not None else {}
-            chat_message: ChatMessage = self.model(
-                self.input_messages,
-                stop_sequences=["<end_code>", "Observation:"],
-                **additional_args,
-            )
+            if self.stream_outputs:
+                chat_message = await asyncio.to_thread(
+                    self.generate_streamed_output, memory_messages, **additional_args
+                )
+            else:
+                chat_message: ChatMessage = await self.acall_model(
+                    memory_messages,
+                    stop_sequences=["<end_code>", "Observation:"],
+                    **additional_args,
+                )
             memory_step.model_output_message = chat_message
-            model_output = chat_message.content
-            memory_step.model_output = model_output
+            memory_step.model_output = chat_message.content
         except Exception as e:
             raise AgentGenerationError(f"Error in generating model output:\n{e}", self.logger) from e
 
+        code_action = self._parse_code_action(memory_step)
+        return await asyncio.to_thread(self._execute_code_action, memory_step, code_action)
+
+    def _parse_code_action(self, memory_step: ActionStep) -> str:
+        model_output = memory_step.model_output
         self.logger.log_markdown(
             content=model_output,
             title="Output message of the LLM:",
@@ -1247,14 +1620,16 @@ class CodeAgent(MultiStepAgent):
                 id=f"call_{len(self.memory.steps)}",
             )
         ]
+        return code_action
 
+    def _execute_code_action(self, memory_step: ActionStep, code_action: str) -> Union[None, Any]:
         # Execute
         self.logger.log_code(title="Executing parsed code:", content=code_action, level=LogLevel.INFO)
         is_final_answer = False
         try:
             output, execution_logs, is_final_answer = self.python_executor(code_action, self.state)
             execution_outputs_console = []
-            if len(execution_logs) > 0:
+            if len(execution_logs) > 0 and not self.stream_print_outputs:
                 execution_outputs_console += [
                     Text("Execution logs:", style="bold"),
                     Text(execution_logs),
@@ -1264,11 +1639,12 @@ class CodeAgent(MultiStepAgent):
             if hasattr(self.python_executor, "state") and "_print_outputs" in self.python_executor.state:
                 execution_logs = str(self.python_executor.state["_print_outputs"])
                 if len(execution_logs) > 0:
+                    memory_step.observations = "Execution logs:\n" + execution_logs
+                if len(execution_logs) > 0 and not self.stream_print_outputs:
                     execution_outputs_console = [
                         Text("Execution logs:", style="bold"),
                         Text(execution_logs),
                     ]
-                    memory_step.observations = "Execution logs:\n" + execution_logs
                     self.logger.log(Group(*execution_outputs_console), level=LogLevel.INFO)
             error_msg = str(e)
             if "Import of " in error_msg and " is not allowed" in error_msg:
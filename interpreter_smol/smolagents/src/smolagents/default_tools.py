@@ -15,8 +15,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from .local_python_executor import (
     BASE_BUILTIN_MODULES,
@@ -256,6 +259,113 @@ class VisitWebpageTool(Tool):
             return f"An unexpected error occurred: {str(e)}"
 
 
+class ParallelDelegationTool(Tool):
+    """Tool that gives tasks to several managed agents at once and gathers their reports.
+
+    Each task runs on its own copy of the managed agent, so the same agent can be given several tasks. An agent that
+    runs past the timeout is reported as timed out and stops at the end of its current step, since threads cannot be
+    killed. The failure or timeout of one task does not prevent the others from being reported.
+
+    Args:
+        managed_agents (`list`): Managed agents that can be given tasks.
+        max_workers (`int`, default `8`): Maximum number of agents running at the same time.
+        timeout (`float`, *optional*): Default maximum number of seconds each agent can work on its task.
+    """
+
+    name = "parallel_delegate"
+    description = (
+        "Gives tasks to several team members at once and waits for all their reports. Use it instead of calling team "
+        "members one after the other when their tasks do not depend on each other. Returns a list with one dict per "
+        "delegation, in the same order, with the keys 'agent', 'task', 'status' ('success', 'error' or 'timeout'), "
+        "and 'report' on success or 'error' otherwise."
+    )
+    inputs = {
+        "delegations": {
+            "type": "array",
+            "items": {"type": "object"},
+            "description": "The tasks to give, as a list of dicts with the keys 'agent' (the name of a team member) and 'task' (the task for this team member, as detailed as when calling it directly). The same team member can be given several tasks.",
+        },
+        "timeout": {
+            "type": "number",
+            "description": "Maximum number of seconds each team member can work on its task.",
+            "nullable": True,
+        },
+    }
+    output_type = "array"
+    poll_interval = 0.05
+
+    def __init__(self, managed_agents: List[Any], max_workers: int = 8, timeout: Optional[float] = None):
+        super().__init__()
+        self.managed_agents = {agent.name: agent for agent in managed_agents}
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def forward(self, delegations: list, timeout: Optional[float] = None) -> list:
+        timeout = timeout if timeout is not None else self.timeout
+        results = [None] * len(delegations)
+        jobs = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for index, delegation in enumerate(delegations):
+                if not isinstance(delegation, dict):
+                    error = f"Each delegation should be a dict with the keys 'agent' and 'task', got {delegation!r}."
+                    results[index] = self._result(None, None, "error", error=error)
+                    continue
+                agent_name, task = delegation.get("agent"), delegation.get("task")
+                if agent_name not in self.managed_agents:
+                    results[index] = self._result(
+                        agent_name,
+                        task,
+                        "error",
+                        error=f"Unknown team member {agent_name!r}, should be one of {list(self.managed_agents)}.",
+                    )
+                    continue
+                job = {"index": index, "agent": agent_name, "task": task, "start": None, "stop": threading.Event()}
+                jobs[executor.submit(self._delegate, job)] = job
+            pending = set(jobs)
+            while pending:
+                done, pending = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = jobs[future]
+                    if future.exception() is not None:
+                        error = f"{type(future.exception()).__name__}: {future.exception()}"
+                        results[job["index"]] = self._result(job["agent"], job["task"], "error", error=error)
+                    else:
+                        results[job["index"]] = self._result(
+                            job["agent"], job["task"], "success", report=future.result()
+                        )
+                if timeout is None:
+                    continue
+                now = time.time()
+                for future in list(pending):
+                    job = jobs[future]
+                    if job["start"] is not None and now - job["start"] > timeout:
+                        job["stop"].set()
+                        pending.discard(future)
+                        error = f"No report after {timeout} seconds."
+                        results[job["index"]] = self._result(job["agent"], job["task"], "timeout", error=error)
+        finally:
+            for job in jobs.values():
+                job["stop"].set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def _delegate(self, job: Dict[str, Any]) -> Any:
+        job["start"] = time.time()
+        agent = self.managed_agents[job["agent"]].copy()
+
+        def stop_when_timed_out(memory_step):
+            if job["stop"].is_set():
+                raise TimeoutError(f"Team member {job['agent']!r} ran out of time.")
+
+        agent.step_callbacks.append(stop_when_timed_out)
+        return agent(job["task"])
+
+    @staticmethod
+    def _result(agent: str, task: str, status: str, **details) -> Dict[str, Any]:
+        return {"agent": agent, "task": task, "status": status, **details}
+
+
 class SpeechToTextTool(PipelineTool):
     default_checkpoint = "openai/whisper-large-v3-turbo"
     description = "This is a tool that transcribes an audio into text. It returns the transcribed text."
@@ -304,6 +414,7 @@ __all__ = [
     "PythonInterpreterTool",
     "FinalAnswerTool",
     "UserInputTool",
+    "ParallelDelegationTool",
     "DuckDuckGoSearchTool",
     "GoogleSearchTool",
     "VisitWebpageTool",
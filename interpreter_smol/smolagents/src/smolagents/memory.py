@@ -1,10 +1,12 @@
+import bisect
+import hashlib
 from dataclasses import asdict, dataclass
 from logging import getLogger
-from typing import TYPE_CHECKING, Any, Dict, List, TypedDict, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, TypedDict, Union
 
 from smolagents.models import ChatMessage, MessageRole
 from smolagents.monitoring import AgentLogger, LogLevel
-from smolagents.utils import AgentError, make_json_serializable
+from smolagents.utils import AgentError, make_json_serializable, truncate_content
 
 
 if TYPE_CHECKING:
@@ -37,8 +39,26 @@ class ToolCall:
         }
 
 
+@dataclass
+class MessagesReference:
+    """
+    Compact reference to the input messages of a step: the first `length` messages of the memory, which had the
+    given `digest`, with `summary` replacing the older steps if the memory was compacted then. It lets steps avoid
+    holding a copy of the whole history each.
+    """
+
+    length: int
+    digest: str
+    summary: "SummaryStep | None" = None
+
+
 @dataclass
 class MemoryStep:
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # Tells `AgentMemory` that the messages rendered from this step are outdated
+        super().__setattr__("_version", self.__dict__.get("_version", 0) + 1)
+
     def dict(self):
         return asdict(self)
 
@@ -49,6 +69,7 @@ class MemoryStep:
 @dataclass
 class ActionStep(MemoryStep):
     model_input_messages: List[Message] | None = None
+    model_input_reference: MessagesReference | None = None
     tool_calls: List[ToolCall] | None = None
     start_time: float | None = None
     end_time: float | None = None
@@ -58,6 +79,8 @@ class ActionStep(MemoryStep):
     model_output_message: ChatMessage = None
     model_output: str | None = None
     observations: str | None = None
+    # One observation per tool call, in the order of `tool_calls`, when a step makes several calls
+    tool_observations: List[str] | None = None
     observations_images: List[str] | None = None
     action_output: Any = None
 
@@ -74,6 +97,7 @@ class ActionStep(MemoryStep):
             "model_output_message": self.model_output_message,
             "model_output": self.model_output,
             "observations": self.observations,
+            "tool_observations": self.tool_observations,
             "action_output": make_json_serializable(self.action_output),
         }
 
@@ -99,7 +123,15 @@ class ActionStep(MemoryStep):
                 )
             )
 
-        if self.observations is not None:
+        if self.tool_observations is not None:
+            for tool_call, observation in zip(self.tool_calls, self.tool_observations):
+                messages.append(
+                    Message(
+                        role=MessageRole.TOOL_RESPONSE,
+                        content=[{"type": "text", "text": f"Call id: {tool_call.id}\nObservation:\n{observation}"}],
+                    )
+                )
+        elif self.observations is not None:
             messages.append(
                 Message(
                     role=MessageRole.TOOL_RESPONSE,
@@ -189,13 +221,233 @@ class SystemPromptStep(MemoryStep):
         return [Message(role=MessageRole.SYSTEM, content=[{"type": "text", "text": self.system_prompt}])]
 
 
+@dataclass
+class SummaryStep(MemoryStep):
+    summary: str
+    summarized_steps: int
+
+    def to_messages(self, summary_mode: bool = False, **kwargs) -> List[Message]:
+        return [
+            Message(
+                role=MessageRole.ASSISTANT,
+                content=[{"type": "text", "text": f"[SUMMARY OF EARLIER STEPS]:\n{self.summary.strip()}"}],
+            )
+        ]
+
+
+def estimate_token_count(text: str) -> int:
+    """Rough token count of a text, about 4 characters per token for English."""
+    return len(text) // 4 + 1
+
+
+def summarize_steps_with_model(model: Callable[[List[Message]], "ChatMessage"]) -> Callable[[List[MemoryStep]], str]:
+    """Returns a summarizer for `CompactionPolicy` that asks `model` to summarize the messages of the steps."""
+
+    def summarize(steps: List[MemoryStep]) -> str:
+        messages = [message for step in steps for message in step.to_messages(summary_mode=False)]
+        messages.append(
+            Message(
+                role=MessageRole.USER,
+                content=[
+                    {
+                        "type": "text",
+                        "text": "Summarize the conversation above in a few paragraphs, keeping the tasks, the facts "
+                        "learned, the results obtained, the variables and files created, and the errors to avoid.",
+                    }
+                ],
+            )
+        )
+        return model(messages).content
+
+    return summarize
+
+
+def summarize_steps_by_truncation(steps: List[MemoryStep]) -> str:
+    """Summarizer for `CompactionPolicy` that needs no model: keeps the beginning and end of each step's text."""
+    return "\n".join(
+        truncate_content(element["text"], max_length=300)
+        for step in steps
+        for message in step.to_messages(summary_mode=True)
+        for element in message["content"]
+        if element["type"] == "text"
+    )
+
+
+class CompactionPolicy:
+    """
+    How to compact a memory that has grown beyond a token budget: the system prompt and the last steps are kept
+    verbatim, and the older steps are replaced with a summary, which is summarized again with the next old steps at the
+    next compaction.
+
+    Args:
+        token_budget (`int`): Number of tokens of the memory's messages beyond which it is compacted.
+        keep_last_steps (`int`, default `4`): Number of last steps kept verbatim.
+        token_counter (`Callable[[str], int]`, *optional*): Counts the tokens of a text, defaults to
+            `estimate_token_count`. Pass the tokenizer of the model for an exact count.
+        summarizer (`Callable[[List[MemoryStep]], str]`, *optional*): Summarizes steps, defaults to
+            `summarize_steps_by_truncation`. Use `summarize_steps_with_model` to summarize with a model.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        keep_last_steps: int = 4,
+        token_counter: Callable[[str], int] | None = None,
+        summarizer: Callable[[List[MemoryStep]], str] | None = None,
+    ):
+        self.token_budget = token_budget
+        self.keep_last_steps = keep_last_steps
+        self.token_counter = token_counter or estimate_token_count
+        self.summarizer = summarizer or summarize_steps_by_truncation
+
+    def count_tokens(self, messages: List[Message]) -> int:
+        total = 0
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                total += self.token_counter(content)
+            else:
+                total += sum(self.token_counter(element["text"]) for element in content if element["type"] == "text")
+        return total
+
+
+class RenderedMessages:
+    """
+    Messages rendered from a sequence of memory steps, kept so that only new or modified steps are rendered again.
+
+    Each step is stored with its version, which changes whenever one of its attributes is set: from the first step that
+    changed or was replaced, the messages are rendered again. Mutating a step's attributes in place, like appending to
+    a list, is not detected.
+    """
+
+    def __init__(self, summary_mode: bool):
+        self.summary_mode = summary_mode
+        self.steps: List[tuple[MemoryStep, int]] = []
+        self.offsets: List[int] = []
+        self.messages: List[Message] = []
+        # Digest of the messages up to the end of each step, chained from the previous one
+        self.digests: List[str] = []
+
+    def truncate(self, index: int):
+        if index < len(self.steps):
+            del self.messages[self.offsets[index] :]
+            del self.offsets[index:]
+            del self.steps[index:]
+            del self.digests[index:]
+
+    def update(self, steps: List[MemoryStep]) -> List[Message]:
+        for index, step in enumerate(steps):
+            if index < len(self.steps):
+                cached_step, version = self.steps[index]
+                if cached_step is step and version == step._version:
+                    continue
+                self.truncate(index)
+            step_messages = step.to_messages(summary_mode=self.summary_mode)
+            digest = self.digests[-1] if self.digests else ""
+            if step_messages:
+                digest = hashlib.sha256(f"{digest}{step_messages!r}".encode()).hexdigest()
+            self.steps.append((step, step._version))
+            self.offsets.append(len(self.messages))
+            self.messages.extend(step_messages)
+            self.digests.append(digest)
+        self.truncate(len(steps))
+        return self.messages
+
+    def get_digest(self, length: int) -> str | None:
+        """Returns the digest of the first `length` messages, or None if they do not end with a step."""
+        if length == 0:
+            return ""
+        # The first step starting at or after `length`: the step before it must end exactly there
+        index = bisect.bisect_left(self.offsets, length)
+        if index == len(self.offsets):
+            return self.digests[-1] if len(self.messages) == length else None
+        return self.digests[index - 1] if self.offsets[index] == length else None
+
+
 class AgentMemory:
     def __init__(self, system_prompt: str):
         self.system_prompt = SystemPromptStep(system_prompt=system_prompt)
         self.steps: List[Union[TaskStep, ActionStep, PlanningStep]] = []
+        self.rendered_messages: Dict[bool, RenderedMessages] = {}
+        # Summary replacing the first `summary.summarized_steps` steps in the messages, after a compaction
+        self.summary: SummaryStep | None = None
+        # Messages as they were before the last compactions, to rebuild the input messages of the steps run then
+        self.past_rendered_messages: Dict[int, tuple[SummaryStep | None, RenderedMessages]] = {}
 
     def reset(self):
         self.steps = []
+        self.rendered_messages.clear()
+        self.summary = None
+        self.past_rendered_messages.clear()
+
+    def compact(self, policy: CompactionPolicy) -> bool:
+        """
+        Replace the older steps with a summary in the messages if they exceed the token budget of `policy`. The steps
+        themselves are kept, so `get_full_steps` and `replay` still show everything. This can take time if the
+        summarizer calls a model: run it between agent runs, e.g. in a thread, and not during one.
+
+        Returns whether the memory was compacted.
+        """
+        if policy.count_tokens(self.get_messages()) <= policy.token_budget:
+            return False
+        summarized_steps = self.summary.summarized_steps if self.summary is not None else 0
+        end = len(self.steps) - policy.keep_last_steps
+        if end <= summarized_steps:
+            return False
+        steps_to_summarize = ([self.summary] if self.summary is not None else []) + self.steps[summarized_steps:end]
+        self.summary = SummaryStep(summary=policy.summarizer(steps_to_summarize), summarized_steps=end)
+        return True
+
+    def get_messages(self, summary_mode: bool = False) -> List[Message]:
+        """
+        Returns the messages of the system prompt and of all steps, rendering only the steps added or modified since
+        the last call. The returned list is new, but its messages are shared with the cache: do not modify them.
+        """
+        return list(self.render(summary_mode).messages)
+
+    def render(self, summary_mode: bool = False) -> RenderedMessages:
+        if summary_mode not in self.rendered_messages:
+            self.rendered_messages[summary_mode] = RenderedMessages(summary_mode)
+        return self.render_with_summary(self.rendered_messages[summary_mode], self.summary)
+
+    def render_with_summary(self, rendered: RenderedMessages, summary: SummaryStep | None) -> RenderedMessages:
+        if summary is not None:
+            rendered.update([self.system_prompt, summary] + self.steps[summary.summarized_steps :])
+        else:
+            rendered.update([self.system_prompt] + self.steps)
+        return rendered
+
+    def render_reference(self, reference: MessagesReference) -> RenderedMessages:
+        """Renders the messages a reference was taken from, with the summary of the memory at that time."""
+        if reference.summary is self.summary:
+            return self.render()
+        key = id(reference.summary)
+        if key not in self.past_rendered_messages or self.past_rendered_messages[key][0] is not reference.summary:
+            self.past_rendered_messages[key] = (reference.summary, RenderedMessages(summary_mode=False))
+        return self.render_with_summary(self.past_rendered_messages[key][1], reference.summary)
+
+    def get_messages_reference(self) -> MessagesReference:
+        """Returns a reference to the current messages of the memory, to record them as the input of a step."""
+        rendered = self.render()
+        length = len(rendered.messages)
+        return MessagesReference(length=length, digest=rendered.get_digest(length), summary=self.summary)
+
+    def get_model_input_messages(self, step: MemoryStep) -> List[Message] | None:
+        """
+        Returns the input messages of a step, rebuilding them from the memory if the step only holds a reference.
+        Logs a warning if the referenced steps were modified since, as the messages rebuilt then differ.
+        """
+        reference = getattr(step, "model_input_reference", None)
+        if getattr(step, "model_input_messages", None) is not None or reference is None:
+            return getattr(step, "model_input_messages", None)
+        rendered = self.render_reference(reference)
+        messages = rendered.messages[: reference.length]
+        if rendered.get_digest(reference.length) != reference.digest:
+            logger.warning(
+                f"The memory was modified since step {step.step_number} was run: its input messages are rebuilt from "
+                "the current memory."
+            )
+        return messages
 
     def get_succinct_steps(self) -> list[dict]:
         return [
@@ -203,7 +455,13 @@ class AgentMemory:
         ]
 
     def get_full_steps(self) -> list[dict]:
-        return [step.dict() for step in self.steps]
+        full_steps = []
+        for step in self.steps:
+            step_dict = step.dict()
+            if isinstance(step, ActionStep) and step.model_input_messages is None:
+                step_dict["model_input_messages"] = self.get_model_input_messages(step)
+            full_steps.append(step_dict)
+        return full_steps
 
     def replay(self, logger: AgentLogger, detailed: bool = False):
         """Prints a pretty replay of the agent's steps.
@@ -222,7 +480,7 @@ class AgentMemory:
             elif isinstance(step, ActionStep):
                 logger.log_rule(f"Step {step.step_number}", level=LogLevel.ERROR)
                 if detailed:
-                    logger.log_messages(step.model_input_messages)
+                    logger.log_messages(self.get_model_input_messages(step))
                 logger.log_markdown(title="Agent output:", content=step.model_output, level=LogLevel.ERROR)
             elif isinstance(step, PlanningStep):
                 logger.log_rule("Planning step", level=LogLevel.ERROR)
@@ -231,4 +489,4 @@ class AgentMemory:
                 logger.log_markdown(title="Agent output:", content=step.facts + "\n" + step.plan, level=LogLevel.ERROR)
 
 
-__all__ = ["AgentMemory"]
+__all__ = ["AgentMemory", "CompactionPolicy"]
@@ -14,6 +14,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import json
 import logging
 import os
@@ -22,9 +23,9 @@ import uuid
 from copy import deepcopy
 from dataclasses import asdict, dataclass
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, Generator, Iterable, List, Optional, Union
 
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 from huggingface_hub.utils import is_torch_available
 from PIL import Image
 
@@ -201,44 +202,73 @@ def get_clean_message_list(
         flatten_messages_as_text (`bool`, default `False`): Whether to flatten messages as text.
     """
     output_message_list = []
-    message_list = deepcopy(message_list)  # Avoid modifying the original list
+    # The original messages are not modified, only the parts that change are copied: this avoids a deep copy of the
+    # whole history, which the agent memory caches and passes again at every step
     for message in message_list:
         role = message["role"]
         if role not in MessageRole.roles():
             raise ValueError(f"Incorrect role {role}, only {MessageRole.roles()} are supported for now.")
 
-        if role in role_conversions:
-            message["role"] = role_conversions[role]
+        role = role_conversions.get(role, role)
+        content = message["content"]
         # encode images if needed
-        if isinstance(message["content"], list):
-            for element in message["content"]:
-                if element["type"] == "image":
-                    assert not flatten_messages_as_text, f"Cannot use images with {flatten_messages_as_text=}"
-                    if convert_images_to_image_urls:
-                        element.update(
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": make_image_url(encode_image_base64(element.pop("image")))},
-                            }
-                        )
-                    else:
-                        element["image"] = encode_image_base64(element["image"])
+        if isinstance(content, list):
+            content = [
+                get_clean_image_element(element, convert_images_to_image_urls, flatten_messages_as_text)
+                if element["type"] == "image"
+                else element
+                for element in content
+            ]
 
-        if len(output_message_list) > 0 and message["role"] == output_message_list[-1]["role"]:
-            assert isinstance(message["content"], list), "Error: wrong content:" + str(message["content"])
+        if len(output_message_list) > 0 and role == output_message_list[-1]["role"]:
+            assert isinstance(content, list), "Error: wrong content:" + str(content)
             if flatten_messages_as_text:
-                output_message_list[-1]["content"] += message["content"][0]["text"]
+                output_message_list[-1]["content"] += content[0]["text"]
             else:
-                output_message_list[-1]["content"] += message["content"]
+                output_message_list[-1]["content"] += content
         else:
             if flatten_messages_as_text:
-                content = message["content"][0]["text"]
-            else:
-                content = message["content"]
-            output_message_list.append({"role": message["role"], "content": content})
+                content = content[0]["text"]
+            output_message_list.append({"role": role, "content": content})
     return output_message_list
 
 
+def get_clean_image_element(
+    element: Dict[str, Any], convert_images_to_image_urls: bool, flatten_messages_as_text: bool
+) -> Dict[str, Any]:
+    """Returns a copy of an image element of a message with its image encoded."""
+    assert not flatten_messages_as_text, f"Cannot use images with {flatten_messages_as_text=}"
+    element = dict(element)
+    if convert_images_to_image_urls:
+        element.update(
+            {
+                "type": "image_url",
+                "image_url": {"url": make_image_url(encode_image_base64(element.pop("image")))},
+            }
+        )
+    else:
+        element["image"] = encode_image_base64(element["image"])
+    return element
+
+
+class StopGeneration(Exception):
+    """Thrown into a stream of `Model.generate_stream` by `stop_stream`."""
+
+
+def stop_stream(stream: Generator[str, None, None]) -> None:
+    """
+    Stops a stream of `Model.generate_stream` whose consumer has all the output it needs, like a complete code action.
+    Unlike closing the stream, which also happens on errors, this tells wrappers of the model, like a cache, that the
+    output so far is a complete response.
+    """
+    try:
+        stream.throw(StopGeneration())
+    except (StopGeneration, StopIteration):
+        pass
+    finally:
+        stream.close()
+
+
 class Model:
     def __init__(self, **kwargs):
         self.last_input_token_count = None
@@ -331,6 +361,84 @@ class Model:
         """
         pass  # To be implemented in child classes!
 
+    async def __acall__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        """Asynchronous version of `__call__`, used by `MultiStepAgent.arun`.
+
+        Models with an asynchronous client await it, so that one event loop can wait on many requests. The others run
+        `__call__` in a thread of the default executor, which does not block the event loop either.
+        """
+        return await asyncio.to_thread(
+            self.__call__,
+            messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            **kwargs,
+        )
+
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        **kwargs,
+    ) -> Generator[str, None, None]:
+        """Yields the text of the model's response as it is generated.
+
+        Closing the generator before its end cancels the generation, for instance on an error. A consumer that stops
+        it because it has a complete response, like a complete code action, uses `stop_stream` instead. Models that do
+        not implement streaming yield their whole response once it is generated.
+
+        Parameters:
+            messages (`List[Dict[str, str]]`):
+                A list of message dictionaries to be processed, like for `__call__`.
+            stop_sequences (`List[str]`, *optional*):
+                A list of strings that will stop the generation if encountered in the model's output.
+            grammar (`str`, *optional*):
+                The grammar or formatting structure to use in the model's response.
+            **kwargs:
+                Additional keyword arguments to be passed to the underlying model.
+        """
+        yield self(messages, stop_sequences=stop_sequences, grammar=grammar, **kwargs).content or ""
+
+    def stream_deltas(self, stream: Iterable) -> Generator[str, None, None]:
+        """
+        Yields the text deltas of an OpenAI-style stream of chat completion chunks and records its token counts if it
+        reports them. The stream is closed when the generator is, which cancels the request.
+        """
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    self.last_input_token_count = usage.prompt_tokens
+                    self.last_output_token_count = usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+
+    def process_response(self, response, tools_to_call_from: Optional[List[Tool]] = None) -> ChatMessage:
+        """Records the token counts of an OpenAI-style chat completion response and converts it to a `ChatMessage`."""
+        self.last_input_token_count = response.usage.prompt_tokens
+        self.last_output_token_count = response.usage.completion_tokens
+        message = ChatMessage.from_dict(
+            response.choices[0].message.model_dump(include={"role", "content", "tool_calls"})
+        )
+        message.raw = response
+        if tools_to_call_from is not None:
+            return parse_tool_args_if_needed(message)
+        return message
+
     def to_dict(self) -> Dict:
         """
         Converts the model into a JSON-compatible dictionary.
@@ -435,6 +543,7 @@ class HfApiModel(Model):
         if token is None:
             token = os.getenv("HF_TOKEN")
         self.client = InferenceClient(self.model_id, provider=provider, token=token, timeout=timeout)
+        self.async_client = AsyncInferenceClient(self.model_id, provider=provider, token=token, timeout=timeout)
         self.custom_role_conversions = custom_role_conversions
 
     def __call__(
@@ -455,7 +564,29 @@ class HfApiModel(Model):
             **kwargs,
         )
         response = self.client.chat_completion(**completion_kwargs)
+        return self.process_response(response, tools_to_call_from)
+
+    async def __acall__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            convert_images_to_image_urls=True,
+            custom_role_conversions=self.custom_role_conversions,
+            **kwargs,
+        )
+        response = await self.async_client.chat_completion(**completion_kwargs)
+        return self.process_response(response, tools_to_call_from)
 
+    def process_response(self, response, tools_to_call_from: Optional[List[Tool]] = None) -> ChatMessage:
         self.last_input_token_count = response.usage.prompt_tokens
         self.last_output_token_count = response.usage.completion_tokens
         message = ChatMessage.from_hf_api(response.choices[0].message, raw=response)
@@ -463,6 +594,23 @@ class HfApiModel(Model):
             return parse_tool_args_if_needed(message)
         return message
 
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        **kwargs,
+    ) -> Generator[str, None, None]:
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            convert_images_to_image_urls=True,
+            custom_role_conversions=self.custom_role_conversions,
+            **kwargs,
+        )
+        yield from self.stream_deltas(self.client.chat_completion(**completion_kwargs, stream=True))
+
 
 class MLXModel(Model):
     """A class to interact with models loaded using MLX on Apple silicon.
@@ -883,17 +1031,68 @@ class LiteLLMModel(Model):
         )
 
         response = litellm.completion(**completion_kwargs)
+        return self.process_response(response, tools_to_call_from)
 
-        self.last_input_token_count = response.usage.prompt_tokens
-        self.last_output_token_count = response.usage.completion_tokens
-        message = ChatMessage.from_dict(
-            response.choices[0].message.model_dump(include={"role", "content", "tool_calls"})
+    async def __acall__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        try:
+            import litellm
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "Please install 'litellm' extra to use LiteLLMModel: `pip install 'smolagents[litellm]'`"
+            )
+
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            model=self.model_id,
+            api_base=self.api_base,
+            api_key=self.api_key,
+            convert_images_to_image_urls=True,
+            flatten_messages_as_text=self.flatten_messages_as_text,
+            custom_role_conversions=self.custom_role_conversions,
+            **kwargs,
         )
-        message.raw = response
 
-        if tools_to_call_from is not None:
-            return parse_tool_args_if_needed(message)
-        return message
+        response = await litellm.acompletion(**completion_kwargs)
+        return self.process_response(response, tools_to_call_from)
+
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        **kwargs,
+    ) -> Generator[str, None, None]:
+        try:
+            import litellm
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "Please install 'litellm' extra to use LiteLLMModel: `pip install 'smolagents[litellm]'`"
+            )
+
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            model=self.model_id,
+            api_base=self.api_base,
+            api_key=self.api_key,
+            convert_images_to_image_urls=True,
+            flatten_messages_as_text=self.flatten_messages_as_text,
+            custom_role_conversions=self.custom_role_conversions,
+            **kwargs,
+        )
+        stream = litellm.completion(**completion_kwargs, stream=True, stream_options={"include_usage": True})
+        yield from self.stream_deltas(stream)
 
 
 class OpenAIServerModel(Model):
@@ -946,6 +1145,13 @@ class OpenAIServerModel(Model):
             project=project,
             **(client_kwargs or {}),
         )
+        self.async_client = openai.AsyncOpenAI(
+            base_url=api_base,
+            api_key=api_key,
+            organization=organization,
+            project=project,
+            **(client_kwargs or {}),
+        )
         self.custom_role_conversions = custom_role_conversions
 
     def __call__(
@@ -967,16 +1173,49 @@ class OpenAIServerModel(Model):
             **kwargs,
         )
         response = self.client.chat.completions.create(**completion_kwargs)
-        self.last_input_token_count = response.usage.prompt_tokens
-        self.last_output_token_count = response.usage.completion_tokens
+        return self.process_response(response, tools_to_call_from)
 
-        message = ChatMessage.from_dict(
-            response.choices[0].message.model_dump(include={"role", "content", "tool_calls"})
+    async def __acall__(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        tools_to_call_from: Optional[List[Tool]] = None,
+        **kwargs,
+    ) -> ChatMessage:
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            tools_to_call_from=tools_to_call_from,
+            model=self.model_id,
+            custom_role_conversions=self.custom_role_conversions,
+            convert_images_to_image_urls=True,
+            **kwargs,
         )
-        message.raw = response
-        if tools_to_call_from is not None:
-            return parse_tool_args_if_needed(message)
-        return message
+        response = await self.async_client.chat.completions.create(**completion_kwargs)
+        return self.process_response(response, tools_to_call_from)
+
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        stop_sequences: Optional[List[str]] = None,
+        grammar: Optional[str] = None,
+        **kwargs,
+    ) -> Generator[str, None, None]:
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            grammar=grammar,
+            model=self.model_id,
+            custom_role_conversions=self.custom_role_conversions,
+            convert_images_to_image_urls=True,
+            **kwargs,
+        )
+        stream = self.client.chat.completions.create(
+            **completion_kwargs, stream=True, stream_options={"include_usage": True}
+        )
+        yield from self.stream_deltas(stream)
 
 
 class AzureOpenAIServerModel(OpenAIServerModel):
@@ -1016,6 +1255,9 @@ class AzureOpenAIServerModel(OpenAIServerModel):
         import openai
 
         self.client = openai.AzureOpenAI(api_key=api_key, api_version=api_version, azure_endpoint=azure_endpoint)
+        self.async_client = openai.AsyncAzureOpenAI(
+            api_key=api_key, api_version=api_version, azure_endpoint=azure_endpoint
+        )
 
 
 __all__ = [
@@ -15,6 +15,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import ast
+import asyncio
 import inspect
 import json
 import logging
@@ -99,6 +100,9 @@ class Tool:
     You can also override the method [`~Tool.setup`] if your tool has an expensive operation to perform before being
     usable (such as loading a model). [`~Tool.setup`] will be called the first time you use your tool, but not at
     instantiation.
+
+    Tools that wait on I/O can also implement the coroutine [`~Tool.aforward`], which asynchronous agents await
+    instead of running `forward` in a thread.
     """
 
     name: str
@@ -172,10 +176,15 @@ class Tool:
     def forward(self, *args, **kwargs):
         return NotImplementedError("Write this method in your subclass of `Tool`.")
 
-    def __call__(self, *args, sanitize_inputs_outputs: bool = False, **kwargs):
-        if not self.is_initialized:
-            self.setup()
+    async def aforward(self, *args, **kwargs):
+        """
+        Asynchronous version of `forward`. By default, runs `forward` in a thread of the default executor so that
+        blocking tools do not block the event loop: override it in tools that have a natively asynchronous
+        implementation.
+        """
+        return await asyncio.to_thread(self.forward, *args, **kwargs)
 
+    def _prepare_arguments(self, args: tuple, kwargs: dict) -> tuple:
         # Handle the arguments might be passed as a single dictionary
         if len(args) == 1 and len(kwargs) == 0 and isinstance(args[0], dict):
             potential_kwargs = args[0]
@@ -184,7 +193,13 @@ class Tool:
             if all(key in self.inputs for key in potential_kwargs):
                 args = ()
                 kwargs = potential_kwargs
+        return args, kwargs
+
+    def __call__(self, *args, sanitize_inputs_outputs: bool = False, **kwargs):
+        if not self.is_initialized:
+            self.setup()
 
+        args, kwargs = self._prepare_arguments(args, kwargs)
         if sanitize_inputs_outputs:
             args, kwargs = handle_agent_input_types(*args, **kwargs)
         outputs = self.forward(*args, **kwargs)
@@ -192,6 +207,19 @@ class Tool:
             outputs = handle_agent_output_types(outputs, self.output_type)
         return outputs
 
+    async def acall(self, *args, sanitize_inputs_outputs: bool = False, **kwargs):
+        """Asynchronous version of `__call__`, which awaits `aforward`."""
+        if not self.is_initialized:
+            await asyncio.to_thread(self.setup)
+
+        args, kwargs = self._prepare_arguments(args, kwargs)
+        if sanitize_inputs_outputs:
+            args, kwargs = handle_agent_input_types(*args, **kwargs)
+        outputs = await self.aforward(*args, **kwargs)
+        if sanitize_inputs_outputs:
+            outputs = handle_agent_output_types(outputs, self.output_type)
+        return outputs
+
     def setup(self):
         """
         Overwrite this method here for any operation that is expensive and needs to be executed before you start using
@@ -1031,6 +1059,10 @@ class PipelineTool(Tool):
             decoded_outputs = handle_agent_output_types(decoded_outputs, self.output_type)
         return decoded_outputs
 
+    async def acall(self, *args, sanitize_inputs_outputs: bool = False, **kwargs):
+        # Encoding and decoding happen around `forward`, so the whole call runs in a thread
+        return await asyncio.to_thread(self.__call__, *args, sanitize_inputs_outputs=sanitize_inputs_outputs, **kwargs)
+
 
 __all__ = [
     "AUTHORIZED_TYPES",
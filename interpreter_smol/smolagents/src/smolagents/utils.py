@@ -200,6 +200,47 @@ Code:
     return "\n\n".join(match.strip() for match in matches)
 
 
+class CodeBlockDetector:
+    """
+    Detects the end of the code action in a model output streamed piece by piece: the closing fence of its first code
+    block, or the `<end_code>` marker. Only the end of the output is scanned at each piece.
+    """
+
+    opening_pattern = re.compile(r"```(?:py|python)?\n")
+    end_code = "<end_code>"
+
+    def __init__(self):
+        self.text = ""
+        self.code_start = None
+        self.end = None
+
+    def feed(self, delta: str) -> bool:
+        """Adds a piece of output, and returns whether the code action is complete."""
+        # Markers can be split across pieces: scan a few characters before the new piece too
+        scan_start = max(0, len(self.text) - len(self.end_code))
+        self.text += delta
+        end_code_index = self.text.find(self.end_code, scan_start)
+        if end_code_index != -1:
+            self.end = end_code_index
+            return True
+        if self.code_start is None:
+            match = self.opening_pattern.search(self.text, max(0, scan_start - 10))
+            if match is None:
+                return False
+            self.code_start = match.end() - 1
+            scan_start = self.code_start
+        closing_index = self.text.find("\n```", max(self.code_start, scan_start - 4))
+        if closing_index != -1:
+            self.end = closing_index + len("\n```")
+            return True
+        return False
+
+    @property
+    def output(self) -> str:
+        """The output up to the end of the code action, or the whole output if it is not complete."""
+        return self.text[: self.end] if self.end is not None else self.text
+
+
 def parse_json_tool_call(json_blob: str) -> Tuple[str, Union[str, None]]:
     json_blob = json_blob.replace("```json", "").replace("```", "")
     tool_call = parse_json_blob(json_blob)
@@ -225,6 +266,7 @@ def parse_json_tool_call(json_blob: str) -> Tuple[str, Union[str, None]]:
 
 
 MAX_LENGTH_TRUNCATE_CONTENT = 20000
+TRUNCATION_MARKER = "\n..._This content has been truncated to stay below {max_length} characters_...\n"
 
 
 def truncate_content(content: str, max_length: int = MAX_LENGTH_TRUNCATE_CONTENT) -> str:
@@ -232,9 +274,7 @@ def truncate_content(content: str, max_length: int = MAX_LENGTH_TRUNCATE_CONTENT
         return content
     else:
         return (
-            content[: max_length // 2]
-            + f"\n..._This content has been truncated to stay below {max_length} characters_...\n"
-            + content[-max_length // 2 :]
+            content[: max_length // 2] + TRUNCATION_MARKER.format(max_length=max_length) + content[-max_length // 2 :]
         )
 
 
@@ -12,8 +12,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import os
+import re
 import tempfile
+import threading
+import time
 import unittest
 import uuid
 from pathlib import Path
@@ -32,16 +36,18 @@ from smolagents.agents import (
     populate_template,
 )
 from smolagents.default_tools import DuckDuckGoSearchTool, FinalAnswerTool, PythonInterpreterTool, VisitWebpageTool
-from smolagents.memory import PlanningStep
+from smolagents.memory import ActionStep, PlanningStep
 from smolagents.models import (
     ChatMessage,
     ChatMessageToolCall,
     ChatMessageToolCallDefinition,
     HfApiModel,
     MessageRole,
+    Model,
+    StopGeneration,
     TransformersModel,
 )
-from smolagents.tools import tool
+from smolagents.tools import Tool, tool
 from smolagents.utils import BASE_BUILTIN_MODULES
 
 
@@ -395,6 +401,16 @@ class AgentTests(unittest.TestCase):
         agent.run("What is 2 multiplied by 3.6452?")
         assert "Flag!" in str(agent.memory.steps[1].observations)
 
+    def test_code_agent_streams_print_outputs(self):
+        agent = CodeAgent(
+            tools=[PythonInterpreterTool()], model=fake_code_model_error, stream_print_outputs=True, verbosity_level=0
+        )
+        agent.logger = MagicMock()
+        agent.run("What is 2 multiplied by 3.6452?")
+        streamed_logs = [str(call.args[0]) for call in agent.logger.log.call_args_list]
+        assert "Flag!" in streamed_logs
+        assert "Flag!" in str(agent.memory.steps[1].observations)
+
     def test_code_agent_syntax_error_show_offending_lines(self):
         agent = CodeAgent(tools=[PythonInterpreterTool()], model=fake_code_model_syntax_error)
         output = agent.run("What is 2 multiplied by 3.6452?")
@@ -475,6 +491,18 @@ class AgentTests(unittest.TestCase):
         res = agent.run("ok")
         assert res[0] == 0.5
 
+    def test_function_persistence_across_steps_with_closure_engine(self):
+        agent = CodeAgent(
+            tools=[],
+            model=fake_code_functiondef,
+            max_steps=2,
+            additional_authorized_imports=["numpy"],
+            executor_kwargs={"engine": "closure"},
+        )
+        assert agent.python_executor.engine == "closure"
+        res = agent.run("ok")
+        assert res[0] == 0.5
+
     def test_init_managed_agent(self):
         agent = CodeAgent(tools=[], model=fake_code_functiondef, name="managed_agent", description="Empty")
         assert agent.name == "managed_agent"
@@ -838,6 +866,334 @@ class TestCodeAgent:
         answer = agent.run("Fake task.")
         assert answer == "2CUSTOM"
 
+    def test_stream_outputs_stops_generation_when_code_is_complete(self):
+        class FakeStreamingModel(Model):
+            def __init__(self):
+                super().__init__()
+                self.stopped = False
+                self.closed = False
+                self.yielded = []
+
+            def generate_stream(self, messages, stop_sequences=None, grammar=None, **kwargs):
+                try:
+                    for delta in [
+                        "Thought: done\nCo",
+                        "de:\n```py\nfinal_",
+                        "answer(7)\n``",
+                        "`<end",
+                        "_code>",
+                        "ignored",
+                    ]:
+                        self.yielded.append(delta)
+                        yield delta
+                except StopGeneration:
+                    self.stopped = True
+                    raise
+                finally:
+                    self.closed = True
+
+        model = FakeStreamingModel()
+        agent = CodeAgent(tools=[], model=model, stream_outputs=True)
+        assert agent.run("Fake task.") == 7
+        # Stopped as a complete response, not just closed like on an error
+        assert model.stopped and model.closed
+        assert "ignored" not in model.yielded
+        assert agent.memory.steps[1].model_output == "Thought: done\nCode:\n```py\nfinal_answer(7)\n```"
+
+
+class SlowTool(Tool):
+    name = "slow_echo"
+    description = "Echoes its text after a delay."
+    inputs = {"text": {"type": "string", "description": "The text to echo."}}
+    output_type = "string"
+
+    def __init__(self, delay, barrier=None, release=None):
+        super().__init__()
+        self.delay = delay
+        # Calls wait for each other at the barrier, which breaks if they do not run concurrently
+        self.barrier = barrier
+        # Echoing "wait" blocks until this event is set
+        self.release = release
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def forward(self, text: str):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        if self.barrier is not None:
+            self.barrier.wait()
+        if self.release is not None and text == "wait":
+            self.release.wait()
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        if text == "fail":
+            raise ValueError("Cannot echo this.")
+        return text
+
+
+def make_tool_calls_model(calls_per_turn):
+    def fake_model(messages, tools_to_call_from=None, stop_sequences=None, grammar=None):
+        calls = calls_per_turn[min(sum(message["role"] == MessageRole.TOOL_RESPONSE for message in messages), 1)]
+        return ChatMessage(
+            role="assistant",
+            content="",
+            tool_calls=[
+                ChatMessageToolCall(
+                    id=f"call_{i}",
+                    type="function",
+                    function=ChatMessageToolCallDefinition(name=name, arguments=arguments),
+                )
+                for i, (name, arguments) in enumerate(calls)
+            ],
+        )
+
+    return fake_model
+
+
+class TestToolCallingAgent:
+    def test_tool_calls_of_a_step_run_concurrently_in_order(self):
+        tool = SlowTool(delay=0, barrier=threading.Barrier(3, timeout=10))
+        model = make_tool_calls_model(
+            [
+                [("slow_echo", {"text": text}) for text in ["a", "b", "c"]],
+                [("final_answer", {"answer": "done"})],
+            ]
+        )
+        agent = ToolCallingAgent(tools=[tool], model=model)
+        assert agent.run("Echo a, b and c.") == "done"
+        assert tool.max_running == 3
+
+        step = agent.memory.steps[1]
+        assert step.tool_observations == ["a", "b", "c"]
+        tool_responses = [message for message in step.to_messages() if message["role"] == MessageRole.TOOL_RESPONSE]
+        assert [message["content"][0]["text"] for message in tool_responses] == [
+            f"Call id: call_{i}\nObservation:\n{text}" for i, text in enumerate(["a", "b", "c"])
+        ]
+
+    def test_tool_concurrency_limits(self):
+        tool = SlowTool(delay=0.05)
+        model = make_tool_calls_model(
+            [[("slow_echo", {"text": text}) for text in "abcd"], [("final_answer", {"answer": "done"})]]
+        )
+        agent = ToolCallingAgent(tools=[tool], model=model, tool_concurrency_limits={"slow_echo": 1})
+        agent.run("Echo four letters.")
+        assert tool.max_running == 1
+        assert agent.memory.steps[1].tool_observations == list("abcd")
+
+    def test_failed_tool_call_is_an_observation_unless_all_calls_fail(self):
+        tool = SlowTool(delay=0)
+        model = make_tool_calls_model(
+            [
+                [("slow_echo", {"text": "a"}), ("slow_echo", {"text": "fail"})],
+                [("slow_echo", {"text": "fail"}), ("slow_echo", {"text": "fail"})],
+            ]
+        )
+        agent = ToolCallingAgent(tools=[tool], model=model, max_steps=2)
+        agent.run("Echo.")
+        first_step, second_step = agent.memory.steps[1], agent.memory.steps[2]
+        assert first_step.error is None
+        assert first_step.tool_observations[0] == "a"
+        assert "Cannot echo this." in first_step.tool_observations[1]
+        assert "Cannot echo this." in str(second_step.error)
+
+    def test_final_answer_after_other_calls_of_the_same_step(self):
+        tool = SlowTool(delay=0)
+        model = make_tool_calls_model([[("final_answer", {"answer": "done"}), ("slow_echo", {"text": "a"})]])
+        agent = ToolCallingAgent(tools=[tool], model=model)
+        assert agent.run("Echo a and answer.") == "done"
+        step = agent.memory.steps[1]
+        assert [tool_call.name for tool_call in step.tool_calls] == ["slow_echo", "final_answer"]
+        assert step.tool_observations == ["a"]
+
+
+def echo_task_model(messages, tools_to_call_from=None, stop_sequences=None, grammar=None):
+    text = re.search(r"Echo (\w+)", str(messages[1]["content"])).group(1)
+    done = any(message["role"] == MessageRole.TOOL_RESPONSE for message in messages)
+    name, arguments = ("final_answer", {"answer": text}) if done else ("slow_echo", {"text": text})
+    return ChatMessage(
+        role="assistant",
+        content="",
+        tool_calls=[
+            ChatMessageToolCall(
+                id="call_0", type="function", function=ChatMessageToolCallDefinition(name=name, arguments=arguments)
+            )
+        ],
+    )
+
+
+class TestParallelDelegation:
+    def test_parallel_delegate_from_code_runs_managed_agents_concurrently(self):
+        tool = SlowTool(delay=0, barrier=threading.Barrier(3, timeout=10))
+        echoer = ToolCallingAgent(tools=[tool], model=echo_task_model, name="echoer", description="Echoes words.")
+
+        def fake_manager_model(messages, stop_sequences=None, grammar=None):
+            return ChatMessage(
+                role="assistant",
+                content="""
+Thought: I give the three words to echoer at once.
+Code:
+```py
+results = parallel_delegate(delegations=[{"agent": "echoer", "task": f"Echo {word}"} for word in ["alpha", "beta", "gamma"]])
+final_answer(results)
+```<end_code>
+""",
+            )
+
+        manager = CodeAgent(tools=[], model=fake_manager_model, managed_agents=[echoer])
+        results = manager.run("Echo three words.")
+        assert tool.max_running == 3
+        assert [result["status"] for result in results] == ["success"] * 3
+        for result, word in zip(results, ["alpha", "beta", "gamma"]):
+            assert result["task"] == f"Echo {word}"
+            assert word in result["report"]
+        assert len(echoer.memory.steps) == 0
+
+    def test_parallel_delegate_reports_partial_failures(self):
+        def fail_on_fail_task(memory_step, agent):
+            if "Echo fail" in agent.task:
+                raise ValueError("Cannot run this task.")
+
+        echoer = ToolCallingAgent(
+            tools=[SlowTool(delay=0)],
+            model=echo_task_model,
+            name="echoer",
+            description="Echoes words.",
+            step_callbacks=[fail_on_fail_task],
+        )
+        manager = ToolCallingAgent(tools=[], model=echo_task_model, managed_agents=[echoer])
+        results = manager.tools["parallel_delegate"](
+            delegations=[
+                {"agent": "echoer", "task": "Echo alpha"},
+                {"agent": "echoer", "task": "Echo fail"},
+                {"agent": "nobody", "task": "Echo beta"},
+                "echoer: Echo gamma",
+            ]
+        )
+        assert [result["status"] for result in results] == ["success", "error", "error", "error"]
+        assert "alpha" in results[0]["report"]
+        assert "Cannot run this task." in results[1]["error"]
+        assert "Unknown team member 'nobody'" in results[2]["error"]
+        assert "should be a dict with the keys 'agent' and 'task'" in results[3]["error"]
+
+    def test_parallel_delegate_timeout(self):
+        release = threading.Event()
+        echoer = ToolCallingAgent(
+            tools=[SlowTool(delay=0, release=release)],
+            model=echo_task_model,
+            name="echoer",
+            description="Echoes words.",
+        )
+        manager = ToolCallingAgent(tools=[], model=echo_task_model, managed_agents=[echoer])
+        try:
+            results = manager.tools["parallel_delegate"](
+                delegations=[{"agent": "echoer", "task": "Echo wait"}, {"agent": "echoer", "task": "Echo beta"}],
+                timeout=1,
+            )
+        finally:
+            release.set()
+        assert [result["status"] for result in results] == ["timeout", "success"]
+        assert results[0]["error"] == "No report after 1 seconds."
+        assert "beta" in results[1]["report"]
+
+
+class FakeAsyncToolCallModel(Model):
+    async def __acall__(self, messages, stop_sequences=None, grammar=None, tools_to_call_from=None, **kwargs):
+        await asyncio.sleep(0)
+        if len(messages) < 3:
+            tool_name, arguments = "wait_for_others", {}
+        else:
+            tool_name, arguments = "final_answer", {"answer": "done"}
+        return ChatMessage(
+            role="assistant",
+            content="",
+            tool_calls=[
+                ChatMessageToolCall(
+                    id="call_0",
+                    type="function",
+                    function=ChatMessageToolCallDefinition(name=tool_name, arguments=arguments),
+                )
+            ],
+        )
+
+
+class WaitForOthersTool(Tool):
+    name = "wait_for_others"
+    description = "Waits until all the agents have called this tool."
+    inputs = {}
+    output_type = "string"
+
+    def __init__(self, number_of_agents):
+        super().__init__()
+        self.number_of_agents = number_of_agents
+        self.arrived = 0
+        self.all_arrived = asyncio.Event()
+
+    def forward(self):
+        raise NotImplementedError("This tool can only be awaited.")
+
+    async def aforward(self):
+        self.arrived += 1
+        if self.arrived == self.number_of_agents:
+            self.all_arrived.set()
+        await asyncio.wait_for(self.all_arrived.wait(), timeout=5)
+        return "all arrived"
+
+
+class TestAsyncRun:
+    def test_arun_runs_agents_concurrently(self):
+        async def run_agents():
+            wait_tool = WaitForOthersTool(number_of_agents=5)
+            agents = [ToolCallingAgent(tools=[wait_tool], model=FakeAsyncToolCallModel()) for _ in range(5)]
+            answers = await asyncio.gather(*(agent.arun("Fake task.") for agent in agents))
+            return agents, answers
+
+        agents, answers = asyncio.run(run_agents())
+        assert answers == ["done"] * 5
+        # Each tool call could only return once all the agents had made theirs
+        assert all(agent.memory.steps[1].observations == "all arrived" for agent in agents)
+
+    def test_arun_falls_back_to_threads_for_synchronous_models(self):
+        agent = CodeAgent(tools=[], model=fake_code_model)
+        assert asyncio.run(agent.arun("What is 2 multiplied by 3.6452?")) == 7.2904
+        assert len(agent.memory.steps) == 3
+
+    def test_arun_stream(self):
+        agent = CodeAgent(tools=[], model=fake_code_model)
+
+        async def collect_steps():
+            return [step async for step in await agent.arun("What is 2 multiplied by 3.6452?", stream=True)]
+
+        steps = asyncio.run(collect_steps())
+        assert [type(step) for step in steps[:-1]] == [ActionStep, ActionStep]
+        assert steps[-1] == 7.2904
+
+    def test_arun_managed_agent(self):
+        managed_agent = CodeAgent(tools=[], model=fake_code_model, name="managed", description="Multiplies numbers.")
+
+        def fake_manager_model(messages, tools_to_call_from=None, stop_sequences=None, grammar=None):
+            if len(messages) < 3:
+                tool_name, arguments = "managed", {"task": "Multiply 2 by 3.6452."}
+            else:
+                tool_name, arguments = "final_answer", {"answer": "7.2904"}
+            return ChatMessage(
+                role="assistant",
+                content="",
+                tool_calls=[
+                    ChatMessageToolCall(
+                        id="call_0",
+                        type="function",
+                        function=ChatMessageToolCallDefinition(name=tool_name, arguments=arguments),
+                    )
+                ],
+            )
+
+        manager = ToolCallingAgent(tools=[], model=fake_manager_model, managed_agents=[managed_agent])
+        assert asyncio.run(manager.arun("Fake task.")) == "7.2904"
+        assert "7.2904" in manager.memory.steps[1].observations
+
 
 class MultiAgentsTests(unittest.TestCase):
     def test_multiagents_save(self):
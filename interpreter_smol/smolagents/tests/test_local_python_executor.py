@@ -14,9 +14,14 @@
 # limitations under the License.
 
 import ast
+import os
+import threading
+import time
 import types
 import unittest
+from itertools import count
 from textwrap import dedent
+from unittest.mock import patch
 
 import numpy as np
 import pandas as pd
@@ -24,15 +29,23 @@ import pytest
 
 from smolagents.default_tools import BASE_PYTHON_TOOLS
 from smolagents.local_python_executor import (
+    EXECUTION_ENGINES,
+    SAFE_MODULE_CACHE,
+    CodeCache,
+    ExecutionBudget,
     InterpreterError,
+    LocalPythonInterpreter,
     PrintContainer,
+    ScopedState,
     check_module_authorized,
     evaluate_condition,
     evaluate_delete,
     evaluate_python_code,
     fix_final_answer_code,
+    get_memory_usage,
     get_safe_module,
 )
+from smolagents.utils import BASE_BUILTIN_MODULES, truncate_content
 
 
 # Fake function we will use as tool
@@ -794,6 +807,17 @@ returns_none(1)
         )
         assert result is None
 
+    def test_continue(self):
+        code = """
+kept = []
+for i in range(5):
+    if i % 2 == 0:
+        continue
+    kept.append(i)
+kept"""
+        result, _ = evaluate_python_code(code, BASE_PYTHON_TOOLS, state={})
+        assert result == [1, 3]
+
     def test_nested_for_loop(self):
         code = """
 all_res = []
@@ -1338,6 +1362,31 @@ def test_get_safe_module_handle_lazy_imports():
     assert getattr(safe_module, "non_lazy_attribute") == "ok"
 
 
+def test_get_safe_module_is_cached():
+    fake_module = types.ModuleType("fake_module")
+    fake_module.attribute = "ok"
+    with patch("smolagents.local_python_executor.dir", side_effect=dir, create=True) as mock_dir:
+        first_module = get_safe_module(fake_module, authorized_imports=["fake_module"])
+        second_module = get_safe_module(fake_module, authorized_imports=["fake_module"])
+        assert mock_dir.call_count == 1
+        # Another set of authorized imports can sanitize the module differently
+        get_safe_module(fake_module, authorized_imports=["*"])
+        assert mock_dir.call_count == 2
+    assert first_module is not second_module
+    assert second_module.attribute == "ok"
+
+    # Attributes set on an imported module do not leak to other imports
+    first_module.attribute = "changed"
+    assert get_safe_module(fake_module, authorized_imports=["fake_module"]).attribute == "ok"
+
+    # The cache is invalidated when attributes are added to the module
+    fake_module.new_attribute = "new"
+    assert get_safe_module(fake_module, authorized_imports=["fake_module"]).new_attribute == "new"
+
+    for key in [key for key in SAFE_MODULE_CACHE if SAFE_MODULE_CACHE[key][0] is fake_module]:
+        del SAFE_MODULE_CACHE[key]
+
+
 def test_non_standard_comparisons():
     code = dedent("""\
         class NonStdEqualsResult:
@@ -1393,6 +1442,36 @@ class TestPrintContainer:
         pc.append("Hello")
         assert len(pc) == 5
 
+    @pytest.mark.parametrize("max_length", [1, 7, 10, 25, 1000])
+    def test_bounded_matches_truncate_content(self, max_length):
+        chunks = [f"line {i}\n" for i in range(50)] + ["", "x" * 30, "end"]
+        pc = PrintContainer(max_length=max_length)
+        for chunk in chunks:
+            pc += chunk
+        assert pc.value == truncate_content("".join(chunks), max_length=max_length)
+        assert len(pc) == len(pc.value)
+
+    def test_bounded_memory(self):
+        pc = PrintContainer(max_length=100)
+        for i in range(10000):
+            pc += f"line {i}\n"
+        assert len(pc.head) == 50
+        assert pc.tail_length < 100
+        assert str(pc).endswith("line 9999\n")
+
+    def test_callback(self):
+        chunks = []
+        pc = PrintContainer(max_length=5, callback=chunks.append)
+        pc += "Hello\n"
+        pc += "World\n"
+        assert chunks == ["Hello\n", "World\n"]
+
+    def test_value_setter(self):
+        pc = PrintContainer(max_length=10)
+        pc += "Hello"
+        pc.value = "World"
+        assert str(pc) == "World"
+
 
 @pytest.mark.parametrize(
     "module,authorized_imports,expected",
@@ -1409,3 +1488,545 @@ class TestPrintContainer:
 )
 def test_check_module_authorized(module: str, authorized_imports: list[str], expected: bool):
     assert check_module_authorized(module, authorized_imports) == expected
+
+
+def engine_imports(engine):
+    # The native engine cannot restrict imports, so it only runs with all of them authorized
+    return ["*"] if engine == "native" else BASE_BUILTIN_MODULES
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "x = 3\ny = x * 2 + 1\ny",
+        "a, b = 1, 2\na, b = b, a\n(a, b)",
+        "x = [1, 2, 3]\nx[1] += 10\nx[-1] = 0\nx",
+        "d = {'a': 1}\nd['b'] = d['a'] + 1\nsorted(d.items())",
+        "s = 'hello'\nf'{s.upper()} {len(s):03d} {3.14159:.2f}'",
+        "[i * j for i in range(4) for j in range(3) if (i + j) % 2]",
+        "[a + b for a, b in zip(range(3), range(3, 6))]",
+        "sum(x for x in range(10) if x > 4)",
+        "{k: v for k, v in enumerate('abc')}",
+        "{x % 3 for x in range(10)}",
+        "total = 0\nfor i in range(10):\n    if i == 7:\n        break\n    if i % 2:\n        continue\n    total += i\ntotal",
+        "i = 0\nwhile True:\n    i += 1\n    if i < 5:\n        continue\n    break\ni",
+        "def f(a, b=2, c=3):\n    return a + b * c\nf(1), f(1, c=4), f(1, 2, 5)",
+        "def fib(n):\n    if n < 2:\n        return n\n    return fib(n - 1) + fib(n - 2)\nfib(10)",
+        "square = lambda x: x ** 2\nlist(map(square, [1, 2, 3]))",
+        "class A:\n    k = 2\n    def __init__(self, v):\n        self.v = v\n    def get(self):\n        return self.v * self.k\nA(21).get()",
+        "try:\n    1 / 0\nexcept ZeroDivisionError as e:\n    message = str(e)\nelse:\n    message = 'no error'\nfinally:\n    done = True\n(message, done)",
+        "x = 5\n'big' if x > 3 else 'small'",
+        "1 < 2 < 3, 1 < 3 < 2, not 0, -(3), ~5, 2 ** 10 // 3 % 7",
+        "x = None\nx is None and 'a' in 'abc' or False",
+        "import math\nfrom collections import Counter\nmath.sqrt(16), Counter('aab').most_common(1)",
+        "print('a', 1)\nprint('b')",
+        "assert 1 + 1 == 2\nvalues = [3, 1, 2]\nvalues.sort()\nvalues[::-1]",
+    ],
+)
+def test_engines_match_ast_engine(code):
+    outcomes = []
+    for engine in EXECUTION_ENGINES:
+        state = {}
+        result, is_final_answer = evaluate_python_code(
+            code, BASE_PYTHON_TOOLS, state=state, engine=engine, authorized_imports=engine_imports(engine)
+        )
+        variables = {
+            key: value
+            for key, value in state.items()
+            if key not in ("_print_outputs", "_operations_count", "__builtins__")
+            and isinstance(value, (bool, int, float, str, list, tuple, dict, set))
+        }
+        outcomes.append((result, is_final_answer, str(state["_print_outputs"]), variables))
+    assert all(outcome == outcomes[0] for outcome in outcomes[1:])
+
+
+@pytest.mark.parametrize(
+    "code, static_tools, authorized_imports, expected_error",
+    [
+        ("import os", BASE_PYTHON_TOOLS, None, "Import of os is not allowed"),
+        ("exec = callable.__self__.exec\nexec('1')", BASE_PYTHON_TOOLS, None, "Invoking a builtin function"),
+        ("print = 3", {"print": print}, None, "Cannot assign to name 'print'"),
+        ("undefined_function()", BASE_PYTHON_TOOLS, None, "It is not permitted to evaluate other functions"),
+        ("x = 1\ny = unknown_variable", BASE_PYTHON_TOOLS, None, "The variable `unknown_variable` is not defined"),
+        ("x = 1\n(y := 2)", BASE_PYTHON_TOOLS, None, "NamedExpr is not supported"),
+        ("x = 1\ny = 'abc'['a']", BASE_PYTHON_TOOLS, None, "Code execution failed at line 'y = 'abc'['a']'"),
+    ],
+)
+def test_closure_engine_raises_same_errors(code, static_tools, authorized_imports, expected_error):
+    kwargs = {"authorized_imports": authorized_imports} if authorized_imports is not None else {}
+    for engine in ("ast", "closure"):
+        with pytest.raises(InterpreterError) as e:
+            evaluate_python_code(code, static_tools, state={}, engine=engine, **kwargs)
+        assert expected_error in str(e.value)
+
+
+def test_closure_engine_counts_operations():
+    code = "i = 0\nwhile True:\n    i += 1"
+    with patch("smolagents.local_python_executor.MAX_OPERATIONS", 100):
+        with pytest.raises(InterpreterError, match="Reached the max number of operations of 100"):
+            evaluate_python_code(code, BASE_PYTHON_TOOLS, state={}, engine="closure")
+
+
+def test_local_python_interpreter_engine():
+    interpreter = LocalPythonInterpreter([], engine="closure")
+    interpreter.update_tools({})
+    output, logs, is_final_answer = interpreter("x = [i ** 2 for i in range(4)]\nprint(x)\nsum(x)", {})
+    assert output == 14
+    assert logs == "[0, 1, 4, 9]\n"
+    assert not is_final_answer
+
+    with pytest.raises(ValueError, match="Unknown engine"):
+        LocalPythonInterpreter([], engine="bytecode")
+
+
+def test_code_cache():
+    cache = CodeCache(maxsize=2)
+    calls = []
+
+    def build(code):
+        calls.append(code)
+        return code.upper()
+
+    assert cache.get_or_build("a", build) == "A"
+    assert cache.get_or_build("a", build) == "A"
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Same source built differently is cached separately
+    assert cache.get_or_build("a", build, kind="closure") == "A"
+    assert cache.get_or_build("b", build) == "B"
+    # The least recently used entry was evicted
+    assert len(cache) == 2
+    assert cache.get_or_build("a", build) == "A"
+    assert calls == ["a", "a", "b", "a"]
+
+    with pytest.raises(InterpreterError):
+        cache.get_or_build("x = ", lambda code: evaluate_python_code(code))
+    assert len(cache) == 2
+
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+    disabled_cache = CodeCache(maxsize=0)
+    disabled_cache.get_or_build("a", build)
+    disabled_cache.get_or_build("a", build)
+    assert (len(disabled_cache), disabled_cache.misses) == (0, 2)
+
+
+@pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+def test_local_python_interpreter_caches_code(engine):
+    interpreter = LocalPythonInterpreter(engine_imports(engine), engine=engine)
+    interpreter.update_tools({})
+    code = "def f(x):\n    return x + 1\ny = f(y)\ny"
+    assert interpreter(code, {"y": 1})[0] == 2
+    assert interpreter(code, {})[0] == 3
+    assert (interpreter.cache_hits, interpreter.cache_misses) == (1, 1)
+
+    with pytest.raises(InterpreterError, match="Code parsing failed"):
+        interpreter("y = ", {})
+    assert (interpreter.cache_hits, interpreter.cache_misses) == (1, 2)
+
+
+class TestScopedState:
+    def test_lookup_falls_back_to_parent(self):
+        parent = {"a": 1, "b": 2}
+        scope = ScopedState(parent)
+        scope["b"] = 3
+        scope["c"] = 4
+        assert (scope["a"], scope["b"], scope["c"]) == (1, 3, 4)
+        assert "a" in scope and "d" not in scope
+        assert scope.get("a") == 1 and scope.get("d", 5) == 5
+        assert parent == {"a": 1, "b": 2}
+        assert dict(scope.items()) == {"a": 1, "b": 3, "c": 4}
+        assert len(scope) == 3
+        with pytest.raises(KeyError):
+            scope["d"]
+
+    def test_nested_scopes(self):
+        outer = ScopedState({"a": 1})
+        outer["b"] = 2
+        inner = ScopedState(outer)
+        inner["a"] = 3
+        assert (inner["a"], inner["b"]) == (3, 2)
+        assert sorted(inner.keys()) == ["a", "b"]
+        assert outer["a"] == 1
+
+    def test_setdefault_reads_parent(self):
+        scope = ScopedState({"_operations_count": 10})
+        assert scope.setdefault("_operations_count", 0) == 10
+        scope["_operations_count"] += 1
+        assert scope["_operations_count"] == 11
+        assert scope.setdefault("x", 0) == 0
+
+    def test_delete_only_local_names(self):
+        scope = ScopedState({"a": 1})
+        scope["b"] = 2
+        del scope["b"]
+        assert "b" not in scope
+        with pytest.raises(KeyError):
+            del scope["a"]
+
+    def test_copy(self):
+        parent = {"a": 1}
+        scope = ScopedState(parent)
+        scope["b"] = 2
+        copied = scope.copy()
+        copied["b"] = 3
+        assert isinstance(copied, ScopedState) and copied.parent is parent
+        assert (scope["b"], copied["b"], copied["a"]) == (2, 3, 1)
+
+
+@pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+def test_scopes_do_not_leak_into_state(engine):
+    code = dedent("""\
+        x = 10
+        squares = [x * x for x in range(3)]
+        def f(y):
+            z = x + y
+            return z
+        result = f(1)
+        pairs = {k: [k * j for j in range(2)] for k in range(2)}
+        """)
+    state = {}
+    evaluate_python_code(
+        code, BASE_PYTHON_TOOLS, state=state, engine=engine, authorized_imports=engine_imports(engine)
+    )
+    assert state["x"] == 10
+    assert state["squares"] == [0, 1, 4]
+    assert state["result"] == 11
+    assert state["pairs"] == {0: [0, 0], 1: [0, 1]}
+    assert "z" not in state and "y" not in state and "j" not in state
+    assert not any(isinstance(value, ScopedState) for value in state.values())
+
+
+@pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("any(x > 5 for x in numbers)", True),
+        ("next(x for x in numbers if x * x > 50)", 8),
+        ("sum(x * y for x in range(3) for y in range(x) if y > 0)", 2),
+        ("list((i, c) for i, c in zip(range(3), 'ab'))", [(0, "a"), (1, "b")]),
+        ("g = (x + 1 for x in range(3))\nfirst = next(g)\n[first, list(g)]", [1, [2, 3]]),
+    ],
+)
+def test_generator_expressions_are_lazy(engine, code, expected):
+    # `numbers` is infinite: these would never terminate if generator expressions were evaluated eagerly
+    state = {"numbers": count()}
+    result, _ = evaluate_python_code(
+        code, BASE_PYTHON_TOOLS, state=state, engine=engine, authorized_imports=engine_imports(engine)
+    )
+    assert result == expected
+
+
+@pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+def test_generator_expression_evaluates_outermost_iterable_immediately(engine):
+    with pytest.raises(InterpreterError, match="TypeError"):
+        evaluate_python_code(
+            "g = (x for x in 1)", BASE_PYTHON_TOOLS, state={}, engine=engine, authorized_imports=engine_imports(engine)
+        )
+    result, _ = evaluate_python_code(
+        "g = (1 / x for x in [0])\n'created'",
+        BASE_PYTHON_TOOLS,
+        state={},
+        engine=engine,
+        authorized_imports=engine_imports(engine),
+    )
+    assert result == "created"
+
+
+def test_local_python_interpreter_streams_bounded_print_outputs():
+    chunks = []
+    interpreter = LocalPythonInterpreter([], max_print_outputs_length=20, print_outputs_callback=chunks.append)
+    interpreter.update_tools({})
+    _, logs, _ = interpreter("for i in range(100):\n    print(i)", {})
+    assert chunks == [f"{i}\n" for i in range(100)]
+    assert logs == truncate_content("".join(chunks), max_length=20)
+
+
+class TestNativeEngine:
+    def test_final_answer(self):
+        code = "x = 2\nif x > 1:\n    final_answer(x * 21)\nprint('not reached')"
+        state = {}
+        result, is_final_answer = evaluate_python_code(
+            code,
+            {"final_answer": lambda value: value, **BASE_PYTHON_TOOLS},
+            state=state,
+            authorized_imports=["*"],
+            engine="native",
+        )
+        assert (result, is_final_answer) == (42, True)
+        assert str(state["_print_outputs"]) == ""
+
+    def test_print_outputs(self):
+        state = {}
+        evaluate_python_code(
+            "print('a', 1, sep='-')\nprint('b', end='')",
+            BASE_PYTHON_TOOLS,
+            state=state,
+            authorized_imports=["*"],
+            engine="native",
+        )
+        assert str(state["_print_outputs"]) == "a-1\nb"
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "import os",
+            # Reaches the real `__import__` without going through the builtins of the code
+            "[c for c in ().__class__.__base__.__subclasses__() if c.__name__ == 'catch_warnings'][0]()"
+            "._module.__builtins__['__import__']('os').getcwd()",
+        ],
+    )
+    def test_requires_all_imports_authorized(self, code):
+        state = {}
+        with pytest.raises(ValueError, match="requires all imports to be authorized"):
+            evaluate_python_code(
+                code, BASE_PYTHON_TOOLS, state=state, authorized_imports=BASE_BUILTIN_MODULES, engine="native"
+            )
+        assert "_print_outputs" not in state
+        with pytest.raises(ValueError, match="requires all imports to be authorized"):
+            LocalPythonInterpreter([], engine="native")
+
+    @pytest.mark.parametrize(
+        "code, expected_error",
+        [
+            ("import math\nmath.sqrt = 3\nprint = 3", "Code execution failed at line 'print = 3'"),
+            ("x = 1\ny = 1 / 0\nz = 2", "Code execution failed at line 'y = 1 / 0'"),
+            ("from . import x", "Relative imports are not supported"),
+        ],
+    )
+    def test_errors(self, code, expected_error):
+        with pytest.raises(InterpreterError, match=expected_error):
+            evaluate_python_code(code, BASE_PYTHON_TOOLS, state={}, authorized_imports=["*"], engine="native")
+
+    def test_all_imports_authorized(self):
+        result, _ = evaluate_python_code(
+            "import os\nos.path.join('a', 'b')", BASE_PYTHON_TOOLS, state={}, authorized_imports=["*"], engine="native"
+        )
+        assert result == os.path.join("a", "b")
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "while True:\n    pass",
+            "def f():\n    return f()\nf()",
+            "[x for x in numbers]",
+        ],
+    )
+    def test_counts_operations(self, code):
+        with patch("smolagents.local_python_executor.MAX_OPERATIONS", 100):
+            with pytest.raises(InterpreterError, match="Reached the max number of operations of 100"):
+                evaluate_python_code(
+                    code, BASE_PYTHON_TOOLS, state={"numbers": count()}, authorized_imports=["*"], engine="native"
+                )
+
+    def test_state_persists_across_actions(self):
+        interpreter = LocalPythonInterpreter(["*"], engine="native")
+        interpreter.update_tools({})
+        interpreter("def greet(name):\n    print('Hello', name)\ncount = 1", {})
+        output, logs, _ = interpreter("greet('world')\ncount += 1\ncount", {})
+        assert output == 2
+        assert logs == "Hello world\n"
+
+
+@pytest.mark.parametrize("engine", ["ast", "closure"])
+def test_inline_caches(engine):
+    code = "[v[0] for v in values]"
+    values = [[1], "a", (2,), {0: 3}, np.array([4]), pd.Series([5]), [6]]
+    result, _ = evaluate_python_code(code, BASE_PYTHON_TOOLS, state={"values": values}, engine=engine)
+    assert result == [1, "a", 2, 3, 4, 5, 6]
+
+    # A builtin authorized at a call site is checked again with other static tools, even if the code is cached
+    code_cache = CodeCache()
+    code = "[f(x) for x in [-1, -2]]"
+    result, _ = evaluate_python_code(code, {"abs": abs}, state={"f": abs}, engine=engine, code_cache=code_cache)
+    assert result == [1, 2]
+    with pytest.raises(InterpreterError, match="Invoking a builtin function"):
+        evaluate_python_code(code, {}, state={"f": abs}, engine=engine, code_cache=code_cache)
+    assert code_cache.hits == 1
+
+
+@pytest.mark.parametrize("engine", ["ast", "closure"])
+def test_inline_caches_shared_by_threads(engine):
+    # Threads running the same cached code hit its subscript site with lists and Series at the same time
+    code_cache = CodeCache()
+    code = "[v[-1] for v in values]"
+    values = [[1, 2], pd.Series([1, 2], index=[-1, 0])] * 500
+    barrier = threading.Barrier(4, timeout=10)
+    results = []
+
+    def run():
+        barrier.wait()
+        result, _ = evaluate_python_code(
+            code, BASE_PYTHON_TOOLS, state={"values": values}, engine=engine, code_cache=code_cache
+        )
+        results.append(result)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[2, 1] * 500] * 4
+
+
+class TestExecutionBudget:
+    @pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "while True:\n    pass",
+            "while True:\n    try:\n        x = 1\n    except:\n        pass",
+            "while True:\n    try:\n        x = 1\n    except Exception:\n        pass",
+        ],
+    )
+    def test_timeout(self, engine, code):
+        budget = ExecutionBudget(timeout=0.2)
+        state = {}
+        with pytest.raises(InterpreterError, match="exceeded its time budget of 0.2 seconds"):
+            evaluate_python_code(
+                code,
+                BASE_PYTHON_TOOLS,
+                state=state,
+                engine=engine,
+                authorized_imports=engine_imports(engine),
+                budget=budget,
+            )
+        assert "_execution_budget" not in state
+        assert budget.watchdog is None
+
+    @pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+    def test_max_operations_per_action(self, engine):
+        interpreter = LocalPythonInterpreter(engine_imports(engine), engine=engine, max_operations=1000)
+        interpreter.update_tools({})
+        for _ in range(3):
+            # The operations of previous actions do not count
+            interpreter("total = 0\nfor i in range(100):\n    total += i", {})
+        with pytest.raises(InterpreterError, match="exceeded its budget of 1000 operations"):
+            interpreter("for i in range(10000):\n    total += i", {})
+
+    def test_interrupts_stuck_tool(self):
+        def stuck():
+            while True:
+                sum(range(100))
+
+        budget = ExecutionBudget(timeout=0.1)
+        with patch("smolagents.local_python_executor.BUDGET_GRACE_PERIOD", 0.1):
+            with pytest.raises(InterpreterError, match="exceeded its time budget"):
+                evaluate_python_code("stuck()", {"stuck": stuck}, state={}, budget=budget)
+
+    def test_memory_budget(self):
+        if get_memory_usage() is None:
+            pytest.skip("Memory usage cannot be measured on this platform")
+        budget = ExecutionBudget(max_memory_mb=50)
+        code = "chunks = []\nwhile True:\n    chunks.append(bytearray(1_000_000))"
+        with pytest.raises(InterpreterError, match="exceeded its memory budget of 50 MB"):
+            evaluate_python_code(code, {"bytearray": bytearray}, state={}, budget=budget)
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError, match="timeout should be positive"):
+            ExecutionBudget(timeout=0)
+
+
+class TestParallelMap:
+    @pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+    def test_runs_tool_calls_concurrently_in_order(self, engine):
+        # The calls wait for each other at the barrier, which breaks unless they all run at the same time
+        barrier = threading.Barrier(10, timeout=10)
+
+        def slow_double(x):
+            barrier.wait()
+            return 2 * x
+
+        result, _ = evaluate_python_code(
+            "parallel_map(slow_double, range(10))",
+            {**BASE_PYTHON_TOOLS, "slow_double": slow_double},
+            state={},
+            engine=engine,
+            authorized_imports=engine_imports(engine),
+        )
+        assert result == [2 * x for x in range(10)]
+
+    def test_max_workers(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def track(x):
+            with lock:
+                running.append(x)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(x)
+            return x
+
+        code = "parallel_map(track, range(6), max_workers=2)"
+        result, _ = evaluate_python_code(code, {**BASE_PYTHON_TOOLS, "track": track}, state={})
+        assert result == list(range(6))
+        assert max(max_running) == 2
+
+    @pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+    def test_print_outputs_in_item_order(self, engine):
+        code = dedent(
+            """
+            def work(i):
+                sleep(0.05 * (3 - i))
+                print("item", i)
+                return i
+
+            parallel_map(work, range(4))
+            """
+        )
+        state = {}
+        result, _ = evaluate_python_code(
+            code,
+            {**BASE_PYTHON_TOOLS, "sleep": time.sleep},
+            state=state,
+            engine=engine,
+            authorized_imports=engine_imports(engine),
+        )
+        assert result == [0, 1, 2, 3]
+        assert state["_print_outputs"].value == "item 0\nitem 1\nitem 2\nitem 3\n"
+
+    @pytest.mark.parametrize("engine", EXECUTION_ENGINES)
+    def test_operations_count_in_budget(self, engine):
+        code = dedent(
+            """
+            def spin(n):
+                total = 0
+                for i in range(n):
+                    total += i
+                return total
+
+            parallel_map(spin, [1000] * 4)
+            """
+        )
+        budget = ExecutionBudget(max_operations=2000)
+        with pytest.raises(InterpreterError, match="exceeded its budget of 2000 operations"):
+            evaluate_python_code(
+                code,
+                BASE_PYTHON_TOOLS,
+                state={},
+                engine=engine,
+                authorized_imports=engine_imports(engine),
+                budget=budget,
+            )
+
+    def test_raises_error_of_failed_item(self):
+        def check_positive(x):
+            if x < 0:
+                raise ValueError(f"{x} is negative")
+            return x
+
+        with pytest.raises(InterpreterError, match="-2 is negative"):
+            evaluate_python_code(
+                "parallel_map(check_positive, [1, -2, 3])", {**BASE_PYTHON_TOOLS, "check_positive": check_positive}
+            )
+
+    def test_final_answer_in_item(self):
+        result, is_final_answer = evaluate_python_code(
+            "parallel_map(final_answer, ['done', 'done'])",
+            {**BASE_PYTHON_TOOLS, "final_answer": lambda answer: answer},
+        )
+        assert result == "done"
+        assert is_final_answer
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 
 from smolagents.agents import ToolCall
@@ -5,10 +7,12 @@ from smolagents.memory import (
     ActionStep,
     AgentMemory,
     ChatMessage,
+    CompactionPolicy,
     MemoryStep,
     Message,
     MessageRole,
     PlanningStep,
+    SummaryStep,
     SystemPromptStep,
     TaskStep,
 )
@@ -21,6 +25,89 @@ class TestAgentMemory:
         assert memory.system_prompt.system_prompt == system_prompt
         assert memory.steps == []
 
+    def test_get_messages_renders_only_changed_steps(self):
+        memory = AgentMemory(system_prompt="This is a system prompt.")
+        memory.steps = [TaskStep(task="Task"), ActionStep(step_number=1, model_output="First")]
+        messages = memory.get_messages()
+        assert [message["role"] for message in messages] == [
+            MessageRole.SYSTEM,
+            MessageRole.USER,
+            MessageRole.ASSISTANT,
+        ]
+
+        memory.steps.append(ActionStep(step_number=2, model_output="Second"))
+        with patch.object(TaskStep, "to_messages") as task_to_messages:
+            messages = memory.get_messages()
+        task_to_messages.assert_not_called()
+        assert messages[-1]["content"][0]["text"] == "Second"
+
+        # Setting an attribute of a step renders it again
+        memory.steps[1].model_output = "Edited"
+        assert memory.get_messages()[2]["content"][0]["text"] == "Edited"
+        assert len(memory.get_messages()) == 4
+
+        memory.steps.pop()
+        assert len(memory.get_messages()) == 3
+        assert len(memory.get_messages(summary_mode=True)) == 1
+
+        memory.reset()
+        assert len(memory.get_messages()) == 1
+
+    def test_compact(self, caplog):
+        memory = AgentMemory(system_prompt="This is a system prompt.")
+
+        def add_step(step_number):
+            step = ActionStep(step_number=step_number, model_output=f"Output {step_number} " + "x" * 400)
+            step.model_input_reference = memory.get_messages_reference()
+            memory.steps.append(step)
+
+        for step_number in range(1, 7):
+            add_step(step_number)
+        input_messages = [step["model_input_messages"] for step in memory.get_full_steps()]
+        summarized = []
+
+        def summarizer(steps):
+            summarized.append(steps)
+            return f"Summary of {len(steps)} steps"
+
+        policy = CompactionPolicy(token_budget=300, keep_last_steps=2, summarizer=summarizer)
+        assert memory.compact(policy)
+        messages = memory.get_messages()
+        assert len(messages) == 4
+        assert messages[1]["content"][0]["text"] == "[SUMMARY OF EARLIER STEPS]:\nSummary of 4 steps"
+        assert "Output 5" in messages[2]["content"][0]["text"]
+        # The steps run before the compaction keep their uncompacted input messages
+        assert [step["model_input_messages"] for step in memory.get_full_steps()] == input_messages
+
+        # The previous summary is summarized again with the next old steps
+        add_step(7)
+        assert memory.compact(policy)
+        assert isinstance(summarized[1][0], SummaryStep) and len(summarized[1]) == 2
+        assert len(memory.get_messages()) == 4
+        full_steps = memory.get_full_steps()
+        assert [step["model_input_messages"] for step in full_steps[:6]] == input_messages
+        assert full_steps[6]["model_input_messages"] == messages
+        assert "modified" not in caplog.text
+
+        assert not memory.compact(CompactionPolicy(token_budget=100000))
+
+    def test_model_input_reference(self, caplog):
+        memory = AgentMemory(system_prompt="This is a system prompt.")
+        memory.steps.append(TaskStep(task="Task"))
+        for step_number in range(1, 4):
+            step = ActionStep(step_number=step_number, model_output=f"Output {step_number}")
+            step.model_input_reference = memory.get_messages_reference()
+            memory.steps.append(step)
+
+        full_steps = memory.get_full_steps()
+        assert [len(step["model_input_messages"]) for step in full_steps[1:]] == [2, 3, 4]
+        assert full_steps[3]["model_input_messages"][-1]["content"][0]["text"] == "Output 2"
+        assert "modified" not in caplog.text
+
+        memory.steps[1].model_output = "Edited"
+        assert memory.get_full_steps()[3]["model_input_messages"][2]["content"][0]["text"] == "Edited"
+        assert "The memory was modified since step 3 was run" in caplog.text
+
 
 class TestMemoryStep:
     def test_initialization(self):
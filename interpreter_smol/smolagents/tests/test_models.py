@@ -29,11 +29,13 @@ from smolagents.models import (
     MessageRole,
     MLXModel,
     OpenAIServerModel,
+    StopGeneration,
     TransformersModel,
     get_clean_message_list,
     get_tool_json_schema,
     parse_json_if_needed,
     parse_tool_args_if_needed,
+    stop_stream,
 )
 from smolagents.tools import tool
 
@@ -267,6 +269,8 @@ def test_get_clean_message_list_image_encoding(convert_images_to_image_urls, exp
         mock_encode.assert_any_call(b"second_image_data")
         assert len(result) == 1
         assert result[0] == expected_clean_message
+        # The original messages are left untouched
+        assert messages[0]["content"][0] == {"type": "image", "image": b"image_data"}
 
 
 def test_get_clean_message_list_flatten_messages_as_text():
@@ -278,3 +282,25 @@ def test_get_clean_message_list_flatten_messages_as_text():
     assert len(result) == 1
     assert result[0]["role"] == "user"
     assert result[0]["content"] == "Hello!How are you?"
+
+
+@pytest.mark.parametrize("catch_stop", [False, True])
+def test_stop_stream(catch_stop):
+    events = []
+
+    def stream():
+        try:
+            yield "a"
+            yield "b"
+        except StopGeneration:
+            events.append("stopped")
+            if not catch_stop:
+                raise
+        finally:
+            events.append("closed")
+
+    generator = stream()
+    assert next(generator) == "a"
+    stop_stream(generator)
+    assert events == ["stopped", "closed"]
+    assert next(generator, None) is None
@@ -24,7 +24,7 @@ from IPython.core.interactiveshell import InteractiveShell
 
 from smolagents import Tool
 from smolagents.tools import tool
-from smolagents.utils import get_source, parse_code_blobs
+from smolagents.utils import CodeBlockDetector, get_source, parse_code_blobs
 
 
 class AgentTextTests(unittest.TestCase):
@@ -47,6 +47,20 @@ import numpy as np
         output = parse_code_blobs(code_blob)
         assert output == code_blob
 
+    def test_code_block_detector(self):
+        text = "Thought: compute\nCode:\n```py\nx = '```'\nprint(x)\n```<end_code>\nObservation: extra"
+        for chunk_size in [1, 2, 7, len(text)]:
+            detector = CodeBlockDetector()
+            chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+            complete = [detector.feed(chunk) for chunk in chunks]
+            assert complete.index(True) < len(chunks) - 1 or chunk_size == len(text)
+            assert detector.output == "Thought: compute\nCode:\n```py\nx = '```'\nprint(x)\n```"
+            assert parse_code_blobs(detector.output) == "x = '```'\nprint(x)"
+
+        detector = CodeBlockDetector()
+        assert not detector.feed("Thought: no code yet\n```")
+        assert detector.output == "Thought: no code yet\n```"
+
     def test_multiple_code_blobs(self):
         test_input = """Here's a function that adds numbers:
 ```python
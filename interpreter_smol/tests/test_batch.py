@@ -0,0 +1,188 @@
+import json
+import re
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from smolagents.agents import CodeAgent
+from smolagents.models import ChatMessage, Model
+
+from interpreter_smol.core.batch import (
+    BatchRunner,
+    RateLimitedModel,
+    RateLimiter,
+    load_finished_ids,
+    load_tasks,
+)
+
+
+class EchoModel(Model):
+    """Answers "say X" tasks with X, and never answers the other tasks."""
+
+    def __call__(self, messages, **kwargs):
+        self.last_input_token_count = 10
+        self.last_output_token_count = 2
+        task = next(message["content"][0]["text"] for message in messages if message["role"] == "user")
+        match = re.search(r"say (\w+)", task)
+        code = f"final_answer({match.group(1)!r})" if match else "print('thinking')"
+        return ChatMessage(role="assistant", content=f"Thought: go\nCode:\n```py\n{code}\n```<end_code>")
+
+
+def echo_interpreter():
+    return SimpleNamespace(agent=CodeAgent(tools=[], model=EchoModel(), max_steps=2))
+
+
+def write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def read_results(path):
+    return {result["id"]: result for result in map(json.loads, path.read_text(encoding="utf-8").splitlines())}
+
+
+class TestLoadTasks:
+    def test_fields_and_ids(self, tmp_path):
+        path = tmp_path / "tasks.jsonl"
+        path.write_text('{"task": "a"}\n\n{"id": 7, "prompt": "b"}\n{"question": "c", "extra": 1}\n', encoding="utf-8")
+        tasks = load_tasks(str(path))
+        assert [(task["id"], task["task"]) for task in tasks] == [("1", "a"), ("7", "b"), ("4", "c")]
+        assert tasks[2]["extra"] == 1
+
+    def test_missing_task_field(self, tmp_path):
+        path = tmp_path / "tasks.jsonl"
+        path.write_text('{"text": "a"}\n', encoding="utf-8")
+        with pytest.raises(ValueError, match="Line 1 of .* has none of the fields"):
+            load_tasks(str(path))
+
+
+class TestLoadFinishedIds:
+    def test_missing_file(self, tmp_path):
+        assert load_finished_ids(str(tmp_path / "results.jsonl")) == set()
+
+    def test_ignores_cut_off_last_line(self, tmp_path):
+        path = tmp_path / "results.jsonl"
+        path.write_text('{"id": "1", "error": null}\n{"id": "2", "err', encoding="utf-8")
+        assert load_finished_ids(str(path)) == {"1"}
+
+    def test_retry_errors(self, tmp_path):
+        path = tmp_path / "results.jsonl"
+        write_lines(path, [{"id": "1", "error": None}, {"id": 2, "error": "ValueError: bad"}])
+        assert load_finished_ids(str(path)) == {"1", "2"}
+        assert load_finished_ids(str(path), retry_errors=True) == {"1"}
+
+
+class TestRateLimiter:
+    def test_request_window(self):
+        limiter = RateLimiter(requests_per_minute=2)
+        with patch("interpreter_smol.core.batch.time.monotonic", return_value=0.0):
+            limiter.acquire()
+            limiter.acquire()
+        limiter._expire(10.0)
+        assert limiter._wait_time(10.0) == 50.0
+        # The first requests leave the window after a minute
+        limiter._expire(60.0)
+        assert limiter._wait_time(60.0) == 0.0
+
+    def test_token_window(self):
+        limiter = RateLimiter(tokens_per_minute=100)
+        with patch("interpreter_smol.core.batch.time.monotonic", return_value=0.0):
+            limiter.record_tokens(80)
+        with patch("interpreter_smol.core.batch.time.monotonic", return_value=30.0):
+            limiter.record_tokens(40)
+            limiter.record_tokens(0)
+        assert limiter.token_total == 120
+        # Under the limit once the first 80 tokens leave the window
+        assert limiter._wait_time(40.0) == 20.0
+        limiter._expire(60.0)
+        assert (limiter.token_total, limiter._wait_time(60.0)) == (40, 0.0)
+
+    def test_acquire_waits(self):
+        limiter = RateLimiter(requests_per_minute=1)
+        with patch("interpreter_smol.core.batch.RATE_LIMIT_WINDOW", 0.1):
+            limiter.acquire()
+            limiter.acquire()
+        assert limiter.waited > 0
+        assert len(limiter.requests) == 1
+
+    def test_for_provider_is_shared(self):
+        with patch.dict(RateLimiter.registry, clear=True):
+            limiter = RateLimiter.for_provider("test", requests_per_minute=5)
+            assert RateLimiter.for_provider("test", requests_per_minute=10) is limiter
+            assert limiter.requests_per_minute == 5
+
+    def test_rate_limited_model_records_tokens(self):
+        limiter = RateLimiter(requests_per_minute=10)
+        model = RateLimitedModel(EchoModel(), limiter)
+        messages = [{"role": "user", "content": [{"type": "text", "text": "say hi"}]}]
+        assert "final_answer('hi')" in model(messages).content
+        assert (len(limiter.requests), limiter.token_total) == (1, 12)
+
+
+class TestBatchRunner:
+    def test_runs_tasks(self, tmp_path):
+        tasks, output = tmp_path / "tasks.jsonl", tmp_path / "results.jsonl"
+        write_lines(tasks, [{"id": "a", "task": "say hello"}, {"id": "b", "task": "say world"}])
+        runner = BatchRunner(echo_interpreter, workers=2, progress_interval=None)
+        summary = runner.run(str(tasks), str(output))
+        runner.close()
+        results = read_results(output)
+        assert (results["a"]["answer"], results["b"]["answer"]) == ("hello", "world")
+        assert results["a"]["error"] is None
+        assert (results["a"]["steps"], results["a"]["input_tokens"], results["a"]["output_tokens"]) == (2, 10, 2)
+        assert (summary.total, summary.completed, summary.failed, summary.skipped) == (2, 2, 0, 0)
+
+    def test_resumes_after_cut_off_line(self, tmp_path):
+        tasks, output = tmp_path / "tasks.jsonl", tmp_path / "results.jsonl"
+        write_lines(tasks, [{"id": "a", "task": "say hello"}, {"id": "b", "task": "say world"}])
+        cut_off = json.dumps({"id": "a", "answer": "done", "error": None}) + '\n{"id": "b", "ans'
+        output.write_text(cut_off, encoding="utf-8")
+        summary = BatchRunner(echo_interpreter, progress_interval=None).run(str(tasks), str(output))
+        lines = output.read_text(encoding="utf-8").splitlines()
+        assert lines[1] == '{"id": "b", "ans'
+        assert json.loads(lines[2])["answer"] == "world"
+        assert (summary.skipped, summary.completed) == (1, 1)
+        assert load_finished_ids(str(output)) == {"a", "b"}
+
+    @pytest.mark.parametrize("retry_errors, expected_answer", [(False, None), (True, "hello")])
+    def test_retry_errors(self, tmp_path, retry_errors, expected_answer):
+        tasks, output = tmp_path / "tasks.jsonl", tmp_path / "results.jsonl"
+        write_lines(tasks, [{"id": "a", "task": "say hello"}])
+        write_lines(output, [{"id": "a", "answer": None, "error": "ValueError: bad"}])
+        runner = BatchRunner(echo_interpreter, retry_errors=retry_errors, progress_interval=None)
+        summary = runner.run(str(tasks), str(output))
+        assert summary.skipped == (0 if retry_errors else 1)
+        # The last result of a task is the one that counts
+        assert read_results(output)["a"]["answer"] == expected_answer
+
+    def test_max_steps_is_an_error(self, tmp_path):
+        tasks, output = tmp_path / "tasks.jsonl", tmp_path / "results.jsonl"
+        write_lines(tasks, [{"id": "a", "task": "think forever"}])
+        summary = BatchRunner(echo_interpreter, progress_interval=None).run(str(tasks), str(output))
+        result = read_results(output)["a"]
+        assert result["answer"] is not None
+        assert result["error"] == "AgentMaxStepsError: Reached max steps."
+        assert (summary.completed, summary.failed) == (0, 1)
+
+    def test_tasks_do_not_share_state(self, tmp_path):
+        tasks, output = tmp_path / "tasks.jsonl", tmp_path / "results.jsonl"
+        write_lines(tasks, [{"id": str(i), "task": f"say task{i}"} for i in range(3)])
+        runner = BatchRunner(echo_interpreter, workers=1, progress_interval=None)
+        runner.run(str(tasks), str(output))
+        # One agent ran all the tasks, and only the last one is in its memory
+        assert [result["answer"] for result in read_results(output).values()] == ["task0", "task1", "task2"]
+        assert len(runner.interpreters) == 1
+        assert len(runner.interpreters[0].agent.memory.steps) == 2
+        runner.close()
+        assert runner.interpreters == []
+
+    def test_rate_limiter_wraps_worker_models(self, tmp_path):
+        tasks, output = tmp_path / "tasks.jsonl", tmp_path / "results.jsonl"
+        write_lines(tasks, [{"id": str(i), "task": f"say task{i}"} for i in range(3)])
+        limiter = RateLimiter(requests_per_minute=100)
+        summary = BatchRunner(echo_interpreter, workers=2, rate_limiter=limiter, progress_interval=None).run(
+            str(tasks), str(output)
+        )
+        assert len(limiter.requests) == 3
+        assert limiter.token_total == 36
+        assert summary.rate_limit_wait == 0.0
@@ -0,0 +1,234 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from smolagents.agents import CodeAgent
+from smolagents.models import ChatMessage, Model, stop_stream
+from smolagents.tools import Tool
+
+from interpreter_smol.core.batch import RateLimitedModel, RateLimiter
+from interpreter_smol.core.models.cache import CachedModel, CacheStats, ResponseCache, cache_key
+
+CODE_ACTION = "Thought: done\nCode:\n```py\nfinal_answer(7)\n```"
+
+
+class CountingModel(Model):
+    """Answers with the text of the last message, streamed in words, and counts its calls."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def __call__(self, messages, **kwargs):
+        self.calls += 1
+        self.last_input_token_count = 10
+        self.last_output_token_count = 5
+        return ChatMessage(role="assistant", content="Re: " + messages[-1]["content"][0]["text"])
+
+    async def __acall__(self, messages, **kwargs):
+        return self(messages, **kwargs)
+
+    def generate_stream(self, messages, **kwargs):
+        self.calls += 1
+        self.last_input_token_count = 10
+        self.last_output_token_count = 5
+        for word in messages[-1]["content"][0]["text"].split(" "):
+            yield word + " "
+
+
+class EchoTool(Tool):
+    name = "echo"
+    description = "Echoes a text."
+    inputs = {"text": {"type": "string", "description": "The text."}}
+    output_type = "string"
+
+    def forward(self, text: str):
+        return text
+
+
+def user_message(text):
+    return [{"role": "user", "content": [{"type": "text", "text": text}]}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    yield cache
+    cache.close()
+
+
+class TestCacheKey:
+    def test_same_request(self):
+        model = CountingModel(model_id="m", temperature=0.5)
+        assert cache_key(model, user_message("a"), stop_sequences=["x"]) == cache_key(
+            CountingModel(model_id="m", temperature=0.5), user_message("a"), stop_sequences=["x"]
+        )
+
+    @pytest.mark.parametrize(
+        "model_kwargs, messages, call_kwargs",
+        [
+            ({"model_id": "m", "temperature": 0.5}, user_message("b"), {"stop_sequences": ["x"]}),
+            ({"model_id": "m", "temperature": 0.5}, user_message("a"), {"stop_sequences": ["y"]}),
+            ({"model_id": "m", "temperature": 0.5}, user_message("a"), {"stop_sequences": ["x"], "grammar": "g"}),
+            ({"model_id": "m", "temperature": 0.5}, user_message("a"), {"stop_sequences": ["x"], "stream": True}),
+            (
+                {"model_id": "m", "temperature": 0.5},
+                user_message("a"),
+                {"stop_sequences": ["x"], "tools_to_call_from": [EchoTool()]},
+            ),
+            ({"model_id": "other", "temperature": 0.5}, user_message("a"), {"stop_sequences": ["x"]}),
+            ({"model_id": "m", "temperature": 0.0}, user_message("a"), {"stop_sequences": ["x"]}),
+            ({"model_id": "m", "temperature": 0.5, "top_p": 0.9}, user_message("a"), {"stop_sequences": ["x"]}),
+        ],
+    )
+    def test_differs_for_different_requests(self, model_kwargs, messages, call_kwargs):
+        key = cache_key(CountingModel(model_id="m", temperature=0.5), user_message("a"), stop_sequences=["x"])
+        assert cache_key(CountingModel(**model_kwargs), messages, **call_kwargs) != key
+
+    def test_ignores_credentials_and_wrappers(self):
+        model = CountingModel(model_id="m", api_key="secret")
+        key = cache_key(model, user_message("a"))
+        assert cache_key(CountingModel(model_id="m", api_key="other secret"), user_message("a")) == key
+        assert cache_key(RateLimitedModel(model, RateLimiter()), user_message("a")) == key
+
+    def test_consecutive_messages_of_a_role_are_merged(self):
+        model = CountingModel(model_id="m")
+        merged = [{"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "text", "text": "b"}]}]
+        assert cache_key(model, user_message("a") + user_message("b")) == cache_key(model, merged)
+
+
+class TestResponseCache:
+    def test_get_and_put(self, cache):
+        assert cache.get("key") is None
+        cache.put("key", {"content": "hello"}, 10, 5)
+        assert cache.get("key") == {"response": {"content": "hello"}, "input_tokens": 10, "output_tokens": 5}
+
+    def test_persists_across_instances(self, tmp_path):
+        first = ResponseCache(str(tmp_path / "responses.db"))
+        first.put("key", {"content": "hello"}, 10, 5)
+        first.close()
+        second = ResponseCache(str(tmp_path / "responses.db"))
+        assert second.get("key")["response"] == {"content": "hello"}
+        second.close()
+
+    def test_ttl(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "responses.db"), ttl=60)
+        with patch("interpreter_smol.core.models.cache.time.time", return_value=1000.0):
+            cache.put("old", {"content": "old"}, 1, 1)
+        with patch("interpreter_smol.core.models.cache.time.time", return_value=1050.0):
+            cache.put("new", {"content": "new"}, 1, 1)
+            assert cache.get("old") is not None
+        with patch("interpreter_smol.core.models.cache.time.time", return_value=1070.0):
+            assert cache.get("old") is None
+            assert cache.get("new") is not None
+        assert cache.stats().entries == 1
+        cache.close()
+
+    def test_size_eviction_is_least_recently_used(self, tmp_path):
+        entry_size = len('{"content": "xxxxxxxxxx"}')
+        cache = ResponseCache(str(tmp_path / "responses.db"), max_size_mb=2.5 * entry_size / 2**20)
+        for now, key in enumerate(["a", "b"]):
+            with patch("interpreter_smol.core.models.cache.time.time", return_value=float(now)):
+                cache.put(key, {"content": "x" * 10}, 1, 1)
+        with patch("interpreter_smol.core.models.cache.time.time", return_value=2.0):
+            assert cache.get("a") is not None
+        with patch("interpreter_smol.core.models.cache.time.time", return_value=3.0):
+            cache.put("c", {"content": "x" * 10}, 1, 1)
+        assert [key for key in "abc" if cache.get(key) is not None] == ["a", "c"]
+        assert cache.stats().size_bytes == 2 * entry_size
+        cache.close()
+
+    def test_stats(self, cache):
+        assert cache.stats().hit_rate == 0.0
+        cache.put("key", {"content": "hello"}, 10, 5)
+        cache.get("key")
+        cache.get("key")
+        cache.get("other")
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.input_tokens_saved, stats.output_tokens_saved) == (2, 1, 20, 10)
+        assert stats.entries == 1 and stats.hit_rate == pytest.approx(2 / 3)
+        assert stats.format().startswith("Response cache: 2 hits, 1 misses (67% hit rate), 20 input and 10 output")
+        cache.clear()
+        assert cache.stats().entries == 0
+
+    def test_format_without_lookups(self):
+        assert "0 hits, 0 misses (0% hit rate)" in CacheStats().format()
+
+
+class TestCachedModel:
+    def test_call(self, cache):
+        model = CachedModel(CountingModel(model_id="m"), cache)
+        assert model(user_message("hello")).content == "Re: hello"
+        assert (model.last_input_token_count, model.last_output_token_count) == (10, 5)
+        response = model(user_message("hello"))
+        assert (response.role, response.content) == ("assistant", "Re: hello")
+        assert (model.last_input_token_count, model.last_output_token_count) == (0, 0)
+        assert model.model.calls == 1
+        assert model.kwargs == {"model_id": "m"}
+
+    def test_acall(self, cache):
+        model = CachedModel(CountingModel(model_id="m"), cache)
+        assert asyncio.run(model.__acall__(user_message("hello"))).content == "Re: hello"
+        assert asyncio.run(model.__acall__(user_message("hello"))).content == "Re: hello"
+        assert model.model.calls == 1
+        # Calls and async calls share their responses
+        assert model(user_message("hello")).content == "Re: hello"
+        assert model.model.calls == 1
+
+    def test_stream_to_the_end(self, cache):
+        model = CachedModel(CountingModel(), cache)
+        assert list(model.generate_stream(user_message("a b c"))) == ["a ", "b ", "c "]
+        assert list(model.generate_stream(user_message("a b c"))) == ["a b c "]
+        assert model.model.calls == 1
+
+    def test_stream_stopped_by_consumer(self, cache):
+        model = CachedModel(CountingModel(), cache)
+        stream = model.generate_stream(user_message("a b c"))
+        assert next(stream) == "a "
+        stop_stream(stream)
+        assert list(model.generate_stream(user_message("a b c"))) == ["a "]
+        assert model.model.calls == 1
+
+    def test_stream_interrupted_by_error_is_not_stored(self, cache):
+        model = CachedModel(CountingModel(), cache)
+        stream = model.generate_stream(user_message("a b c"))
+        try:
+            for delta in stream:
+                raise KeyboardInterrupt
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stream.close()
+        assert list(model.generate_stream(user_message("a b c"))) == ["a ", "b ", "c "]
+        assert model.model.calls == 2
+
+    def test_rate_limiter_inside_cache(self, cache):
+        limiter = RateLimiter(requests_per_minute=10)
+        model = CachedModel(RateLimitedModel(CountingModel(), limiter), cache)
+        model(user_message("hello"))
+        model(user_message("hello"))
+        assert len(limiter.requests) == 1
+
+    @pytest.mark.parametrize("stream_outputs", [False, True])
+    def test_agent_replays_run(self, cache, stream_outputs):
+        class CodeModel(CountingModel):
+            def __call__(self, messages, **kwargs):
+                super().__call__(messages, **kwargs)
+                return ChatMessage(role="assistant", content=CODE_ACTION)
+
+            def generate_stream(self, messages, **kwargs):
+                self.calls += 1
+                yield from [CODE_ACTION[:20], CODE_ACTION[20:], "\n<end_code>", "ignored"]
+
+        def run():
+            agent = CodeAgent(tools=[], model=CachedModel(CodeModel(), cache), stream_outputs=stream_outputs)
+            return agent.run("Fake task."), agent
+
+        answer, agent = run()
+        assert answer == 7
+        answer, agent = run()
+        assert answer == 7
+        assert agent.model.model.calls == 0
+        assert agent.monitor.get_total_token_counts() == {"input": 0, "output": 0}
+        assert cache.stats().hits == 1
@@ -0,0 +1,106 @@
+import json
+import sys
+import threading
+
+from interpreter_smol.tools.enhanced_python import EnhancedPythonInterpreter, InvocationOutput, current_output
+
+
+class TestOutputCapture:
+    def test_prints_and_result(self):
+        interpreter = EnhancedPythonInterpreter()
+        assert interpreter.forward(code="print('hello')\nprint('oops', file=sys.stderr)\n1 + 1") == "hello\noops\n2"
+        assert interpreter.forward(code="x = 1") == ""
+
+    def test_error_keeps_output(self):
+        output = EnhancedPythonInterpreter().forward(code="print('before')\n1 / 0")
+        assert output == "Stdout:\nbefore\n\nError: Error executing code: division by zero"
+
+    def test_concurrent_calls_capture_their_own_output(self):
+        interpreter = EnhancedPythonInterpreter()
+        # Each call prints, waits until all the others have printed too, then prints again
+        interpreter.globals["barrier"] = threading.Barrier(4, timeout=10)
+        code = (
+            "print(f'{name} stdout')\n"
+            "print(f'{name} stderr', file=sys.stderr)\n"
+            "barrier.wait()\n"
+            "sys.stdout.write(f'{name} done\\n')"
+        )
+        outputs = {}
+
+        def run(name):
+            outputs[name] = interpreter.forward(code=code.replace("{name}", name))
+
+        threads = [threading.Thread(target=run, args=(f"call{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name, output in outputs.items():
+            assert output == f"{name} stdout\n{name} stderr\n{name} done\n{len(name) + 6}"
+        assert current_output.get() is None
+
+    def test_output_outside_calls_reaches_real_stream(self, capsys):
+        interpreter = EnhancedPythonInterpreter()
+        assert interpreter.forward(code="print('inside')") == "inside"
+        assert isinstance(sys.stdout, InvocationOutput) and isinstance(sys.stderr, InvocationOutput)
+        print("outside")
+        print("outside error", file=sys.stderr)
+        captured = capsys.readouterr()
+        # The output of calls is also written to the real stream, for logs
+        assert captured.out == "inside\noutside\n"
+        assert captured.err == "outside error\n"
+        assert interpreter.forward(code="print('again')") == "again"
+
+    def test_output_of_other_threads_during_a_call_is_not_captured(self, capsys):
+        interpreter = EnhancedPythonInterpreter()
+        printed = threading.Event()
+
+        def print_outside():
+            print("from another thread")
+            printed.set()
+
+        interpreter.globals["print_outside"] = lambda: threading.Thread(target=print_outside).start()
+        interpreter.globals["printed"] = printed
+        output = interpreter.forward(code="print_outside()\nprinted.wait(10)\nprint('from the call')")
+        assert output == "from the call"
+        assert "from another thread\n" in capsys.readouterr().out
+
+
+class TestNamespace:
+    def test_variables_and_imports_persist(self):
+        interpreter = EnhancedPythonInterpreter()
+        interpreter.forward(code="import json\ncount = 1\ndef double(x):\n    return 2 * x")
+        assert interpreter.forward(code="count += 1\njson.dumps([double(count)])") == "[4]"
+        assert interpreter.globals["count"] == 2
+
+    def test_reset(self):
+        interpreter = EnhancedPythonInterpreter()
+        interpreter.forward(code="import json\ncount = 1\nrun_shell('cd /')")
+        session = interpreter.shell_session
+        assert session.process is not None
+        interpreter.reset()
+        assert interpreter.snapshot() == {}
+        assert session.process is None
+        assert interpreter.forward(code="count").startswith("Stdout:\n\nError: Error executing code: name 'count'")
+        # The tools are still there, and the shell session starts again
+        assert interpreter.forward(code="run_shell('echo hi')['stdout']") == "hi\n"
+        assert interpreter.shell_session.process is not None
+        interpreter.reset()
+
+    def test_snapshot_leaves_out_builtins_and_tools(self):
+        interpreter = EnhancedPythonInterpreter()
+        assert interpreter.snapshot() == {}
+        interpreter.forward(code="import json\nx = [1]\nprint(len(x), abs(-1), read_file, run_shell)")
+        snapshot = interpreter.snapshot()
+        assert snapshot == {"json": json, "x": [1]}
+        # The copy is shallow
+        snapshot["y"] = 2
+        assert "y" not in interpreter.globals
+        assert snapshot["x"] is interpreter.globals["x"]
+
+    def test_user_variable_shadows_tool(self):
+        interpreter = EnhancedPythonInterpreter()
+        assert interpreter.forward(code="len = lambda x: 'shadowed'\nlen([1])") == "shadowed"
+        assert interpreter.snapshot().keys() == {"len"}
+        interpreter.reset()
+        assert interpreter.forward(code="len([1])") == "1"
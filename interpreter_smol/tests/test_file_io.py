@@ -0,0 +1,83 @@
+import pytest
+
+from interpreter_smol.tools.file_io import (
+    append_file,
+    grep_file,
+    iter_lines,
+    read_file,
+    tail_file,
+    write_file,
+)
+
+
+@pytest.fixture
+def lines_file(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"".join(f"line {i}\n".encode() for i in range(1, 101)))
+    return str(path)
+
+
+class TestReadFile:
+    def test_whole_file(self, lines_file):
+        assert read_file(lines_file).splitlines()[:2] == ["line 1", "line 2"]
+        assert read_file(lines_file, mode="rb").startswith(b"line 1\n")
+
+    def test_byte_range(self, lines_file):
+        assert read_file(lines_file, start=7, end=13) == "line 2"
+        assert read_file(lines_file, start=7, end=13, mode="rb") == b"line 2"
+
+    def test_inverted_byte_range_is_empty(self, lines_file):
+        assert read_file(lines_file, start=100, end=10, max_bytes=5) == ""
+
+    def test_byte_range_is_truncated(self, lines_file):
+        assert read_file(lines_file, start=0, end=100, max_bytes=6) == "line 1"
+
+    def test_line_range(self, lines_file):
+        assert read_file(lines_file, start_line=3, end_line=4) == "line 3\nline 4"
+        assert read_file(lines_file, start_line=99) == "line 99\nline 100"
+
+    def test_large_file_gives_summary(self, lines_file):
+        summary = read_file(lines_file, max_bytes=200)
+        assert summary.startswith(f"File {lines_file} has 792 bytes, more than max_bytes=200")
+        assert summary.endswith("line 19\nline 20")
+
+    def test_large_file_in_binary_mode_raises(self, lines_file):
+        with pytest.raises(ValueError, match="more than max_bytes=100"):
+            read_file(lines_file, mode="rb", max_bytes=100)
+
+    def test_text_mode_translates_line_endings(self, tmp_path):
+        path = tmp_path / "crlf.txt"
+        path.write_bytes(b"a\r\nb\rc\n")
+        assert read_file(str(path)) == "a\nb\nc\n"
+        assert read_file(str(path), mode="rb") == b"a\r\nb\rc\n"
+        assert read_file(str(path), start_line=1, end_line=2) == "a\nb\nc"
+
+
+class TestWriteFile:
+    def test_write_and_append_chunks(self, tmp_path):
+        path = str(tmp_path / "out.txt")
+        write_file(path, ["a", b"b"])
+        append_file(path, (str(i) for i in range(3)))
+        assert read_file(path) == "ab012"
+
+    @pytest.mark.parametrize("mode", ["w", "wt", "wb"])
+    def test_modes(self, tmp_path, mode):
+        path = str(tmp_path / "out.txt")
+        assert write_file(path, b"data" if "b" in mode else "data", mode=mode) == f"File written to {path}"
+        assert read_file(path) == "data"
+
+
+def test_iter_lines(lines_file):
+    assert list(iter_lines(lines_file, start_line=2, end_line=3)) == ["line 2", "line 3"]
+    assert list(iter_lines(lines_file, end_line=1, binary=True)) == [b"line 1"]
+
+
+def test_tail_file(lines_file):
+    assert tail_file(lines_file, lines=2) == "line 99\nline 100"
+    assert tail_file(lines_file, lines=0) == ""
+
+
+def test_grep_file(lines_file):
+    assert grep_file(lines_file, r"^line 1\d$", max_matches=2) == [(10, "line 10"), (11, "line 11")]
+    assert grep_file(lines_file, "LINE 100", ignore_case=True) == [(100, "line 100")]
+    assert grep_file(lines_file, "absent") == []
@@ -0,0 +1,146 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from smolagents.local_python_executor import CodeCache
+
+from interpreter_smol.tools import local_python_executor_unrestricted
+from interpreter_smol.tools.local_python_executor_unrestricted import InterpreterError, compile_code, evaluate_python_code
+
+
+class TestCompileCode:
+    @pytest.mark.parametrize(
+        "code, has_statements, has_expression",
+        [
+            ("x = 1\nx + 1", True, True),
+            ("x = 1", True, False),
+            ("1 + 1", False, True),
+            ("x = 1; x + 1", True, True),
+            ("", False, False),
+        ],
+    )
+    def test_split(self, code, has_statements, has_expression):
+        statements, expression = compile_code(code)
+        assert (statements is not None, expression is not None) == (has_statements, has_expression)
+
+    @pytest.mark.parametrize(
+        "code, expected",
+        [
+            ("x = 1\nx + 1", 2),
+            ("x = 1", None),
+            ("for i in range(3):\n    x = i", None),
+            ("[i * 2 for i in range(3)]", [0, 2, 4]),
+            ("x = 1; x + 1", 2),
+            ("def f():\n    return 3\nf()", 3),
+            ("print('side effect')", None),
+            ("", None),
+        ],
+    )
+    def test_result_is_trailing_expression(self, code, expected):
+        result, _ = evaluate_python_code(code, {})
+        assert result == expected
+
+    @pytest.mark.parametrize("code", ["x = (", "def f(:\n    pass", "1 +"])
+    def test_syntax_error(self, code):
+        with pytest.raises(InterpreterError, match="Error executing code: .*"):
+            evaluate_python_code(code, {})
+
+    def test_code_cache_compiles_once(self):
+        code_cache = CodeCache()
+        with patch.object(local_python_executor_unrestricted, "compile_code", wraps=compile_code) as compile_mock:
+            for i in range(3):
+                assert evaluate_python_code("x = 1\nx + 1", {}, code_cache=code_cache)[0] == 2
+                assert evaluate_python_code("y = 2\ny * 2", {}, code_cache=code_cache)[0] == 4
+        assert [call.args[0] for call in compile_mock.call_args_list] == ["x = 1\nx + 1", "y = 2\ny * 2"]
+        assert (code_cache.hits, code_cache.misses) == (4, 2)
+
+    def test_code_cache_does_not_store_syntax_errors(self):
+        code_cache = CodeCache()
+        for i in range(2):
+            with pytest.raises(InterpreterError):
+                evaluate_python_code("x = (", {}, code_cache=code_cache)
+        assert (code_cache.hits, code_cache.misses, len(code_cache.entries)) == (0, 2, 0)
+
+
+class IterationCountingDict(dict):
+    """Dict that counts how many times it is iterated over, e.g. to be copied."""
+
+    iterations = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        return super().__iter__()
+
+    def keys(self):
+        self.iterations += 1
+        return super().keys()
+
+    def items(self):
+        self.iterations += 1
+        return super().items()
+
+    def values(self):
+        self.iterations += 1
+        return super().values()
+
+
+class TestState:
+    def test_code_runs_in_caller_state(self):
+        state = {"x": 1}
+        result, returned_state = evaluate_python_code("y = x + 1\nimport math\ndef f():\n    return y\nf()", state)
+        assert returned_state is state
+        assert (result, state["x"], state["y"], state["f"](), state["math"].pi) == (2, 1, 2, 2, 3.141592653589793)
+        assert evaluate_python_code("del x\n'x' in globals()", state)[0] is False
+        assert "x" not in state
+
+    def test_tools_are_callable_but_not_copied_to_state(self):
+        state = {}
+        result, _ = evaluate_python_code(
+            "double(add_one(1)) + len([1])",
+            state,
+            static_tools={"double": lambda x: 2 * x},
+            custom_tools={"add_one": lambda x: x + 1},
+        )
+        assert result == 5
+        assert state.keys() == {"__builtins__"}
+
+    def test_tools_do_not_leak_to_next_call(self):
+        state = {}
+        evaluate_python_code("1", state, static_tools={"double": lambda x: 2 * x})
+        with pytest.raises(InterpreterError, match="name 'double' is not defined"):
+            evaluate_python_code("double(1)", state)
+
+    def test_custom_tools_override_static_tools(self):
+        result, _ = evaluate_python_code(
+            "tool()", {}, static_tools={"tool": lambda: "static"}, custom_tools={"tool": lambda: "custom"}
+        )
+        assert result == "custom"
+
+    def test_user_variable_shadows_tool(self):
+        state = {}
+        tools = {"double": lambda x: 2 * x}
+        assert evaluate_python_code("double = 'mine'\ndouble", state, static_tools=tools)[0] == "mine"
+        assert evaluate_python_code("double", state, static_tools=tools)[0] == "mine"
+        del state["double"]
+        assert evaluate_python_code("double(2)", state, static_tools=tools)[0] == 4
+
+    def test_state_is_not_iterated(self):
+        # Nothing proportional to the size of state is done per call: it is neither copied nor scanned
+        state = IterationCountingDict({f"variable_{i}": i for i in range(1000)})
+        assert evaluate_python_code("variable_999 + 1", state, static_tools={"tool": print})[0] == 1000
+        assert state.iterations == 0
+
+    def test_cost_per_call_does_not_grow_with_state(self):
+        def fastest_call(state):
+            durations = []
+            for i in range(5):
+                start = time.perf_counter()
+                evaluate_python_code("x = 1", state)
+                durations.append(time.perf_counter() - start)
+            return min(durations)
+
+        small = fastest_call({})
+        large = fastest_call({f"variable_{i}": i for i in range(1_000_000)})
+        # Copying a million variables takes tens of milliseconds, far more than this margin
+        assert large < 5 * small + 0.005
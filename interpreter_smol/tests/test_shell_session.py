@@ -0,0 +1,133 @@
+import re
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from interpreter_smol.tools.enhanced_python import EnhancedPythonInterpreter
+from interpreter_smol.tools.shell_session import OutputBuffer, ShellSession
+
+pytestmark = pytest.mark.skipif(shutil.which("bash") is None, reason="bash is not installed")
+
+
+@pytest.fixture
+def session():
+    with ShellSession(shell=shutil.which("bash"), timeout=10) as session:
+        yield session
+
+
+class TestShellSession:
+    def test_cwd_and_env_persist(self, session, tmp_path):
+        assert session.run(f"cd {tmp_path} && export GREETING=hello && COUNT=2")["returncode"] == 0
+        result = session.run('pwd; echo "$GREETING $COUNT"')
+        assert result == {"returncode": 0, "stdout": f"{tmp_path}\nhello 2\n", "stderr": ""}
+
+    def test_stdout_stderr_and_returncode(self, session):
+        result = session.run("echo out; echo err >&2; false")
+        assert result == {"returncode": 1, "stdout": "out\n", "stderr": "err\n"}
+
+    @pytest.mark.parametrize("command", ["echo 'unbalanced", 'echo "unbalanced', "if true; then", "echo ("])
+    def test_syntax_error_keeps_session_usable(self, session, command):
+        session.run("cd /")
+        result = session.run(command)
+        assert result["returncode"] not in (0, None)
+        assert result["stderr"]
+        # The same shell runs the next command, with its working directory
+        process = session.process
+        assert session.run("pwd") == {"returncode": 0, "stdout": "/\n", "stderr": ""}
+        assert session.process is process
+
+    def test_unterminated_heredoc_ends_with_command(self, session):
+        result = session.run("cat <<EOF\nno end")
+        assert (result["returncode"], result["stdout"]) == (0, "no end\n")
+        assert "here-document" in result["stderr"]
+        assert session.run("echo next")["stdout"] == "next\n"
+
+    def test_timeout_kills_and_restarts_shell(self, session, tmp_path):
+        session.run(f"cd {tmp_path}")
+        result = session.run("echo started; sleep 30", timeout=0.5)
+        assert result["returncode"] is None
+        assert result["stdout"] == "started\n"
+        assert "Command timed out after 0.5 seconds, its shell was killed." in result["stderr"]
+        assert session.process is None
+        # A new shell runs the next command, in the starting working directory
+        result = session.run("pwd")
+        assert result["returncode"] == 0
+        assert result["stdout"] != f"{tmp_path}\n"
+
+    def test_exit(self, session):
+        result = session.run("echo bye; exit 3")
+        assert result == {"returncode": 3, "stdout": "bye\n", "stderr": ""}
+        assert session.run("echo again") == {"returncode": 0, "stdout": "again\n", "stderr": ""}
+
+    def test_output_resembling_sentinel(self, session):
+        fake = "__SHELL_SESSION_" + "0" * 32 + "__"
+        real = session.sentinel
+        command = f"echo '{fake} 0'; echo '{real[:-1]}'; printf '%s' '{real} x'; echo '{fake}' >&2; echo after"
+        result = session.run(command)
+        assert result["returncode"] == 0
+        assert result["stdout"] == f"{fake} 0\n{real[:-1]}\n{real} xafter\n"
+        assert result["stderr"] == f"{fake}\n"
+
+    def test_commands_read_no_input(self, session):
+        assert session.run("cat")["returncode"] == 0
+        assert session.run("echo still here")["stdout"] == "still here\n"
+
+    def test_max_output_chars_and_streaming(self):
+        chunks = []
+        with ShellSession(shell=shutil.which("bash"), max_output_chars=10) as session:
+            result = session.run("printf '%.0sx' $(seq 25)", on_output=chunks.append)
+        assert result["stdout"] == "x" * 10 + "\n[... 15 more characters truncated ...]\n"
+        assert "".join(chunks) == "x" * 25
+
+
+class TestOutputBuffer:
+    def test_sentinel_split_across_reads(self):
+        buffer = OutputBuffer(re.compile(r"END (\d+)\n"), holdback=8, max_chars=100, on_output=None)
+        for chunk in ["some output E", "N", "D 4", "2\n"]:
+            buffer.feed(chunk)
+        assert buffer.match.group(1) == "42"
+        assert buffer.getvalue() == "some output "
+
+    def test_finish_commits_held_back_output(self):
+        buffer = OutputBuffer(re.compile(r"END\n"), holdback=8, max_chars=100, on_output=None)
+        buffer.feed("no sentinel")
+        assert buffer.getvalue() == "no "
+        buffer.finish()
+        assert (buffer.match, buffer.getvalue()) == (None, "no sentinel")
+
+
+class TestRunShell:
+    def test_uses_session(self):
+        interpreter = EnhancedPythonInterpreter()
+        output = interpreter.forward(code="run_shell('cd /tmp && export X=1')\nrun_shell('echo $X; pwd')['stdout']")
+        assert output == "1\n/tmp\n"
+        assert interpreter.shell_session is not None
+        interpreter.reset()
+
+    @pytest.mark.parametrize("use_session", [True, False])
+    def test_result(self, use_session):
+        interpreter = EnhancedPythonInterpreter()
+        run_shell = interpreter.base_python_tools["run_shell"]
+        which = shutil.which if use_session else lambda name: None
+        with patch("interpreter_smol.tools.enhanced_python.shutil.which", which):
+            assert run_shell("echo out; echo err >&2; exit 4") == {"returncode": 4, "stdout": "out\n", "stderr": "err\n"}
+            assert run_shell(["echo", "a b"], text=False)["stdout"] == b"a b\n"
+        assert (interpreter.shell_session is not None) == use_session
+        interpreter.reset()
+
+    @pytest.mark.parametrize("use_session", [True, False])
+    def test_without_capture_forwards_output(self, use_session):
+        interpreter = EnhancedPythonInterpreter()
+        which = shutil.which if use_session else lambda name: None
+        with patch("interpreter_smol.tools.enhanced_python.shutil.which", which):
+            output = interpreter.forward(code="result = run_shell('echo streamed', capture_output=False)")
+        assert output == "streamed"
+        assert interpreter.globals["result"]["stdout"] == ""
+        interpreter.reset()
+
+    def test_fallback_timeout(self):
+        run_shell = EnhancedPythonInterpreter().base_python_tools["run_shell"]
+        with patch("interpreter_smol.tools.enhanced_python.shutil.which", lambda name: None):
+            with pytest.raises(Exception, match="timed out"):
+                run_shell("sleep 30", timeout=0.5)
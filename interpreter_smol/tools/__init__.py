@@ -2,5 +2,6 @@
 
 from .enhanced_python import EnhancedPythonInterpreter
 from .local_python_executor_unrestricted import evaluate_python_code, BASE_PYTHON_TOOLS
+from .shell_session import ShellSession
 
-__all__ = ['EnhancedPythonInterpreter', 'evaluate_python_code', 'BASE_PYTHON_TOOLS']
\ No newline at end of file
+__all__ = ['EnhancedPythonInterpreter', 'evaluate_python_code', 'BASE_PYTHON_TOOLS', 'ShellSession']
\ No newline at end of file
@@ -1,29 +1,85 @@
 """Enhanced unrestricted Python interpreter with guaranteed system access."""
 
 import os
+import shlex
+import shutil
 import sys
 import subprocess
 import importlib
 import builtins
+import contextvars
 import io
+import threading
 from typing import Any, Dict, List, Optional
+from smolagents.local_python_executor import DEFAULT_CODE_CACHE_SIZE, CodeCache
 from smolagents.tools import Tool
-from .local_python_executor_unrestricted import evaluate_python_code, BASE_PYTHON_TOOLS
+from .file_io import append_file, grep_file, iter_lines, read_file, tail_file, write_file
+from .local_python_executor_unrestricted import BASE_PYTHON_TOOLS, compile_code
+from .shell_session import ShellSession
+
+# Buffer capturing the output of the invocation running in the current thread or task, if any
+current_output: contextvars.ContextVar[Optional[io.StringIO]] = contextvars.ContextVar("current_output", default=None)
+output_proxies_lock = threading.Lock()
+# Seconds after which run_shell kills a command, so that a command waiting forever doesn't block the agent
+DEFAULT_RUN_SHELL_TIMEOUT = 300.0
+
+
+class InvocationOutput:
+    """Proxy of sys.stdout or sys.stderr that also writes to the buffer of the current invocation.
+
+    Unlike replacing `print`, this only captures the output of the invocation running in the current context, so
+    concurrent invocations in other threads or tasks don't mix their outputs.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        buffer = current_output.get()
+        if buffer is not None:
+            buffer.write(text)
+        # Still write to the real stream so the output shows in logs
+        return self.stream.write(text)
+
+    def writelines(self, lines) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def install_output_proxies() -> None:
+    """Wrap sys.stdout and sys.stderr in `InvocationOutput` proxies, unless they already are."""
+    with output_proxies_lock:
+        if not isinstance(sys.stdout, InvocationOutput):
+            sys.stdout = InvocationOutput(sys.stdout)
+        if not isinstance(sys.stderr, InvocationOutput):
+            sys.stderr = InvocationOutput(sys.stderr)
+
 
 class EnhancedPythonInterpreter(Tool):
-    """A Python interpreter with full system access and persistence."""
+    """A Python interpreter with full system access and persistence.
+
+    Variables defined by a call stay available to the next ones, until `reset()` is called.
+    """
 
-    def __init__(self, authorized_imports: Optional[List[str]] = None):
+    def __init__(self, authorized_imports: Optional[List[str]] = None, code_cache_size: int = DEFAULT_CODE_CACHE_SIZE):
         """Initialize the unrestricted Python interpreter.
 
         Args:
             authorized_imports: List of modules to allow importing (ignored here - we allow everything).
+            code_cache_size: Number of compiled code actions to keep, so that resubmitted code is not compiled again.
         """
         super().__init__()
         self.name = "python_interpreter"
         self.description = (
             "A Python interpreter with full system access, file operations, "
-            "and subprocess capabilities."
+            "and subprocess capabilities. For large files, use read_file with byte or line ranges, "
+            "tail_file, grep_file, iter_lines and append_file rather than reading them whole."
         )
 
         # We declare just one input "code", but we'll skip signature validation so we can use **kwargs
@@ -41,6 +97,7 @@ class EnhancedPythonInterpreter(Tool):
         self.is_initialized = True
         self.history = []
         self.verbosity_level = 1
+        self.code_cache = CodeCache(maxsize=code_cache_size)
 
         # Start with the base Python tools
         self.base_python_tools = BASE_PYTHON_TOOLS.copy()
@@ -57,72 +114,87 @@ class EnhancedPythonInterpreter(Tool):
             "__import__": __import__,
         })
 
-        # Helper to run shell commands
-        def run_shell(cmd, capture_output=True, text=True, shell=True):
-            result = subprocess.run(cmd, capture_output=capture_output, text=text, shell=shell)
+        # Helper to run shell commands, in a shell session kept across calls when bash is available
+        self.shell_session: Optional[ShellSession] = None
+
+        def run_shell(cmd, capture_output=True, text=True, shell=True, timeout=DEFAULT_RUN_SHELL_TIMEOUT):
+            if shutil.which("bash") is None:
+                # A list is run as a shell command with its arguments quoted, like in the shell session
+                if shell and not isinstance(cmd, str):
+                    cmd = shlex.join(cmd)
+                # Subprocesses write to the file descriptors of the process, which are shared by all invocations:
+                # always pipe their output, and forward it to sys.stdout and sys.stderr if the caller doesn't want it
+                result = subprocess.run(cmd, capture_output=True, text=text, shell=shell, timeout=timeout)
+                if not capture_output:
+                    sys.stdout.write(result.stdout if text else result.stdout.decode(errors="replace"))
+                    sys.stderr.write(result.stderr if text else result.stderr.decode(errors="replace"))
+                returncode, stdout, stderr = result.returncode, result.stdout, result.stderr
+            else:
+                if self.shell_session is None:
+                    self.shell_session = ShellSession(shell=shutil.which("bash"))
+                command = cmd if isinstance(cmd, str) else shlex.join(cmd)
+                # Without capture, stream the output while the command runs
+                on_output = None if capture_output else sys.stdout.write
+                result = self.shell_session.run(command, timeout=timeout, on_output=on_output)
+                returncode, stdout, stderr = result["returncode"], result["stdout"], result["stderr"]
+                if not text:
+                    stdout, stderr = stdout.encode(), stderr.encode()
             return {
-                "returncode": result.returncode,
-                "stdout": result.stdout if capture_output else "",
-                "stderr": result.stderr if capture_output else ""
+                "returncode": returncode,
+                "stdout": stdout if capture_output else "",
+                "stderr": stderr if capture_output else ""
             }
         self.base_python_tools["run_shell"] = run_shell
 
-        # Helper to write files easily
-        def write_file(path, content, mode='w'):
-            with open(path, mode) as f:
-                f.write(content)
-            return f"File written to {path}"
-        self.base_python_tools["write_file"] = write_file
+        # Helpers to read and write files, including large ones, easily
+        for helper in (read_file, write_file, append_file, tail_file, grep_file, iter_lines):
+            self.base_python_tools[helper.__name__] = helper
+
+        # Variables persist across calls in this namespace, with the tools layered underneath as its builtins
+        self.globals: Dict[str, Any] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all the variables defined by previous calls, keeping the tools, and restart the shell session."""
+        if self.shell_session is not None:
+            self.shell_session.close()
+        self.globals.clear()
+        self.globals["__builtins__"] = {**vars(builtins), **self.base_python_tools}
 
-        # Helper to read files easily
-        def read_file(path, mode='r'):
-            with open(path, mode) as f:
-                return f.read()
-        self.base_python_tools["read_file"] = read_file
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a shallow copy of the variables defined by previous calls."""
+        return {name: value for name, value in self.globals.items() if name != "__builtins__"}
+
+    @property
+    def cache_hits(self) -> int:
+        return self.code_cache.hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self.code_cache.misses
 
     def forward(self, **kwargs) -> str:
         """Execute Python code with full system access, capturing prints."""
         # The user code is passed in with the key "code"
         code = kwargs.get("code", "")
 
-        # We'll capture any print statements to this buffer
+        # Writes to sys.stdout and sys.stderr from this invocation only are captured to this buffer
         buffer = io.StringIO()
-        original_print = builtins.print
-
-        def custom_print(*args, **print_kwargs):
-            # This calls real 'print' so you still see output in logs
-            original_print(*args, **print_kwargs)
-            # Also record it in the buffer
-            print(*args, **print_kwargs, file=buffer)
-
-        # Temporarily override builtins.print
-        builtins.print = custom_print
-
-        state: Dict[str, Any] = {}
-        state["_print_outputs"] = ""
+        install_output_proxies()
+        token = current_output.set(buffer)
 
         try:
-            # Execute code directly with all tools available
-            # Use exec_globals to make sure all tools are accessible
-            exec_globals = {**BASE_PYTHON_TOOLS, **self.base_python_tools, **state}
-            try:
-                # Try to evaluate as expression first
-                result = eval(code, exec_globals)
-            except SyntaxError:
-                # If not an expression, execute as statements
-                exec(code, exec_globals)
-                # Update state with any new variables
-                state.update({k: v for k, v in exec_globals.items() 
-                            if k not in BASE_PYTHON_TOOLS and k not in self.base_python_tools})
-                result = None
+            # Execute code directly in the persistent namespace, where all tools are accessible
+            # The code is compiled once, with its trailing expression apart to return its value
+            statements, expression = self.code_cache.get_or_build(code, compile_code)
+            if statements is not None:
+                exec(statements, self.globals)
+            result = eval(expression, self.globals) if expression is not None else None
         except Exception as e:
-            # If there's an error, revert print and return immediately
-            builtins.print = original_print
             error_msg = f"Error executing code: {str(e)}"
             return f"Stdout:\n{buffer.getvalue()}\nError: {error_msg}"
         finally:
-            # Always restore the original print function
-            builtins.print = original_print
+            current_output.reset(token)
 
         # The captured prints are in buffer
         captured_text = buffer.getvalue()
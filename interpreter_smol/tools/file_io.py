@@ -0,0 +1,151 @@
+"""File helpers for agents that work on large files without loading them whole in memory.
+
+Line numbers start at 1 and line ranges include both ends, like `sed -n 'start,endp'` or `grep -n`.
+"""
+
+import io
+import mmap
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_MAX_READ_BYTES = 1000000
+DEFAULT_MAX_MATCHES = 100
+CHUNK_SIZE = 1 << 20
+PREVIEW_LINES = 20
+
+
+def decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def decode_text(data: bytes) -> str:
+    """Decode like a file opened in text mode, which translates Windows and old Mac line endings to newlines."""
+    return decode(data).replace("\r\n", "\n").replace("\r", "\n")
+
+
+def summarize_file(path: str, max_bytes: int) -> str:
+    """Describe a file too large to be returned, with a preview of its first lines."""
+    size = os.path.getsize(path)
+    preview = "\n".join(iter_lines(path, end_line=PREVIEW_LINES))[:max_bytes]
+    return (
+        f"File {path} has {size} bytes, more than max_bytes={max_bytes}, so it was not read whole. "
+        f"Use read_file with start/end or start_line/end_line, tail_file, grep_file or iter_lines instead.\n"
+        f"First {PREVIEW_LINES} lines:\n{preview}"
+    )
+
+
+def iter_lines(
+    path: str, start_line: int = 1, end_line: Optional[int] = None, binary: bool = False
+) -> Iterator[Union[str, bytes]]:
+    """Yield the lines of a file from `start_line` to `end_line`, without their line ending, reading it in chunks."""
+    with open(path, "rb", buffering=CHUNK_SIZE) as f:
+        for line_number, line in enumerate(f, start=1):
+            if end_line is not None and line_number > end_line:
+                break
+            if line_number >= start_line:
+                line = line.rstrip(b"\r\n")
+                yield line if binary else decode(line)
+
+
+def read_file(
+    path: str,
+    mode: str = "r",
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    max_bytes: int = DEFAULT_MAX_READ_BYTES,
+) -> Union[str, bytes]:
+    """Read a file, or only the bytes from `start` to `end` (excluded), or only the lines from `start_line` to `end_line`.
+
+    At most `max_bytes` bytes are returned: a larger file read whole gives a summary of the file instead (in binary
+    mode, a ValueError), and a larger range is truncated.
+    """
+    binary = "b" in mode
+    if start_line is not None or end_line is not None:
+        lines = []
+        total = 0
+        for line in iter_lines(path, start_line or 1, end_line, binary=True):
+            total += len(line) + 1
+            if total > max_bytes:
+                lines.append(b"[... truncated: the lines exceed max_bytes, read a smaller range ...]")
+                break
+            lines.append(line)
+        content = b"\n".join(lines)
+        return content if binary else decode_text(content)
+    if start is None and end is None and os.path.getsize(path) > max_bytes:
+        if binary:
+            raise ValueError(
+                f"File {path} has {os.path.getsize(path)} bytes, more than max_bytes={max_bytes}: "
+                f"read it in ranges with start and end."
+            )
+        return summarize_file(path, max_bytes)
+    with open(path, "rb") as f:
+        start = start or 0
+        f.seek(start)
+        size = max(0, end - start) if end is not None else max_bytes
+        content = f.read(min(size, max_bytes))
+    return content if binary else decode_text(content)
+
+
+def tail_file(path: str, lines: int = 10, max_bytes: int = DEFAULT_MAX_READ_BYTES) -> str:
+    """Return the last `lines` lines of a file, reading it backwards from its end."""
+    with open(path, "rb") as f:
+        position = f.seek(0, io.SEEK_END)
+        data = b""
+        # One more line ending than lines is needed, unless the beginning of the file is reached
+        while position > 0 and data.count(b"\n") <= lines and len(data) < max_bytes:
+            step = min(CHUNK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    tail = data.rstrip(b"\n").split(b"\n")[-lines:] if lines > 0 else []
+    return decode(b"\n".join(tail)[-max_bytes:])
+
+
+def grep_file(
+    path: str, pattern: str, ignore_case: bool = False, max_matches: int = DEFAULT_MAX_MATCHES
+) -> List[Tuple[int, str]]:
+    """Return the line number and text of the lines of a file matching a regular expression, like `grep -n`.
+
+    The file is memory-mapped and scanned by the regex engine, so only the matching lines are loaded. At most
+    `max_matches` lines are returned.
+    """
+    regex = re.compile(pattern.encode(), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    if os.path.getsize(path) == 0:
+        return []
+    matches = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        line_number = 1
+        counted_until = 0
+        position = 0
+        while len(matches) < max_matches:
+            match = regex.search(mm, position)
+            if match is None:
+                break
+            line_start = mm.rfind(b"\n", 0, match.start()) + 1
+            line_end = mm.find(b"\n", match.start())
+            if line_end == -1:
+                line_end = len(mm)
+            line_number += mm[counted_until:line_start].count(b"\n")
+            counted_until = line_start
+            matches.append((line_number, decode(mm[line_start:line_end]).rstrip("\r")))
+            # Report each line once, even with several matches
+            position = line_end + 1
+    return matches
+
+
+def write_file(path: str, content: Union[str, bytes, Iterable[Union[str, bytes]]], mode: str = "w") -> str:
+    """Write a string, bytes, or an iterable of chunks of them, to a file, without joining the chunks in memory."""
+    chunks = [content] if isinstance(content, (str, bytes)) else content
+    binary_mode = mode if "b" in mode else mode.replace("t", "") + "b"
+    with open(path, binary_mode, buffering=CHUNK_SIZE) as f:
+        for chunk in chunks:
+            f.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    return f"File written to {path}"
+
+
+def append_file(path: str, content: Union[str, bytes, Iterable[Union[str, bytes]]]) -> str:
+    """Append a string, bytes, or an iterable of chunks of them, to a file."""
+    return write_file(path, content, mode="a")
@@ -11,12 +11,13 @@ import math
 import re
 from collections.abc import Mapping
 from importlib import import_module
-from types import ModuleType
+from types import CodeType, ModuleType
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from smolagents.local_python_executor import CodeCache, parallel_map
 from smolagents.tools import Tool
 from smolagents.utils import BASE_BUILTIN_MODULES, truncate_content
 
@@ -55,18 +56,37 @@ BASE_PYTHON_TOOLS = {
     "filter": filter,
     "next": next,
     "iter": iter,
+    "parallel_map": parallel_map,  # Calls a tool on many items at once, in a shared thread pool
 }
 
+# Names available to the code below the tools: the builtins, overridden by the base tools
+BUILTINS_AND_TOOLS = {**vars(builtins), **BASE_PYTHON_TOOLS}
+
+def compile_code(code: str) -> Tuple[Optional[CodeType], Optional[CodeType]]:
+    """
+    Parse code once and compile its statements and its trailing expression separately.
+    Returns the code object of the statements, or None if the code is a single expression, and the code object of the
+    trailing expression, or None if the code does not end with one: like in IPython, its value is the result.
+    """
+    tree = ast.parse(code, "<string>")
+    expression = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        expression = compile(ast.Expression(tree.body.pop().value), "<string>", "eval")
+    statements = compile(tree, "<string>", "exec") if tree.body else None
+    return statements, expression
+
 def evaluate_python_code(
     code: str,
     state: Optional[Dict[str, Any]] = None,
     static_tools: Optional[Dict[str, Any]] = None,
     custom_tools: Optional[Dict[str, Any]] = None,
     authorized_imports: Optional[Union[str, List[str]]] = None,
+    code_cache: Optional[CodeCache] = None,
 ) -> Tuple[Any, Dict[str, Any]]:
     """
     Evaluate Python code with direct execution.
-    Handles both expressions and statements safely.
+    Handles both expressions and statements safely, and returns the value of the trailing expression if any.
+    If `code_cache` is given, the compiled code is looked up in and stored to it.
     """
     if state is None:
         state = {}
@@ -75,20 +95,18 @@ def evaluate_python_code(
     if custom_tools is None:
         custom_tools = {}
 
-    # Merge tools into state
-    exec_globals = {**BASE_PYTHON_TOOLS, **static_tools, **custom_tools, **state}
-    
+    # The code runs directly in state, so its variables need no copying back. The tools are layered underneath as its
+    # builtins: building them costs the same whatever the size of state.
+    state["__builtins__"] = {**BUILTINS_AND_TOOLS, **static_tools, **custom_tools}
+
     try:
-        # Try to evaluate as expression first
-        tree = ast.parse(code, mode='eval')
-        result = eval(code, exec_globals)
-        return result, state
-    except SyntaxError:
-        try:
-            # If not an expression, execute as statements
-            exec(code, exec_globals)
-            # Return None for statements and update state
-            state.update({k: v for k, v in exec_globals.items() if k not in BASE_PYTHON_TOOLS})
-            return None, state
-        except Exception as e:
-            raise InterpreterError(f"Error executing code: {str(e)}")
\ No newline at end of file
+        if code_cache is not None:
+            statements, expression = code_cache.get_or_build(code, compile_code)
+        else:
+            statements, expression = compile_code(code)
+        if statements is not None:
+            exec(statements, state)
+        result = eval(expression, state) if expression is not None else None
+    except Exception as e:
+        raise InterpreterError(f"Error executing code: {str(e)}")
+    return result, state
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""Long-lived shell session, so that commands share their working directory and environment."""
+
+import codecs
+import os
+import re
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MAX_OUTPUT_CHARS = 100000
+
+
+class OutputBuffer:
+    """Collects the output of a command from one stream, until the sentinel that ends it.
+
+    Only the first `max_chars` characters are kept, the rest is counted. The last characters are held back until more
+    output arrives, so that a sentinel split across reads is still found.
+    """
+
+    def __init__(self, pattern: re.Pattern, holdback: int, max_chars: int, on_output: Optional[Callable[[str], None]]):
+        self.pattern = pattern
+        self.holdback = holdback
+        self.max_chars = max_chars
+        self.on_output = on_output
+        self.kept: List[str] = []
+        self.kept_chars = 0
+        self.dropped_chars = 0
+        self.pending = ""
+        self.match = None
+
+    def commit(self, text: str):
+        if not text:
+            return
+        if self.on_output is not None:
+            self.on_output(text)
+        room = self.max_chars - self.kept_chars
+        if room > 0:
+            self.kept.append(text[:room])
+            self.kept_chars += min(room, len(text))
+        self.dropped_chars += max(0, len(text) - room)
+
+    def feed(self, text: str):
+        self.pending += text
+        self.match = self.pattern.search(self.pending)
+        if self.match is not None:
+            self.commit(self.pending[: self.match.start()])
+            self.pending = ""
+        elif len(self.pending) > self.holdback:
+            self.commit(self.pending[: -self.holdback])
+            self.pending = self.pending[-self.holdback :]
+
+    def finish(self):
+        """Commit what was held back, when the stream ended without a sentinel."""
+        self.commit(self.pending)
+        self.pending = ""
+
+    def getvalue(self) -> str:
+        text = "".join(self.kept)
+        if self.dropped_chars:
+            text += f"\n[... {self.dropped_chars} more characters truncated ...]\n"
+        return text
+
+
+class ShellSession:
+    """A bash process that runs commands one after the other, like a terminal.
+
+    Each command is followed by a unique sentinel printed to stdout with its exit status, and to stderr, which marks
+    the end of its output. The working directory, environment variables and shell variables persist between commands,
+    and the cost of starting a shell is only paid once. Commands read their input from /dev/null.
+
+    Args:
+        shell: The shell to run, which must support `{ ...; }` groups, `eval` and `printf`.
+        max_output_chars: Maximum number of characters kept from each of stdout and stderr for each command.
+        timeout: Default timeout of commands, in seconds. A command that times out is killed with its shell: the next
+            command starts a new shell, which loses the working directory and environment.
+    """
+
+    def __init__(
+        self,
+        shell: str = "/bin/bash",
+        max_output_chars: int = DEFAULT_MAX_OUTPUT_CHARS,
+        timeout: Optional[float] = None,
+    ):
+        self.shell = shell
+        self.max_output_chars = max_output_chars
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.sentinel = f"__SHELL_SESSION_{uuid.uuid4().hex}__"
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.shell, "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    def close(self):
+        """Kill the shell and any command it is running."""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            stream.close()
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+    ) -> Dict:
+        """Run a command in the session.
+
+        Args:
+            command: The shell command.
+            timeout: Timeout in seconds, defaults to the timeout of the session.
+            on_output: Called with each chunk of stdout and stderr as soon as it is read, to stream them.
+
+        Returns:
+            A dict with the "returncode", "stdout" and "stderr" of the command. The returncode is None if the command
+            timed out.
+        """
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.close()
+                self.start()
+            timeout = self.timeout if timeout is None else timeout
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            holdback = len(self.sentinel) + 16
+            stdout = OutputBuffer(
+                re.compile(re.escape(self.sentinel) + r" (\d+)\n"), holdback, self.max_output_chars, on_output
+            )
+            stderr = OutputBuffer(re.compile(re.escape(self.sentinel) + r"\n"), holdback, self.max_output_chars, on_output)
+            # The command is parsed by `eval`, so an unbalanced quote or an unterminated heredoc is a syntax error of
+            # the command instead of swallowing the sentinel lines
+            framed = (
+                f"{{ eval {shlex.quote(command)}\n}} < /dev/null\n"
+                f"printf '%s %d\\n' {self.sentinel} $?\n"
+                f"printf '%s\\n' {self.sentinel} >&2\n"
+            )
+            try:
+                self.process.stdin.write(framed.encode())
+                self.process.stdin.flush()
+            except BrokenPipeError:
+                pass
+
+            buffers = {self.process.stdout.fileno(): stdout, self.process.stderr.fileno(): stderr}
+            decoders = {fd: codecs.getincrementaldecoder("utf-8")(errors="replace") for fd in buffers}
+            timed_out = False
+            with selectors.DefaultSelector() as selector:
+                for fd in buffers:
+                    selector.register(fd, selectors.EVENT_READ)
+                while selector.get_map():
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        timed_out = True
+                        break
+                    for key, _ in selector.select(remaining):
+                        data = os.read(key.fd, 65536)
+                        buffer = buffers[key.fd]
+                        if not data:
+                            # The shell exited, e.g. because the command called `exit`
+                            buffer.feed(decoders[key.fd].decode(b"", final=True))
+                            buffer.finish()
+                            selector.unregister(key.fd)
+                            continue
+                        buffer.feed(decoders[key.fd].decode(data))
+                        if buffer.match is not None:
+                            selector.unregister(key.fd)
+
+            for buffer in (stdout, stderr):
+                if buffer.match is None:
+                    buffer.finish()
+            returncode = int(stdout.match.group(1)) if stdout.match is not None else None
+            if timed_out:
+                self.close()
+                stderr.commit(f"\nCommand timed out after {timeout} seconds, its shell was killed.\n")
+            elif returncode is None:
+                # The shell itself exited, its status is the one of the command
+                self.process.wait()
+                returncode = self.process.returncode
+                self.close()
+            return {"returncode": returncode, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}